@@ -0,0 +1,270 @@
+"""Batch spec generation for validated opportunities from the opportunity pipeline.
+
+Usage:
+    python batch.py ../../mcp-opportunity-pipeline/outputs/validate/validated-opportunities-2025-11-25.json
+    python batch.py opportunities.jsonl --concurrency 8 --output-dir outputs/specs
+
+Each opportunity is analyzed, its clarifying questions are answered from the opportunity's
+evidence in assumption rounds, and the session is compiled to {name}-{digest}-spec.md, where
+a digest of the entry keeps names that slugify alike apart. Input is read incrementally and
+finished entries are checkpointed, so an interrupted run resumes where it stopped when
+started again with the same arguments.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import main as server
+from coalesce import payload_digest
+from models import AssumedAnswers, Session, SessionStatus
+from prompts import ASSUMPTION_PROMPT, build_assumption_input
+
+OPPORTUNITIES_KEY = "validated_opportunities"
+EVIDENCE_FIELDS = ("evidence", "willingness_to_pay_signals", "market_validation", "gap_analysis")
+DEFAULT_DOMAIN = "MCP server"
+MAX_ROUNDS = 5
+READ_CHUNK = 1 << 16
+
+
+class BatchError(Exception):
+    """An opportunity could not be turned into a spec."""
+
+
+# Input
+
+def iter_opportunities(path: Path, key: str = OPPORTUNITIES_KEY) -> Iterator[dict[str, Any]]:
+    """Yield opportunities one at a time from a JSONL file or a pipeline JSON file."""
+    if path.suffix == ".jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    yield from _iter_json_array(path, key)
+
+
+def _iter_json_array(path: Path, key: str) -> Iterator[dict[str, Any]]:
+    """Stream the items of a top-level array, or of the array under `key`, without loading the file."""
+    decoder = json.JSONDecoder()
+    array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    with path.open(encoding="utf-8") as f:
+        buffer = f.read(READ_CHUNK)
+        while True:
+            stripped = buffer.lstrip()
+            if stripped.startswith("["):
+                pos = len(buffer) - len(stripped) + 1
+                break
+            match = array_start.search(buffer)
+            if match:
+                pos = match.end()
+                break
+            more = f.read(READ_CHUNK)
+            if not more:
+                return
+            buffer += more
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, pos)
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(READ_CHUNK)
+                if not more:
+                    if buffer[pos:].strip():
+                        raise
+                    return
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield item
+            if pos > READ_CHUNK:
+                buffer, pos = buffer[pos:], 0
+
+
+def slugify(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "opportunity"
+
+
+def describe(opportunity: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Requirement text and supporting evidence for one opportunity."""
+    name = opportunity.get("name", "Unnamed opportunity")
+    pain = opportunity.get("pain_summary") or opportunity.get("description") or ""
+    requirement = f"{name}: {pain}".strip().rstrip(":")
+    evidence = {field: opportunity[field] for field in EVIDENCE_FIELDS if field in opportunity}
+    return requirement, evidence
+
+
+# Checkpoint
+
+class Checkpoint:
+    """Append-only JSONL record of finished entries; only their keys are kept in memory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed: set[str] = set()
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from an interrupted run
+                    if record.get("status") == "done":
+                        self.completed.add(record["key"])
+
+    def record(self, key: str, status: str, **fields: Any) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "status": status, **fields}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if status == "done":
+            self.completed.add(key)
+
+
+# Pipeline
+
+async def assume_answers(session: Session, evidence: dict[str, Any]) -> list[dict[str, str]]:
+    """Answer the session's pending questions from the opportunity evidence."""
+    pending = {c.id for c in session.clarifications if c.answer is None}
+    response = await server.call_claude(ASSUMPTION_PROMPT, build_assumption_input(session, evidence))
+    assumed = AssumedAnswers(**server.parse_json_response(response))
+    return [
+        {"question_id": a.question_id, "answer": f"(assumed) {a.answer}"}
+        for a in assumed.answers
+        if a.question_id in pending
+    ]
+
+
+async def build_spec(opportunity: dict[str, Any], output: Path, format: str) -> dict[str, Any]:
+    """Run one opportunity through analysis, assumption rounds and compilation into output."""
+    requirement, evidence = describe(opportunity)
+    domain = opportunity.get("domain", DEFAULT_DOMAIN)
+
+    started = json.loads(await server.start_session(requirement, domain, "technical", reuse_similar=False))
+    if "error" in started:
+        raise BatchError(f"{started['error']}: {started.get('details', '')}")
+    session_id = started["session_id"]
+
+    try:
+        with server.sessions.checkout(session_id) as session:
+            return await _complete(session, evidence, output, format)
+    finally:
+        # Finished sessions are not kept; a batch may cover thousands of opportunities
+        server.sessions.pop(session_id, None)
+
+
+async def _complete(session: Session, evidence: dict[str, Any], output: Path, format: str) -> dict[str, Any]:
+    """Assumption rounds and compilation for a started session."""
+    while session.status != SessionStatus.READY_TO_GENERATE and session.round_count < MAX_ROUNDS:
+        if not any(c.answer is None for c in session.clarifications):
+            break
+        answers = await assume_answers(session, evidence)
+        # Every pending question was just answered; don't wait on any the model skipped
+        await server.answer_questions(session, answers, force_new_round=True)
+
+    result = await server.generate(session, format)
+    try:
+        data = json.loads(result)
+    except json.JSONDecodeError:
+        data = None  # markdown spec
+    if isinstance(data, dict) and ("error" in data or "warning" in data):
+        raise BatchError(data.get("details") or data.get("error") or data["warning"])
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(output.suffix + ".tmp")
+    tmp.write_text(result, encoding="utf-8")
+    os.replace(tmp, output)
+
+    return {"rounds": session.round_count, "completeness": session.completeness.overall}
+
+
+async def run_batch(
+    source: Path,
+    output_dir: Path,
+    concurrency: int = 8,
+    format: str = "markdown",
+    checkpoint_path: Path | None = None,
+) -> dict[str, Any]:
+    """Build specs for every opportunity in source, at most `concurrency` at a time."""
+    checkpoint = Checkpoint(checkpoint_path or output_dir / ".batch-checkpoint.jsonl")
+    extension = "md" if format == "markdown" else "json"
+    counts = {"done": 0, "failed": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    async def run_one(opportunity: dict[str, Any], key: str, output: Path) -> None:
+        name = opportunity.get("name", key)
+        entry_started = time.perf_counter()
+        try:
+            stats = await build_spec(opportunity, output, format)
+        except Exception as e:
+            counts["failed"] += 1
+            checkpoint.record(key, "failed", name=name, error=str(e))
+            print(f"> FAILED {name}: {e}")
+            return
+        elapsed = time.perf_counter() - entry_started
+        counts["done"] += 1
+        checkpoint.record(key, "done", name=name, output=str(output), seconds=round(elapsed, 1), **stats)
+        print(f"> {name}: {output.name} ({stats['rounds']} rounds, {stats['completeness']}%, {elapsed:.1f}s)")
+
+    # Entries are read only as worker slots free up, so the input is never held in memory
+    running: set[asyncio.Task] = set()
+    for opportunity in iter_opportunities(source):
+        slug = slugify(opportunity.get("name", ""))
+        key = f"{slug}-{payload_digest(opportunity)[:12]}"
+        if key in checkpoint.completed:
+            counts["skipped"] += 1
+            continue
+        if len(running) >= concurrency:
+            _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        running.add(asyncio.create_task(run_one(opportunity, key, output_dir / f"{key}-spec.{extension}")))
+    if running:
+        await asyncio.wait(running)
+
+    elapsed = time.perf_counter() - started
+    processed = counts["done"] + counts["failed"]
+    return {
+        **counts,
+        "seconds": round(elapsed, 1),
+        "per_hour": round(processed / elapsed * 3600) if processed and elapsed else 0,
+    }
+
+
+# The spec-iterator plugin's own outputs/specs, where the /generate command saves specs too
+DEFAULT_OUTPUT_DIR = Path(__file__).resolve().parent.parent / "outputs" / "specs"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate specs for a file of validated opportunities")
+    parser.add_argument("source", type=Path, help="validated-opportunities-*.json or a JSONL file")
+    parser.add_argument(
+        "--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR,
+        help="Where to write specs (default: spec-iterator-mcp/outputs/specs)",
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Opportunities processed at once")
+    parser.add_argument("--format", choices=("markdown", "json"), default="markdown")
+    parser.add_argument("--checkpoint", type=Path, help="Progress file (default: <output-dir>/.batch-checkpoint.jsonl)")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_batch(args.source, args.output_dir, args.concurrency, args.format, args.checkpoint))
+    print(
+        f"> {summary['done']} done, {summary['failed']} failed, {summary['skipped']} already done "
+        f"in {summary['seconds']}s ({summary['per_hour']}/hour)"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
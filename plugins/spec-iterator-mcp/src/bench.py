@@ -0,0 +1,877 @@
+"""Microbenchmarks for the pure-Python hot paths, with baseline regression gates.
+
+Usage:
+    python bench.py                    # run and compare against the stored baseline (recorded on the first run)
+    python bench.py --save             # run and store the results as the new baseline
+    python bench.py -k completeness    # run only benchmarks whose name contains "completeness"
+    python bench.py --memory           # resident bytes per session, pydantic vs compact
+    python bench.py --transports       # per-call overhead, stdio vs streamable HTTP
+    python bench.py --event-log        # event log write size and recovery time at 1M events
+
+Exits non-zero when a benchmark is slower or allocates more than the baseline by
+more than the configured threshold. The first run on a machine records the baseline
+(bench-baseline.json, not committed), as does the first run of a benchmark that has no
+entry yet; later runs compare against it.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from models import (
+    Audience,
+    Clarification,
+    GeneratedSpec,
+    QuestionCategory,
+    QuestionPriority,
+    Session,
+    SessionContext,
+)
+
+DEFAULT_BASELINE = Path(__file__).with_name("bench-baseline.json")
+SESSION_SIZES = (10, 100, 1000)
+SPEC_SIZE = 300
+
+# name -> factory; the factory builds fixtures once and returns the callable to time
+BENCHMARKS: dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str, sizes: tuple[int, ...] | None = None):
+    """Register a benchmark factory, optionally once per synthetic input size."""
+    def decorator(factory: Callable[..., Callable[[], Any]]):
+        if sizes is None:
+            BENCHMARKS[name] = factory
+        else:
+            for size in sizes:
+                BENCHMARKS[f"{name}[{size}]"] = lambda size=size: factory(size)
+        return factory
+    return decorator
+
+
+# Synthetic fixtures
+
+def make_session(n_clarifications: int, answered_ratio: float = 0.5) -> Session:
+    """Build a session with n clarifications spread across all categories."""
+    categories = list(QuestionCategory)
+    priorities = list(QuestionPriority)
+    answered_cutoff = int(n_clarifications * answered_ratio)
+    now = datetime.now()
+
+    clarifications = [
+        Clarification(
+            id=f"q{i // 5 + 1}_{i % 5 + 1}",
+            question=f"How should the system handle scenario {i} for returning customers?",
+            answer=(
+                f"Scenario {i} is handled by retrying twice, then notifying support by email."
+                if i < answered_cutoff else None
+            ),
+            category=categories[i % len(categories)],
+            priority=priorities[i % len(priorities)],
+            why=f"Determines behaviour of component {i} under load and failure conditions.",
+        )
+        for i in range(n_clarifications)
+    ]
+
+    return Session(
+        id="00000000-0000-0000-0000-000000000000",
+        created_at=now,
+        updated_at=now,
+        requirement="We need order tracking for customers, with notifications and returns. " * 4,
+        context=SessionContext(domain="e-commerce", audience=Audience.MIXED),
+        clarifications=clarifications,
+        assumptions=[f"Assumption {i}" for i in range(n_clarifications // 10)],
+        round_count=max(1, n_clarifications // 5),
+    )
+
+
+def make_spec_data(n_items: int) -> dict[str, Any]:
+    """Build a raw spec payload, as returned by the compiler prompt, with n features and edge cases."""
+    return {
+        "title": "Order Tracking",
+        "problem_statement": {
+            "pain": "Customers cannot see where their order is.",
+            "who": "End customers and support reps",
+            "current_workarounds": [f"Workaround {i}" for i in range(10)],
+        },
+        "user_flow": [
+            {"step": i + 1, "actor": "Customer", "action": f"Action {i}", "outcome": f"Outcome {i}"}
+            for i in range(n_items // 10)
+        ],
+        "features": [
+            {
+                "name": f"Feature {i}",
+                "description": f"Feature {i} lets customers track stage {i} of their order.",
+                "acceptance_criteria": [f"Criterion {i}.{j} is met" for j in range(5)],
+                "priority": ("mvp", "v2", "future")[i % 3],
+            }
+            for i in range(n_items)
+        ],
+        "edge_cases": [
+            {"scenario": f"Carrier {i} API is down", "handling": f"Show cached status {i}"}
+            for i in range(n_items)
+        ],
+        "assumptions": [f"Assumption {i}" for i in range(n_items // 10)],
+        "open_questions": [f"Open question {i}" for i in range(n_items // 10)],
+    }
+
+
+# Benchmarks
+
+@benchmark("calculate_completeness", SESSION_SIZES)
+def bench_calculate_completeness(size: int):
+    from main import calculate_completeness
+    session = make_session(size)
+    return lambda: calculate_completeness(session)
+
+
+@benchmark("build_analyzer_input")
+def bench_build_analyzer_input():
+    from prompts import build_analyzer_input
+    requirement = make_session(0).requirement
+    return lambda: build_analyzer_input(requirement, "e-commerce", "mixed")
+
+
+@benchmark("build_question_generator_input", SESSION_SIZES)
+def bench_build_question_generator_input(size: int):
+    from prompts import build_question_generator_input
+    session = make_session(size)
+    return lambda: build_question_generator_input(session)
+
+
+@benchmark("build_gap_analyzer_input", SESSION_SIZES)
+def bench_build_gap_analyzer_input(size: int):
+    from prompts import build_gap_analyzer_input
+    session = make_session(size)
+    return lambda: build_gap_analyzer_input(session)
+
+
+@benchmark("build_spec_compiler_input", SESSION_SIZES)
+def bench_build_spec_compiler_input(size: int):
+    from prompts import build_spec_compiler_input
+    session = make_session(size)
+    return lambda: build_spec_compiler_input(session)
+
+
+@benchmark("parse_json_response")
+def bench_parse_json_response():
+    from main import parse_json_response
+    response = "```json\n" + json.dumps(make_spec_data(SPEC_SIZE), indent=2) + "\n```"
+    return lambda: parse_json_response(response)
+
+
+@benchmark("validate_generated_spec")
+def bench_validate_generated_spec():
+    data = make_spec_data(SPEC_SIZE)
+    return lambda: GeneratedSpec(**data)
+
+
+@benchmark("format_spec_as_markdown")
+def bench_format_spec_as_markdown():
+    from main import format_spec_as_markdown
+    spec = GeneratedSpec(**make_spec_data(SPEC_SIZE))
+    session = make_session(100)
+    return lambda: format_spec_as_markdown(spec, session)
+
+
+# Session hand-off between processes
+
+SNAPSHOT_SESSIONS = 20_000
+
+
+def _snapshot_store(path: Path):
+    from store import SessionStore
+
+    template = make_session(10)
+    store = SessionStore()
+    for i in range(SNAPSHOT_SESSIONS):
+        session_id = f"{i:08d}-0000-0000-0000-000000000000"
+        store[session_id] = template.model_copy(update={"id": session_id})
+    return store
+
+
+@benchmark("snapshot_save[20000]")
+def bench_snapshot_save():
+    import tempfile
+
+    path = Path(tempfile.mkdtemp()) / "sessions.msgpack"
+    store = _snapshot_store(path)
+    return lambda: store.save_snapshot(path)
+
+
+@benchmark("snapshot_restore[20000]")
+def bench_snapshot_restore():
+    import tempfile
+    from store import SessionStore
+
+    path = Path(tempfile.mkdtemp()) / "sessions.msgpack"
+    _snapshot_store(path).save_snapshot(path)
+
+    def restore():
+        # Boot-time cost: decode the file, then materialize the first session a user touches
+        store = SessionStore()
+        store.attach_snapshot(path)
+        return store.get("00000000-0000-0000-0000-000000000000")
+
+    return restore
+
+
+@benchmark("event_log_answer", sizes=SESSION_SIZES)
+def bench_event_log_answer(n: int):
+    """One answer recorded through a checkout with the event log attached (fsync not included)."""
+    import itertools
+    import tempfile
+    from eventlog import EventLog
+    from store import SessionStore
+
+    store = SessionStore()
+    store.attach_log(EventLog(tempfile.mkdtemp(), fsync_interval=3600))
+    session = make_session(n)
+    store[session.id] = session
+    answers = itertools.cycle(("Yes, by email.", "No, only in the app."))
+
+    def answer():
+        with store.checkout(session.id) as live:
+            live.clarifications[0].answer = next(answers)
+            live.updated_at = datetime.now()
+    return answer
+
+
+def _with_store(store, call: Callable[[], Any]) -> Callable[[], Any]:
+    """Run a tool call against `store` as main.sessions, restoring the server's own store after."""
+    import asyncio
+    import main
+
+    loop = asyncio.new_event_loop()
+
+    def run():
+        previous = main.sessions
+        main.sessions = store
+        try:
+            return loop.run_until_complete(call())
+        finally:
+            main.sessions = previous
+    return run
+
+
+def _status_poll(n: int, unchanged: bool) -> Callable[[], Any]:
+    from store import SessionStore
+    import main
+
+    store = SessionStore()
+    session = make_session(n)
+    store[session.id] = session
+    if_version = session.version if unchanged else None
+    return _with_store(store, lambda: main.spec_get_status(session.id, if_version=if_version))
+
+
+@benchmark("status_poll", sizes=SESSION_SIZES)
+def bench_status_poll(n: int):
+    """spec_get_status without if_version: the full status of an idle session."""
+    return _status_poll(n, unchanged=False)
+
+
+@benchmark("status_poll_not_modified", sizes=SESSION_SIZES)
+def bench_status_poll_not_modified(n: int):
+    """spec_get_status with the current if_version."""
+    return _status_poll(n, unchanged=True)
+
+
+LISTED_SESSIONS = 10_000
+
+
+def _list_poll(since_cursor: bool) -> Callable[[], Any]:
+    from store import SessionStore
+    import main
+
+    store = SessionStore()
+    for i in range(LISTED_SESSIONS):
+        session = make_session(10)
+        session.id = f"{i:08d}"
+        store[session.id] = session
+    since = store.cursor if since_cursor else None
+    return _with_store(store, lambda: main.spec_list_sessions(since))
+
+
+@benchmark(f"list_poll[{LISTED_SESSIONS}]")
+def bench_list_poll():
+    return _list_poll(since_cursor=False)
+
+
+@benchmark(f"list_poll_since[{LISTED_SESSIONS}]")
+def bench_list_poll_since():
+    return _list_poll(since_cursor=True)
+
+
+@benchmark("session_compact", sizes=SESSION_SIZES)
+def bench_session_compact(n: int):
+    from compact import CompactSession
+
+    session = make_session(n)
+    return lambda: CompactSession.from_session(session)
+
+
+@benchmark("session_materialize", sizes=SESSION_SIZES)
+def bench_session_materialize(n: int):
+    from compact import CompactSession
+
+    compact = CompactSession.from_session(make_session(n))
+    return compact.to_session
+
+
+@benchmark("session_token_issue", sizes=SESSION_SIZES)
+def bench_session_token_issue(n: int):
+    from session_token import SessionTokens
+
+    session, tokens = make_session(n), SessionTokens(["bench-secret"], max_bytes=1 << 20)
+    return lambda: tokens.issue(session)
+
+
+@benchmark("session_token_verify", sizes=SESSION_SIZES)
+def bench_session_token_verify(n: int):
+    from session_token import SessionTokens
+
+    session, tokens = make_session(n), SessionTokens(["bench-secret"], max_bytes=1 << 20)
+    token = tokens.issue(session)
+    return lambda: tokens.open(token, session.id)
+
+
+@benchmark("session_token_issue_encrypted", sizes=SESSION_SIZES)
+def bench_session_token_issue_encrypted(n: int):
+    from session_token import SessionTokens
+
+    session, tokens = make_session(n), SessionTokens(["bench-secret"], encrypt=True, max_bytes=1 << 20)
+    return lambda: tokens.issue(session)
+
+
+@benchmark("session_token_verify_encrypted", sizes=SESSION_SIZES)
+def bench_session_token_verify_encrypted(n: int):
+    from session_token import SessionTokens
+
+    session, tokens = make_session(n), SessionTokens(["bench-secret"], encrypt=True, max_bytes=1 << 20)
+    token = tokens.issue(session)
+    return lambda: tokens.open(token, session.id)
+
+
+@benchmark("session_token_issue_compacted[1000]")
+def bench_session_token_issue_compacted():
+    from session_token import SessionTokens
+
+    session, tokens = make_session(1000), SessionTokens(["bench-secret"])
+    return lambda: tokens.issue(session)
+
+
+@benchmark("fallback_questions", sizes=SESSION_SIZES)
+def bench_fallback_questions(n: int):
+    from fallback import fallback_questions
+
+    session = make_session(n)
+    return lambda: fallback_questions(session)
+
+
+@benchmark("budget_fit_gaps", sizes=SESSION_SIZES)
+def bench_budget_fit_gaps(n: int):
+    """Gap analyzer input against a 4000-token budget: a no-op for small sessions, trimmed for large."""
+    from budget import TokenBudget
+    from prompts import GAP_ANALYZER_PROMPT, build_gap_analyzer_input
+
+    text, budget = build_gap_analyzer_input(make_session(n)), TokenBudget(4000)
+    return lambda: budget.fit("gaps", GAP_ANALYZER_PROMPT, text)
+
+
+LARGE_DOCUMENT_CHARS = 200_000
+
+
+@benchmark(f"large_input_local[{LARGE_DOCUMENT_CHARS}]")
+def bench_large_input_local():
+    """Local work around the section calls for a long document: split, merge and digest."""
+    from chunking import build_digest, merge_analyses, section_heading, split_sections
+    from models import AnalyzedQuestion, SectionAnalysis
+
+    paragraph = " ".join(["Orders are tracked per carrier and customers are notified by email or SMS."] * 8)
+    document = "\n\n".join(
+        f"## {i}. Area {i}\n\n{paragraph}" for i in range(LARGE_DOCUMENT_CHARS // (len(paragraph) + 20))
+    )
+    categories, priorities = list(QuestionCategory), list(QuestionPriority)
+    analyses = [
+        SectionAnalysis(
+            summary=f"Section {n} sets limits for area {n}.",
+            core_need="Track orders",
+            entities=["Order", "Carrier", f"Area {n}"],
+            implicit_assumptions=["Customers have an email address", f"Area {n} has its own carrier contract"],
+            questions=[
+                AnalyzedQuestion(
+                    question=f"Which {topic} rules apply to area {n}?",
+                    category=categories[(n + i) % len(categories)],
+                    priority=priorities[(n + i) % len(priorities)],
+                    why="Needed for the design.",
+                )
+                for i, topic in enumerate(("refund", "retention", "notification", "escalation", "pricing"))
+            ],
+        )
+        for n in range(8)
+    ]
+
+    def run():
+        sections = split_sections(document)
+        analysis = merge_analyses(analyses)
+        summaries = [(section_heading(s), a.summary) for s, a in zip(sections, analyses)]
+        return build_digest(analysis.core_need, len(document), summaries, analysis.entities)
+
+    return run
+
+
+@benchmark("profile_phase_disabled")
+def bench_profile_phase_disabled():
+    from profiling import phase
+
+    def run():
+        with phase("parse"):
+            pass
+    return run
+
+
+INDEX_SESSIONS = 100_000
+
+
+@benchmark(f"warm_start_search[{INDEX_SESSIONS}]")
+def bench_warm_start_search():
+    import random
+    from similarity import SessionIndex
+
+    rng = random.Random(0)
+    nouns = (
+        "order tracking customer notification return invoice payment subscription dashboard report "
+        "inventory warehouse shipment carrier refund loyalty coupon review catalog checkout cart "
+        "account login audit compliance export booking appointment patient claim ledger budget"
+    ).split()
+    domains = ("e-commerce", "healthcare", "fintech", "logistics", None)
+
+    def requirement() -> str:
+        words = rng.sample(nouns, 5)
+        return f"We need {words[0]} {words[1]} for {words[2]}s with {words[3]} and {words[4]} {rng.randrange(5000)}"
+
+    index = SessionIndex()
+    for i in range(INDEX_SESSIONS):
+        index.add(f"{i:08d}", requirement(), rng.choice(domains))
+    queries = [(requirement(), rng.choice(domains)) for _ in range(64)]
+    cycle = iter(range(10**12))
+
+    return lambda: index.search(*queries[next(cycle) % len(queries)])
+
+
+# Per-request cost of the HTTP middleware stack, driven directly over ASGI
+
+SMITHERY_CONFIG = "eyJBTlRIUk9QSUNfQVBJX0tFWSI6ICJzay1hbnQtYmVuY2gifQ=="  # {"ANTHROPIC_API_KEY": "sk-ant-bench"}
+STREAM_CHUNKS = 20
+
+
+async def _endpoint(scope, receive, send):
+    """Stand-in for the MCP transport: a JSON body, or an SSE-style stream of chunks."""
+    await receive()
+    streamed = scope["path"].endswith("/stream")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream" if streamed else b"application/json")],
+    })
+    chunks = STREAM_CHUNKS if streamed else 1
+    for i in range(chunks):
+        await send({"type": "http.response.body", "body": b'data: {"ok": true}\n\n', "more_body": i < chunks - 1})
+
+
+def _asgi_request(app, path: str) -> Callable[[], Any]:
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": f"config={SMITHERY_CONFIG}".encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"origin", b"http://localhost"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8080),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"jsonrpc": "2.0", "id": 1, "method": "ping"}', "more_body": False}
+
+    async def send(message):
+        pass
+
+    return lambda: loop.run_until_complete(app(dict(scope), receive, send))
+
+
+def _cors(app):
+    from starlette.middleware.cors import CORSMiddleware
+
+    return CORSMiddleware(
+        app,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "OPTIONS"],
+        allow_headers=["*"],
+        expose_headers=["mcp-session-id", "mcp-protocol-version"],
+        max_age=86400,
+    )
+
+
+def _middleware_stack():
+    from middleware import CompressionMiddleware, SmitheryConfigMiddleware
+
+    return _cors(CompressionMiddleware(SmitheryConfigMiddleware(_endpoint)))
+
+
+def _basehttp_stack():
+    """The stack before the raw ASGI rewrite: a BaseHTTPMiddleware that decodes the config on every request."""
+    import base64
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    class SmitheryConfigMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            if request.url.path.startswith("/mcp"):
+                try:
+                    config_b64 = request.query_params.get("config")
+                    if config_b64:
+                        config = json.loads(base64.b64decode(config_b64).decode("utf-8"))
+                        request.state.api_key = config.get("ANTHROPIC_API_KEY")
+                except Exception:
+                    pass
+            return await call_next(request)
+
+    return _cors(SmitheryConfigMiddleware(_endpoint))
+
+
+@benchmark("asgi_bare[json]")
+def bench_asgi_bare_json():
+    return _asgi_request(_endpoint, "/mcp/")
+
+
+@benchmark("asgi_middleware[json]")
+def bench_asgi_middleware_json():
+    return _asgi_request(_middleware_stack(), "/mcp/")
+
+
+@benchmark("asgi_basehttp[json]")
+def bench_asgi_basehttp_json():
+    return _asgi_request(_basehttp_stack(), "/mcp/")
+
+
+@benchmark("asgi_bare[stream]")
+def bench_asgi_bare_stream():
+    return _asgi_request(_endpoint, "/mcp/stream")
+
+
+@benchmark("asgi_middleware[stream]")
+def bench_asgi_middleware_stream():
+    return _asgi_request(_middleware_stack(), "/mcp/stream")
+
+
+@benchmark("asgi_basehttp[stream]")
+def bench_asgi_basehttp_stream():
+    return _asgi_request(_basehttp_stack(), "/mcp/stream")
+
+
+# Runner
+
+def measure(fn: Callable[[], Any], min_time: float = 0.05, repeat: int = 5) -> dict[str, float]:
+    """Return best-of-N seconds per call and peak bytes allocated by a single call."""
+    fn()  # warm caches and lazy imports
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def resident_bytes(build: Callable[[], Any], count: int) -> float:
+    """Bytes retained per object when `count` objects from build() are kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        kept = [build() for _ in range(count)]
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def memory_report() -> None:
+    """Resident bytes per session as pydantic models and in compact form."""
+    import msgpack
+    from compact import CompactSession
+
+    print(f"{'clarifications':<16}{'pydantic':>14}{'compact':>14}{'compact+zlib':>14}")
+    for n in SESSION_SIZES:
+        count = max(10, 2000 // n)
+        pydantic = resident_bytes(lambda: make_session(n), count)
+        # Decoded from msgpack each time, so every copy owns its strings
+        blob = msgpack.packb(make_session(n).model_dump(mode="json"), use_bin_type=True)
+        plain = resident_bytes(lambda: CompactSession.from_data(msgpack.unpackb(blob), compress=False), count)
+        packed = resident_bytes(lambda: CompactSession.from_data(msgpack.unpackb(blob), compress=True), count)
+        print(f"{n:<16}{pydantic:>14,.0f}{plain:>14,.0f}{packed:>14,.0f}")
+
+
+EVENT_LOG_SESSIONS = 10_000
+EVENT_LOG_EVENTS = 1_000_000
+
+
+def event_log_report() -> None:
+    """Bytes per change, and recovery time for a 1M-event log before and after compaction."""
+    import shutil
+    import tempfile
+    from eventlog import EventKind, EventLog, encode
+    from store import SessionStore
+
+    directory = Path(tempfile.mkdtemp())
+    template = make_session(10).model_dump(mode="json")
+    full_bytes = len(encode(EventKind.SNAPSHOT, template["id"], template))
+    # One segment, so the compaction below is measured on its own
+    log = EventLog(directory, fsync_interval=0.05, segment_bytes=1 << 40)
+    started = time.perf_counter()
+    for i in range(EVENT_LOG_SESSIONS):
+        session_id = f"{i:08d}-0000-0000-0000-000000000000"
+        log.append(session_id, [(EventKind.CREATED, {**template, "id": session_id})])
+    n = 0
+    while log.events < EVENT_LOG_EVENTS:
+        n += 1
+        i = n % EVENT_LOG_SESSIONS
+        session_id = f"{i:08d}-0000-0000-0000-000000000000"
+        if log.needs_snapshot(session_id):
+            log.append(session_id, [(EventKind.SNAPSHOT, {**template, "id": session_id})])
+            continue
+        change = [
+            (EventKind.ANSWERS, {f"q1_{n % 5 + 1}": f"Answer {n}: retry twice, then notify support."}),
+            (EventKind.FIELDS, {"completeness": template["completeness"], "updated_at": datetime.now().isoformat()}),
+        ]
+        log.append(session_id, change)
+    log.close()
+    written = time.perf_counter() - started
+    print(f"{'events written':<34}{log.events:>12,} in {written:.1f} s ({log.events / written:,.0f}/s)")
+    print(f"{'records / fsyncs':<34}{log.records:>12,} / {log.fsyncs:,}")
+    delta_bytes = len(encode(EventKind.CHANGES, template["id"], [[int(kind), value] for kind, value in change]))
+    print(f"{'bytes per answer, as events':<34}{delta_bytes:>12,}")
+    print(f"{'bytes per answer, full rewrite':<34}{full_bytes:>12,}  (10 clarifications)")
+
+    def recover(label: str) -> None:
+        store = SessionStore()
+        store.attach_log(EventLog(directory))
+        size = sum(p.stat().st_size for p in directory.glob("*.log"))
+        started = time.perf_counter()
+        count = store.load_snapshot()
+        indexed = time.perf_counter() - started
+        store.get(f"{0:08d}-0000-0000-0000-000000000000")
+        first = time.perf_counter() - started
+        # What the background warm-up does next: every session replayed
+        sum(1 for _ in store.summaries())
+        everything = time.perf_counter() - started
+        print(f"{'recovery, ' + label:<34}{indexed * 1000:>9,.0f} ms  {count:,} sessions, {size / 2**20:,.1f} MiB on disk")
+        print(f"{'  + first session':<34}{first * 1000:>9,.0f} ms")
+        print(f"{'  + all sessions replayed':<34}{everything * 1000:>9,.0f} ms")
+
+    recover("uncompacted")
+    compactor = EventLog(directory)
+    started = time.perf_counter()
+    compactor._compact(compactor._segments()[-1])
+    print(f"{'compaction':<34}{(time.perf_counter() - started) * 1000:>9,.0f} ms")
+    recover("compacted")
+    shutil.rmtree(directory)
+
+
+TRANSPORT_CALLS = 200
+
+
+async def _time_calls(session, calls: int) -> list[float]:
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await session.call_tool("spec_list_sessions", {})
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def _stdio_timings(calls: int) -> tuple[float, list[float]]:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[str(Path(__file__).with_name("main.py")), "--transport", "stdio"],
+        env={**os.environ, "SPEC_ITERATOR_WARMUP": "0"},
+    )
+    spawned = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                first = time.perf_counter() - spawned
+                return first, await _time_calls(session, calls)
+
+
+async def _http_timings(calls: int) -> tuple[float, list[float]]:
+    import socket
+    import subprocess
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("main.py"))],
+        env={**os.environ, "PORT": str(port), "SPEC_ITERATOR_WARMUP": "0"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    break
+            except OSError:
+                await asyncio.sleep(0.01)
+        async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp/") as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                first = time.perf_counter() - spawned
+                return first, await _time_calls(session, calls)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def transport_report(calls: int = TRANSPORT_CALLS) -> None:
+    """Spawn-to-initialized time and per-call latency of a no-op tool over stdio and HTTP."""
+    print(f"{'transport':<12}{'spawn->ready':>14}{'p50/call':>12}{'p95/call':>12}")
+    for name, run in (("stdio", _stdio_timings), ("http", _http_timings)):
+        first, timings = asyncio.run(run(calls))
+        timings.sort()
+        p50, p95 = timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+        print(f"{name:<12}{first * 1000:>11.0f} ms{p50 * 1e6:>9.0f} us{p95 * 1e6:>9.0f} us")
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    time_threshold: float,
+    alloc_threshold: float,
+) -> list[str]:
+    """Return a description of every metric that regressed beyond its threshold.
+
+    Benchmarks without a baseline entry are skipped; main() records them.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, threshold in (("seconds", time_threshold), ("peak_bytes", alloc_threshold)):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                change = (current[metric] / previous[metric] - 1) * 100
+                regressions.append(f"{name}: {metric} +{change:.0f}% (limit +{threshold * 100:.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark spec-iterator hot paths.")
+    parser.add_argument("-k", dest="pattern", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline file to compare against.")
+    parser.add_argument("--save", action="store_true", help="Store results as the new baseline.")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="Allowed allocation growth.")
+    parser.add_argument("--memory", action="store_true", help="Report resident bytes per session and exit.")
+    parser.add_argument("--transports", action="store_true", help="Compare stdio and HTTP per-call overhead and exit.")
+    parser.add_argument("--event-log", action="store_true", help="Measure event log writes and recovery at 1M events and exit.")
+    args = parser.parse_args()
+
+    if args.memory:
+        memory_report()
+        return 0
+    if args.transports:
+        transport_report()
+        return 0
+    if args.event_log:
+        event_log_report()
+        return 0
+
+    baseline: dict[str, dict[str, float]] = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    results: dict[str, dict[str, float]] = {}
+    for name, factory in BENCHMARKS.items():
+        if args.pattern and args.pattern not in name:
+            continue
+        results[name] = measure(factory())
+        previous = baseline.get(name)
+        delta = (
+            f"  ({(results[name]['seconds'] / previous['seconds'] - 1) * 100:+.0f}%)"
+            if previous and previous["seconds"] else ""
+        )
+        print(
+            f"{name:<45} {results[name]['seconds'] * 1e6:>12.1f} us"
+            f"  {results[name]['peak_bytes'] / 1024:>10.1f} KiB{delta}"
+        )
+
+    if args.save:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        print(f"> Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.time_threshold, args.alloc_threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+
+    # Timings only compare on one machine, so the first measurement here becomes the baseline
+    new = {name: result for name, result in results.items() if name not in baseline}
+    if new:
+        baseline.update(new)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        print(f"> Recorded {len(new)} new baseline entr{'y' if len(new) == 1 else 'ies'} in {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Circuit breaker for Claude calls, so an API outage fails fast instead of timing out per call."""
+
+import time
+from collections import deque
+from enum import Enum
+from typing import Any
+
+# Outcomes older than this do not count towards the error rate
+WINDOW_SECONDS = 60
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class ClaudeUnavailable(ValueError):
+    """Claude could not be reached, is overloaded, or is rate limiting; the server can fall back."""
+
+
+class CircuitOpenError(ClaudeUnavailable):
+    """Raised instead of calling Claude while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"Anthropic API is failing; calls are paused for {retry_after:.0f}s. "
+            "Wait a few moments and retry the operation."
+        )
+
+
+class CircuitBreaker:
+    """Opens when the recent error rate crosses a threshold, then lets one probe call through per cooldown.
+
+    closed -> open: at least `min_calls` outcomes in the window, and `error_rate` of them failed
+    open -> half_open: `cooldown` seconds have passed; the next call is the probe
+    half_open -> closed on a successful probe, back to open on a failed one
+
+    Every transition starts a new `generation`. A call records its outcome with the generation
+    it started in, and outcomes from an earlier generation are ignored: a slow call that began
+    before the circuit opened says nothing about the API after a successful probe.
+
+    Used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(self, error_rate: float = 0.5, min_calls: int = 5, cooldown: float = 30):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.generation = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._probing = False
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > WINDOW_SECONDS:
+            self._outcomes.popleft()
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.cooldown - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go to Claude now. If so, note `generation` and call record() with its outcome."""
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.OPEN and self.retry_after() > 0:
+            return False
+        if self._probing:
+            return False
+        self.state = CircuitState.HALF_OPEN
+        self.generation += 1
+        self._probing = True
+        return True
+
+    def record(self, success: bool, generation: int) -> None:
+        """Record the outcome of a call that started in `generation`."""
+        if generation != self.generation:
+            return
+        now = time.monotonic()
+        if self.state == CircuitState.HALF_OPEN:
+            self._probing = False
+            if success:
+                self.state = CircuitState.CLOSED
+                self.generation += 1
+                self._outcomes.clear()
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, success))
+        self._trim(now)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        if len(self._outcomes) >= self.min_calls and failures >= self.error_rate * len(self._outcomes):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = CircuitState.OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self.generation += 1
+        self._outcomes.clear()
+
+    def describe(self) -> dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "state": self.state.value,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(1 for _, ok in self._outcomes if not ok),
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == CircuitState.OPEN else None,
+            "times_opened": self.times_opened,
+        }
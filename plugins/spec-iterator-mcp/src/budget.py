@@ -0,0 +1,203 @@
+"""Token budgets for Claude calls: local input estimates, trimming, and max_tokens per prompt.
+
+Input size is estimated from character count, with the characters-per-token ratio calibrated
+per prompt from the `usage` the API reports, so no tokenizer is needed. Inputs over the budget
+are trimmed in steps, cheapest information first, until they fit:
+
+    1. drop the `why` of answered questions
+    2. clip long answers and evidence to 1200 characters (head and tail kept)
+    3. clip the requirement to 8000 and answers to 400 characters
+    4. clip the requirement to 3000 and every other string to 160 characters
+
+Questions still waiting for an answer are never clipped. `max_tokens` starts at a per-prompt
+default and then follows the observed output sizes (a high percentile plus headroom).
+"""
+
+import json
+import math
+from collections import deque
+from typing import Any
+
+# Initial characters per token for JSON-heavy English input; replaced by observations
+CHARS_PER_TOKEN = 3.5
+CALIBRATION_WEIGHT = 0.2
+
+DEFAULT_INPUT_BUDGET = 24000
+
+# max_tokens until enough outputs of a prompt have been seen
+DEFAULT_MAX_TOKENS = {
+    "analyzer": 3072,
+    "sections": 2048,
+    "questions": 2048,
+    "gaps": 2048,
+    "compiler": 8192,
+    "assumptions": 3072,
+}
+MIN_MAX_TOKENS = 1024
+MAX_MAX_TOKENS = 16384
+OUTPUT_PERCENTILE = 0.99
+OUTPUT_HEADROOM = 1.5
+MIN_OBSERVATIONS = 20
+OBSERVATIONS = 200
+
+# (requirement limit, answer limit, other string limit) per trimming step; None keeps the text
+TRIM_STEPS: tuple[tuple[int | None, int | None, int | None], ...] = (
+    (None, None, None),
+    (None, 1200, 1200),
+    (8000, 400, 400),
+    (3000, 160, 160),
+)
+
+# Payload keys that hold supporting material rather than the questions being asked
+SUPPORTING_KEYS = ("evidence", "assumptions", "known_questions", "rejected_as_duplicates")
+
+
+def clip_middle(text: str, limit: int) -> str:
+    """Shorten text to about limit characters, keeping its start and end."""
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]} …[{len(text) - limit} characters trimmed]… {text[-tail:]}"
+
+
+def _clip_strings(value: Any, limit: int, saved: list[int]) -> Any:
+    if isinstance(value, str):
+        clipped = clip_middle(value, limit)
+        saved[0] += len(value) - len(clipped)
+        return clipped
+    if isinstance(value, list):
+        return [_clip_strings(item, limit, saved) for item in value]
+    if isinstance(value, dict):
+        return {key: _clip_strings(item, limit, saved) for key, item in value.items()}
+    return value
+
+
+def trim_payload(payload: dict[str, Any], step: int) -> int:
+    """Apply one trimming step to a prompt input payload in place.
+
+    Returns about how many characters the step removed from the serialized payload, so
+    callers can check the budget without serializing after every step.
+    """
+    requirement_limit, answer_limit, other_limit = TRIM_STEPS[step]
+    saved = [0]
+    for c in payload.get("clarifications", ()):
+        if c.get("answer") is None:
+            continue
+        if c.get("why"):
+            saved[0] += len(c["why"])
+            c["why"] = None
+        if answer_limit is not None:
+            c["answer"] = _clip_strings(c["answer"], answer_limit, saved)
+        if other_limit is not None and step == len(TRIM_STEPS) - 1:
+            c["question"] = _clip_strings(c["question"], other_limit, saved)
+    if requirement_limit is not None and isinstance(payload.get("requirement"), str):
+        payload["requirement"] = _clip_strings(payload["requirement"], requirement_limit, saved)
+    if other_limit is not None:
+        for key in SUPPORTING_KEYS:
+            if key in payload:
+                payload[key] = _clip_strings(payload[key], other_limit, saved)
+    return saved[0]
+
+
+class PromptStats:
+    """Observed input density and output sizes for one prompt."""
+
+    __slots__ = ("chars_per_token", "outputs", "calls", "trimmed", "continued")
+
+    def __init__(self):
+        self.chars_per_token = CHARS_PER_TOKEN
+        self.outputs: deque[int] = deque(maxlen=OBSERVATIONS)
+        self.calls = 0
+        self.trimmed = 0
+        self.continued = 0
+
+    def output_percentile(self, fraction: float) -> int | None:
+        if not self.outputs:
+            return None
+        ordered = sorted(self.outputs)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class TokenBudget:
+    """Fits prompt inputs to a token budget and sizes max_tokens per prompt.
+
+    Used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(self, input_budget: int = DEFAULT_INPUT_BUDGET):
+        self.input_budget = input_budget
+        self._stats: dict[str, PromptStats] = {}
+
+    def stats(self, prompt: str) -> PromptStats:
+        stats = self._stats.get(prompt)
+        if stats is None:
+            stats = self._stats[prompt] = PromptStats()
+        return stats
+
+    def estimate(self, prompt: str, system_prompt: str, user_input: str) -> int:
+        """Estimated input tokens for a call: the system prompt and the user input together."""
+        return math.ceil((len(system_prompt) + len(user_input)) / self.stats(prompt).chars_per_token)
+
+    def fit(self, prompt: str, system_prompt: str, user_input: str) -> str:
+        """The input itself if it fits the budget, otherwise the least-trimmed version that does.
+
+        The system prompt counts against the budget (the calibration from `observe` includes
+        it), but only the user input is trimmed.
+        """
+        if self.input_budget <= 0 or self.estimate(prompt, system_prompt, user_input) <= self.input_budget:
+            return user_input
+        self.stats(prompt).trimmed += 1
+        limit = max(int(self.input_budget * self.stats(prompt).chars_per_token) - len(system_prompt), 0)
+        try:
+            payload = json.loads(user_input)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return clip_middle(user_input, limit)
+
+        size = len(user_input)
+        for step in range(len(TRIM_STEPS)):
+            size -= trim_payload(payload, step)
+            if size <= limit:
+                break
+        # Past the last step the input is sent as is; only pending questions are left to cut
+        return json.dumps(payload, default=str)
+
+    def max_tokens(self, prompt: str) -> int:
+        """max_tokens for the next call with this prompt."""
+        stats = self.stats(prompt)
+        if len(stats.outputs) < MIN_OBSERVATIONS:
+            return DEFAULT_MAX_TOKENS.get(prompt, 4096)
+        high = stats.output_percentile(OUTPUT_PERCENTILE) * OUTPUT_HEADROOM
+        # Round up to a multiple of 256 so the value does not change on every call
+        return min(max(math.ceil(high / 256) * 256, MIN_MAX_TOKENS), MAX_MAX_TOKENS)
+
+    def observe(
+        self, prompt: str, input_chars: int, input_tokens: int, output_tokens: int, continuations: int
+    ) -> None:
+        """Record a completed call's usage; input_chars counts the system prompt and the input."""
+        stats = self.stats(prompt)
+        stats.calls += 1
+        stats.continued += 1 if continuations else 0
+        stats.outputs.append(output_tokens)
+        if input_tokens > 0:
+            observed = input_chars / input_tokens
+            stats.chars_per_token += CALIBRATION_WEIGHT * (observed - stats.chars_per_token)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "input_budget_tokens": self.input_budget,
+            "prompts": {
+                prompt: {
+                    "max_tokens": self.max_tokens(prompt),
+                    "calls": stats.calls,
+                    "trimmed_inputs": stats.trimmed,
+                    "continued_outputs": stats.continued,
+                    "output_tokens_p50": stats.output_percentile(0.5),
+                    "output_tokens_p99": stats.output_percentile(OUTPUT_PERCENTILE),
+                    "chars_per_token": round(stats.chars_per_token, 2),
+                }
+                for prompt, stats in sorted(self._stats.items())
+            },
+        }
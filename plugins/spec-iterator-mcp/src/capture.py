@@ -0,0 +1,181 @@
+"""Traffic capture and Claude response replay for reproducing production load offline.
+
+Capture files are append-only JSONL with one compact record per line:
+
+    {"kind": "http", "ts": ..., "ms": ..., "method": "POST", "path": "/mcp/", "headers": {...},
+     "body": {...}, "status": 200, "response_headers": {...}, "response": "..."}
+    {"kind": "claude", "ts": ..., "ms": ..., "key": "...", "prompt": "...", "output": "..."}
+
+API keys never reach the file: query strings (which carry the Smithery config) are
+dropped, only an allow-list of headers is kept, and anything shaped like an Anthropic
+key is replaced in bodies.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any
+
+API_KEY_PATTERN = re.compile(r"sk-ant-[A-Za-z0-9_\-]+")
+REDACTED = "[REDACTED]"
+
+# Headers needed to re-drive an MCP session; everything else is dropped
+CAPTURED_HEADERS = ("content-type", "accept", "mcp-session-id", "mcp-protocol-version", "last-event-id")
+
+
+def redact(text: str) -> str:
+    """Replace anything that looks like an Anthropic API key."""
+    return API_KEY_PATTERN.sub(REDACTED, text)
+
+
+def prompt_key(system_prompt: str, user_input: str) -> str:
+    """Stable key for a Claude call, used to match replayed calls to captured ones."""
+    digest = hashlib.sha256(f"{system_prompt}\0{user_input}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def prompt_name(system_prompt: str) -> str:
+    """Short identifier for a system prompt, used as the replay fallback key."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:8]
+
+
+class TrafficCapture:
+    """Append-only writer for captured HTTP exchanges and Claude responses."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def record_http(
+        self,
+        started: float,
+        elapsed: float,
+        method: str,
+        path: str,
+        headers: dict[str, str],
+        body: bytes,
+        status: int,
+        response_headers: dict[str, str],
+        response: bytes,
+    ) -> None:
+        """Record one MCP HTTP exchange."""
+        body_text = redact(body.decode("utf-8", errors="replace"))
+        try:
+            parsed_body: Any = json.loads(body_text) if body_text else None
+        except json.JSONDecodeError:
+            parsed_body = body_text
+
+        self._write({
+            "kind": "http",
+            "ts": round(started, 6),
+            "ms": round(elapsed * 1000, 3),
+            "method": method,
+            "path": path,
+            "headers": {k: redact(v) for k, v in headers.items() if k in CAPTURED_HEADERS},
+            "body": parsed_body,
+            "status": status,
+            "response_headers": {
+                k: v for k, v in response_headers.items() if k in CAPTURED_HEADERS
+            },
+            "response": redact(response.decode("utf-8", errors="replace")),
+        })
+
+    def record_claude(self, system_prompt: str, user_input: str, output: str, elapsed: float) -> None:
+        """Record the Claude response triggered by a tool call."""
+        self._write({
+            "kind": "claude",
+            "ts": round(time.time(), 6),
+            "ms": round(elapsed * 1000, 3),
+            "key": prompt_key(system_prompt, user_input),
+            "prompt": prompt_name(system_prompt),
+            "output": output,
+        })
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ClaudeReplay:
+    """Serves Claude responses from a capture file instead of calling the API."""
+
+    def __init__(self, path: str | Path, speed: float = 1.0):
+        self.speed = speed
+        self._by_key: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        self._by_prompt: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+
+        for record in read_capture(path):
+            if record.get("kind") == "claude":
+                self._by_key[record["key"]].append(record)
+                self._by_prompt[record["prompt"]].append(record)
+
+    def _take(self, queue: deque[dict[str, Any]]) -> dict[str, Any] | None:
+        if not queue:
+            return None
+        # Keep the last response around so repeated calls still get an answer
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    async def respond(self, system_prompt: str, user_input: str) -> str:
+        """Return the captured response, waiting the captured latency scaled by speed."""
+        record = (
+            self._take(self._by_key.get(prompt_key(system_prompt, user_input), deque()))
+            or self._take(self._by_prompt.get(prompt_name(system_prompt), deque()))
+        )
+        if record is None:
+            raise ValueError("No captured Claude response available for this prompt.")
+
+        if self.speed > 0:
+            await asyncio.sleep(record["ms"] / 1000 / self.speed)
+        return record["output"]
+
+
+def read_capture(path: str | Path) -> list[dict[str, Any]]:
+    """Load every record from a capture file, skipping a truncated final line."""
+    records = []
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+# Process-wide capture/replay state (enabled from main via env)
+_capture: TrafficCapture | None = None
+_replay: ClaudeReplay | None = None
+
+
+def enable_capture(path: str | Path) -> TrafficCapture:
+    """Start recording traffic to the given file."""
+    global _capture
+    if _capture is None:
+        _capture = TrafficCapture(path)
+    return _capture
+
+
+def enable_replay(path: str | Path, speed: float = 1.0) -> ClaudeReplay:
+    """Serve Claude responses from the given capture file."""
+    global _replay
+    _replay = ClaudeReplay(path, speed=speed)
+    return _replay
+
+
+def get_capture() -> TrafficCapture | None:
+    return _capture
+
+
+def get_replay() -> ClaudeReplay | None:
+    return _replay
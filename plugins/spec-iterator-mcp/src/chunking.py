@@ -0,0 +1,158 @@
+"""Long requirement documents: sections, merging of per-section analyses, and digests.
+
+A pasted PRD or meeting transcript is split into at most MAX_SECTIONS sections, which are
+analyzed concurrently, so the wall time stays close to that of one call as documents grow.
+The analyses are merged locally: entities and assumptions deduplicated, questions passed
+through the same near-duplicate test as follow-up rounds. The session keeps a digest of
+the section summaries, which later prompts send in place of the document.
+"""
+
+import math
+import re
+
+from budget import clip_middle
+from models import AnalyzedQuestion, RequirementAnalysis, SectionAnalysis
+from similarity import DUPLICATE_THRESHOLD, PRIORITY_RANK, dedupe_questions, similarity, terms
+
+# Requirement length from which spec_start_session analyzes in sections
+DEFAULT_LARGE_INPUT_CHARS = 12000
+SECTION_CHARS = 6000
+# Longer documents get longer sections rather than more of them
+MAX_SECTIONS = 8
+MAX_QUESTIONS = 10
+MAX_ENTITIES = 30
+SUMMARY_CHARS = 400
+HEADING_CHARS = 80
+
+BLANK_LINES = re.compile(r"\n\s*\n")
+HEADING = re.compile(r"\s*(#{1,6}\s|\d+(\.\d+)*[.)]?\s+\S)")
+
+
+def _blocks(text: str, size: int) -> list[str]:
+    """Paragraphs of text, with any longer than size split at lines, then at sentences."""
+    blocks = []
+    for paragraph in BLANK_LINES.split(text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= size:
+            if paragraph:
+                blocks.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            while len(line) > size:
+                cut = line.rfind(". ", size // 2, size)
+                cut = size if cut < 0 else cut + 1
+                blocks.append(line[:cut].strip())
+                line = line[cut:]
+            if line.strip():
+                blocks.append(line.strip())
+    return blocks
+
+
+def split_sections(text: str) -> list[str]:
+    """Split a document at paragraph boundaries into at most MAX_SECTIONS sections of similar size.
+
+    A heading starts a new section once the current one is half full.
+    """
+    size = max(SECTION_CHARS, math.ceil(len(text) / MAX_SECTIONS))
+    sections: list[list[str]] = []
+    length = 0
+    for block in _blocks(text, size):
+        if sections and (
+            length + len(block) <= size
+            and not (length >= size // 2 and HEADING.match(block))
+        ):
+            sections[-1].append(block)
+            length += len(block) + 2
+        else:
+            sections.append([block])
+            length = len(block)
+
+    # Greedy packing can leave up to twice as many sections; merge the smallest neighbours
+    sizes = [sum(len(b) + 2 for b in section) for section in sections]
+    while len(sections) > MAX_SECTIONS:
+        i = min(range(len(sections) - 1), key=lambda i: sizes[i] + sizes[i + 1])
+        sections[i:i + 2] = [sections[i] + sections[i + 1]]
+        sizes[i:i + 2] = [sizes[i] + sizes[i + 1]]
+    return ["\n\n".join(section) for section in sections]
+
+
+def section_heading(section: str) -> str:
+    """First line of a section without markdown heading marks, for the outline and the digest."""
+    first = section.lstrip().split("\n", 1)[0].lstrip("#").strip()
+    return clip_middle(first, HEADING_CHARS)
+
+
+def _unique_texts(texts: list[str]) -> list[str]:
+    """Texts without near-duplicates, first occurrence kept."""
+    kept: list[str] = []
+    kept_terms: list[frozenset[str]] = []
+    for text in texts:
+        text_terms = terms(text)
+        if all(similarity(text_terms, t) < DUPLICATE_THRESHOLD for t in kept_terms):
+            kept.append(text)
+            kept_terms.append(text_terms)
+    return kept
+
+
+def _select_questions(questions: list[AnalyzedQuestion], count: int) -> list[AnalyzedQuestion]:
+    """Up to count questions, highest priority first, with every category that has one covered."""
+    ranked = sorted(questions, key=lambda q: -PRIORITY_RANK[q.priority])
+    picked: list[AnalyzedQuestion] = []
+    covered = set()
+    for q in ranked:
+        if q.category not in covered and len(picked) < count:
+            picked.append(q)
+            covered.add(q.category)
+    for q in ranked:
+        if len(picked) >= count:
+            break
+        if q not in picked:
+            picked.append(q)
+    return sorted(picked, key=lambda q: -PRIORITY_RANK[q.priority])
+
+
+def merge_analyses(analyses: list[SectionAnalysis]) -> RequirementAnalysis:
+    """One analysis of the whole document from the analyses of its sections, in document order."""
+    entities: list[str] = []
+    seen = set()
+    for analysis in analyses:
+        for entity in analysis.entities:
+            key = entity.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                entities.append(entity.strip())
+
+    # Highest priority first, so a question raised by several sections keeps its top priority
+    candidates = sorted(
+        (q for analysis in analyses for q in analysis.questions),
+        key=lambda q: -PRIORITY_RANK[q.priority],
+    )
+    questions, _ = dedupe_questions([], candidates)
+
+    return RequirementAnalysis(
+        # The opening section usually states what the document is for
+        core_need=next((a.core_need for a in analyses if a.core_need), analyses[0].summary),
+        entities=entities[:MAX_ENTITIES],
+        implicit_assumptions=_unique_texts([x for a in analyses for x in a.implicit_assumptions]),
+        questions=_select_questions(questions, MAX_QUESTIONS),
+    )
+
+
+def build_digest(
+    core_need: str,
+    document_chars: int,
+    summaries: list[tuple[str, str]],
+    entities: list[str],
+) -> str:
+    """Compact stand-in for the document: core need, (heading, summary) per section, entities."""
+    lines = [
+        f"Core need: {core_need}",
+        f"Summary of a {document_chars:,}-character document in {len(summaries)} sections:",
+    ]
+    lines.extend(
+        f"[{i + 1}] {heading}: {clip_middle(summary, SUMMARY_CHARS)}"
+        for i, (heading, summary) in enumerate(summaries)
+    )
+    if entities:
+        lines.append(f"Entities: {', '.join(entities)}")
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+"""Per-session locking and single-flight coalescing of duplicate tool calls."""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+from profiling import phase
+
+# Results kept for idempotency-key replays
+IDEMPOTENCY_TTL_SECONDS = 600
+IDEMPOTENCY_MAX_ENTRIES = 4096
+
+
+def payload_digest(*parts: Any) -> str:
+    """Stable digest of a tool call's arguments, used to detect identical retries."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+class SingleFlight:
+    """Serializes work per session and lets identical concurrent calls share one execution.
+
+    The shared work runs in its own task, so a caller that disconnects does not cancel
+    it for the callers still waiting on the same result. A session's lock exists only while
+    some call holds or waits for it, so the lock map does not grow with every session seen.
+    """
+
+    def __init__(self):
+        # session id -> (lock, number of calls holding or waiting for it)
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._completed: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    @asynccontextmanager
+    async def locked(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the lock guarding mutations of one session."""
+        lock, users = self._locks.get(session_id) or (asyncio.Lock(), 0)
+        self._locks[session_id] = (lock, users + 1)
+        try:
+            with phase("lock_wait"):
+                await lock.acquire()
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            lock, users = self._locks[session_id]
+            if users == 1:
+                del self._locks[session_id]
+            else:
+                self._locks[session_id] = (lock, users - 1)
+
+    def _cached(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._completed.get(key)
+        if entry is None:
+            return False, None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > IDEMPOTENCY_TTL_SECONDS:
+            del self._completed[key]
+            return False, None
+        return True, result
+
+    async def run(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        session_id: str | None = None,
+        remember: bool = False,
+        cacheable: Callable[[Any], bool] = lambda result: True,
+    ) -> Any:
+        """Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call (tool, session, idempotency key or payload digest).
+            fn: The work to run.
+            session_id: If given, fn runs under that session's lock.
+            remember: Keep the result for later calls with the same key (idempotency keys).
+            cacheable: Decides whether a remembered result may be replayed (e.g. not errors).
+        """
+        if remember:
+            hit, result = self._cached(key)
+            if hit:
+                return result
+
+        task = self._inflight.get(key)
+        if task is None:
+            async def execute():
+                try:
+                    if session_id is None:
+                        result = await fn()
+                    else:
+                        async with self.locked(session_id):
+                            result = await fn()
+                    if remember and cacheable(result):
+                        self._completed[key] = (time.monotonic(), result)
+                        while len(self._completed) > IDEMPOTENCY_MAX_ENTRIES:
+                            self._completed.popitem(last=False)
+                    return result
+                finally:
+                    self._inflight.pop(key, None)
+
+            task = self._inflight[key] = asyncio.create_task(execute())
+            # Nobody may be left awaiting a failed task once every caller has gone
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        return await asyncio.shield(task)
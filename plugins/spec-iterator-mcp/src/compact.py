@@ -0,0 +1,268 @@
+"""Compact resident form of sessions that no tool call is currently using.
+
+A `CompactSession` stores clarifications column-wise: enums as one-byte codes, ids interned
+(they repeat across sessions), and the cold text (`why` and answers) optionally packed into
+one zlib blob. Pydantic `Session` objects are rebuilt from it only when a tool needs one.
+"""
+
+import sys
+import zlib
+from datetime import datetime
+from typing import Any
+
+import msgpack
+
+from models import (
+    Audience,
+    Clarification,
+    CompletenessScore,
+    Complexity,
+    QuestionCategory,
+    QuestionPriority,
+    Session,
+    SessionContext,
+    SessionStatus,
+)
+
+CATEGORIES = tuple(QuestionCategory)
+PRIORITIES = tuple(QuestionPriority)
+STATUSES = tuple(SessionStatus)
+AUDIENCES = (None, *Audience)
+COMPLEXITIES = tuple(Complexity)
+SCORE_FIELDS = tuple(CompletenessScore.model_fields)
+
+CATEGORY_CODE = {value: code for code, value in enumerate(CATEGORIES)}
+PRIORITY_CODE = {value: code for code, value in enumerate(PRIORITIES)}
+STATUS_CODE = {value: code for code, value in enumerate(STATUSES)}
+AUDIENCE_CODE = {value: code for code, value in enumerate(AUDIENCES)}
+COMPLEXITY_CODE = {value: code for code, value in enumerate(COMPLEXITIES)}
+
+
+class CompactSession:
+    """Slotted, array-backed copy of a Session."""
+
+    __slots__ = (
+        "id",
+        "created_at",
+        "updated_at",
+        "requirement",
+        "digest",
+        "tenant",
+        "domain",
+        "codes",
+        "round_count",
+        "version",
+        "scores",
+        "assumptions",
+        "ids",
+        "questions",
+        "categories",
+        "priorities",
+        "answered",
+        "why",
+        "answers",
+        "cold",
+    )
+
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    requirement: str
+    digest: str | None
+    tenant: str | None
+    domain: str | None
+    codes: bytes  # status, audience and complexity codes
+    round_count: int
+    version: int
+    scores: bytes
+    assumptions: tuple[str, ...]
+    ids: tuple[str, ...]
+    questions: tuple[str, ...]
+    categories: bytes
+    priorities: bytes
+    answered: bytes
+    why: tuple[str | None, ...] | None
+    answers: tuple[str | None, ...] | None
+    cold: bytes | None
+
+    @classmethod
+    def from_session(cls, session: Session, compress: bool = True) -> "CompactSession":
+        c = session.clarifications
+        return cls._build(
+            session.id,
+            session.created_at,
+            session.updated_at,
+            session.requirement,
+            session.requirement_digest,
+            session.tenant,
+            session.context.domain,
+            bytes((
+                STATUS_CODE[session.status],
+                AUDIENCE_CODE[session.context.audience],
+                COMPLEXITY_CODE[session.context.complexity],
+            )),
+            session.round_count,
+            session.version,
+            bytes(getattr(session.completeness, field) for field in SCORE_FIELDS),
+            tuple(session.assumptions),
+            [x.id for x in c],
+            [x.question for x in c],
+            bytes(CATEGORY_CODE[x.category] for x in c),
+            bytes(PRIORITY_CODE[x.priority] for x in c),
+            [x.why for x in c],
+            [x.answer for x in c],
+            compress,
+        )
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any], compress: bool = True) -> "CompactSession":
+        """Build from Session.model_dump(mode="json") output, e.g. a snapshot record."""
+        context = data.get("context") or {}
+        audience = context.get("audience")
+        c = data.get("clarifications") or []
+        return cls._build(
+            data["id"],
+            datetime.fromisoformat(data["created_at"]),
+            datetime.fromisoformat(data["updated_at"]),
+            data["requirement"],
+            data.get("requirement_digest"),
+            data.get("tenant"),
+            context.get("domain"),
+            # str enums hash and compare like their values, so the code maps take the raw strings
+            bytes((
+                STATUS_CODE[data.get("status", SessionStatus.IN_PROGRESS.value)],
+                AUDIENCE_CODE[audience or None],
+                COMPLEXITY_CODE[context.get("complexity", Complexity.MODERATE.value)],
+            )),
+            data.get("round_count", 0),
+            data.get("version", 1),
+            bytes((data.get("completeness") or CompletenessScore().model_dump())[field] for field in SCORE_FIELDS),
+            tuple(data.get("assumptions") or ()),
+            [x["id"] for x in c],
+            [x["question"] for x in c],
+            bytes(CATEGORY_CODE[x["category"]] for x in c),
+            bytes(PRIORITY_CODE[x["priority"]] for x in c),
+            [x.get("why") for x in c],
+            [x.get("answer") for x in c],
+            compress,
+        )
+
+    @classmethod
+    def _build(
+        cls, session_id, created_at, updated_at, requirement, digest, tenant, domain, codes,
+        round_count, version, scores, assumptions, ids, questions, categories, priorities, why, answers, compress,
+    ) -> "CompactSession":
+        self = cls.__new__(cls)
+        self.id = session_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.requirement = requirement
+        self.digest = digest
+        self.tenant = tenant
+        self.domain = sys.intern(domain) if domain else None
+        self.codes = codes
+        self.round_count = round_count
+        self.version = version
+        self.scores = scores
+        self.assumptions = assumptions
+        self.ids = tuple(sys.intern(i) for i in ids)
+        self.questions = tuple(questions)
+        self.categories = categories
+        self.priorities = priorities
+        self.answered = bytes(a is not None for a in answers)
+        if compress and ids:
+            self.why = self.answers = None
+            self.cold = zlib.compress(msgpack.packb([why, answers], use_bin_type=True), 1)
+        else:
+            self.why, self.answers, self.cold = tuple(why), tuple(answers), None
+        return self
+
+    # Cheap summary fields, readable without rebuilding the Session
+
+    @property
+    def status(self) -> SessionStatus:
+        return STATUSES[self.codes[0]]
+
+    @property
+    def completeness(self) -> CompletenessScore:
+        return CompletenessScore.model_construct(**dict(zip(SCORE_FIELDS, self.scores)))
+
+    @property
+    def has_answers(self) -> bool:
+        return any(self.answered)
+
+    def _cold_text(self) -> tuple[list[str | None], list[str | None]]:
+        if self.cold is None:
+            return list(self.why), list(self.answers)
+        why, answers = msgpack.unpackb(zlib.decompress(self.cold), raw=False)
+        return why, answers
+
+    # Conversions
+
+    def to_session(self) -> Session:
+        """Rebuild the pydantic Session (fields are trusted, so validation is skipped)."""
+        why, answers = self._cold_text()
+        clarifications = [
+            Clarification.model_construct(
+                id=self.ids[i],
+                question=self.questions[i],
+                answer=answers[i],
+                category=CATEGORIES[self.categories[i]],
+                priority=PRIORITIES[self.priorities[i]],
+                why=why[i],
+            )
+            for i in range(len(self.ids))
+        ]
+        return Session.model_construct(
+            id=self.id,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+            requirement=self.requirement,
+            context=SessionContext.model_construct(
+                domain=self.domain,
+                audience=AUDIENCES[self.codes[1]],
+                complexity=COMPLEXITIES[self.codes[2]],
+            ),
+            clarifications=clarifications,
+            completeness=self.completeness,
+            assumptions=list(self.assumptions),
+            status=self.status,
+            round_count=self.round_count,
+            version=self.version,
+            requirement_digest=self.digest,
+            tenant=self.tenant,
+        )
+
+    def to_data(self) -> dict[str, Any]:
+        """Same shape as Session.model_dump(mode="json"), without building the Session."""
+        why, answers = self._cold_text()
+        audience = AUDIENCES[self.codes[1]]
+        return {
+            "id": self.id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "requirement": self.requirement,
+            "context": {
+                "domain": self.domain,
+                "audience": audience.value if audience else None,
+                "complexity": COMPLEXITIES[self.codes[2]].value,
+            },
+            "clarifications": [
+                {
+                    "id": self.ids[i],
+                    "question": self.questions[i],
+                    "answer": answers[i],
+                    "category": CATEGORIES[self.categories[i]].value,
+                    "priority": PRIORITIES[self.priorities[i]].value,
+                    "why": why[i],
+                }
+                for i in range(len(self.ids))
+            ],
+            "completeness": dict(zip(SCORE_FIELDS, self.scores)),
+            "assumptions": list(self.assumptions),
+            "status": self.status.value,
+            "round_count": self.round_count,
+            "version": self.version,
+            "requirement_digest": self.digest,
+            "tenant": self.tenant,
+        }
@@ -0,0 +1,458 @@
+"""Append-only session event log, for durable writes that cost about as much as the change.
+
+Every tool call that changes a session appends one small record with its events instead of
+rewriting the session: questions added, answers recorded, status changed (to complete when a
+spec is generated), other fields changed. A session's first record is its full data, and every
+`snapshot_every` changes another full snapshot is written, so recovery only decodes a
+session's records from its latest snapshot on.
+
+Records go to numbered segment files in one directory:
+
+    payload length (4) | crc32 (4) | kind (1) | id length (1) | session id | msgpack payload
+
+One checksum covers all events of a change, so a torn write never applies half of one.
+
+They are written to the OS as they happen, so a process crash loses nothing, and a
+background thread fsyncs them in batches every `fsync_interval` seconds. Segments are rolled
+over at SEGMENT_BYTES. Once COMPACT_AFTER segments have been sealed, a background thread
+copies the records still needed (each live session's latest snapshot and what follows it)
+into a base segment and deletes the segments it replaces.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from enum import IntEnum
+from pathlib import Path
+from typing import Any
+
+import msgpack
+
+from compact import (
+    AUDIENCE_CODE,
+    CATEGORY_CODE,
+    COMPLEXITY_CODE,
+    PRIORITY_CODE,
+    SCORE_FIELDS,
+    STATUS_CODE,
+    CompactSession,
+)
+from models import Session
+
+RECORD = struct.Struct(">IIBB")
+SEGMENT_BYTES = 16 * 1024 * 1024
+COMPACT_AFTER = 4
+DEFAULT_SNAPSHOT_EVERY = 32
+
+
+class EventKind(IntEnum):
+    CREATED = 0
+    SNAPSHOT = 1
+    QUESTIONS = 2
+    ANSWERS = 3
+    STATUS = 4
+    FIELDS = 5
+    DELETED = 6
+    BASE = 7  # first record of a compacted segment: everything before it is superseded
+    CHANGES = 8  # record holding one change's QUESTIONS/ANSWERS/STATUS/FIELDS events
+
+
+# Records that carry a session's complete state (or its end)
+RESETS = (EventKind.CREATED, EventKind.SNAPSHOT, EventKind.DELETED)
+
+# Plain ints for the replay loops, where comparing IntEnum members costs more than decoding
+_QUESTIONS, _ANSWERS, _STATUS, _FIELDS, _DELETED, _BASE = (
+    int(kind) for kind in (
+        EventKind.QUESTIONS, EventKind.ANSWERS, EventKind.STATUS, EventKind.FIELDS, EventKind.DELETED, EventKind.BASE,
+    )
+)
+_RESET_CODES = frozenset(int(kind) for kind in RESETS)
+
+
+def encode(kind: EventKind, session_id: str, payload: Any) -> bytes:
+    packed = msgpack.packb(payload, use_bin_type=True)
+    sid = session_id.encode("ascii")
+    prefix = bytes((kind, len(sid))) + sid
+    crc = zlib.crc32(packed, zlib.crc32(prefix))
+    return struct.pack(">II", len(packed), crc) + prefix + packed
+
+
+def scan(data: bytes) -> tuple[list[tuple[int, bytes, int, int, int]], int]:
+    """Records of a segment as (kind, session id, start, payload start, end) tuples.
+
+    Also returns the offset where valid records end; anything after it is a torn or
+    corrupt tail.
+    """
+    records = []
+    view = memoryview(data)
+    unpack = RECORD.unpack_from
+    offset, size, header = 0, len(data), RECORD.size
+    while offset + header <= size:
+        length, crc, kind, id_length = unpack(data, offset)
+        payload_start = offset + header + id_length
+        end = payload_start + length
+        if end > size or zlib.crc32(view[offset + 8:end]) != crc:
+            break
+        records.append((kind, data[offset + header:payload_start], offset, payload_start, end))
+        offset = end
+    return records, offset
+
+
+def session_events(before: CompactSession, after: Session) -> list[tuple[EventKind, Any]] | None:
+    """Events that turn `before` into `after`, or None when only a full snapshot describes it."""
+    events: list[tuple[EventKind, Any]] = []
+    why, answers = before._cold_text()
+    clarifications = after.clarifications
+    if len(clarifications) < len(before.ids):
+        return None
+    changed = {}
+    for i in range(len(before.ids)):
+        c = clarifications[i]
+        if (
+            c.id != before.ids[i]
+            or c.question != before.questions[i]
+            or c.why != why[i]
+            or CATEGORY_CODE[c.category] != before.categories[i]
+            or PRIORITY_CODE[c.priority] != before.priorities[i]
+        ):
+            return None
+        if c.answer != answers[i]:
+            changed[c.id] = c.answer
+    added = clarifications[len(before.ids):]
+    if added:
+        events.append((EventKind.QUESTIONS, [c.model_dump(mode="json") for c in added]))
+    if changed:
+        events.append((EventKind.ANSWERS, changed))
+
+    if STATUS_CODE[after.status] != before.codes[0]:
+        events.append((EventKind.STATUS, after.status.value))
+    fields: dict[str, Any] = {}
+    context = after.context
+    if (
+        after.requirement != before.requirement
+        or after.requirement_digest != before.digest
+        or context.domain != before.domain
+        or AUDIENCE_CODE[context.audience] != before.codes[1]
+        or COMPLEXITY_CODE[context.complexity] != before.codes[2]
+    ):
+        fields["requirement"] = after.requirement
+        fields["requirement_digest"] = after.requirement_digest
+        fields["context"] = context.model_dump(mode="json")
+    if after.tenant != before.tenant:
+        fields["tenant"] = after.tenant
+    if after.round_count != before.round_count:
+        fields["round_count"] = after.round_count
+    if after.version != before.version:
+        fields["version"] = after.version
+    if bytes(getattr(after.completeness, field) for field in SCORE_FIELDS) != before.scores:
+        fields["completeness"] = after.completeness.model_dump()
+    if tuple(after.assumptions) != before.assumptions:
+        fields["assumptions"] = list(after.assumptions)
+    if fields or after.updated_at != before.updated_at:
+        fields["updated_at"] = after.updated_at.isoformat()
+        events.append((EventKind.FIELDS, fields))
+    return events
+
+
+def replay(records: list[tuple[int, bytes]]) -> dict[str, Any]:
+    """A session's data (model_dump(mode="json") shape) from its full record and the changes after it."""
+    state = msgpack.unpackb(records[0][1], raw=False)
+    clarifications = {c["id"]: c for c in state["clarifications"]}
+    for _, payload in records[1:]:
+        for event, value in msgpack.unpackb(payload, raw=False):
+            if event == _ANSWERS:
+                for clarification_id, answer in value.items():
+                    clarifications[clarification_id]["answer"] = answer
+            elif event == _FIELDS:
+                state.update(value)
+            elif event == _QUESTIONS:
+                for c in value:
+                    if c["id"] not in clarifications:
+                        state["clarifications"].append(c)
+                        clarifications[c["id"]] = c
+            elif event == _STATUS:
+                state["status"] = value
+    return state
+
+
+class EventLog:
+    """Segmented append-only log of session changes in one directory.
+
+    Appends come from the event loop thread; fsyncs and compaction run on background threads.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        fsync_interval: float = 0.05,
+        snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+        segment_bytes: int = SEGMENT_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.segment_bytes = segment_bytes
+        for stale in self.directory.glob("*.log.tmp"):
+            stale.unlink(missing_ok=True)
+
+        existing = self._segments()
+        self._seq = (existing[-1] + 1) if existing else 1  # appends start a fresh segment
+        self._fd: int | None = None
+        self._size = 0
+        self._retired: list[int] = []
+        self._dirty = False
+        self._new_segment = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._syncer: threading.Thread | None = None
+        self._compactor: threading.Thread | None = None
+        # Changes written per session since its last full record; absent until it has one
+        self._since_full: dict[str, int] = {}
+
+        self.events = 0
+        self.records = 0
+        self.bytes_written = 0
+        self.snapshots = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        self.last_compaction_ms: float | None = None
+        self.recovery: dict[str, Any] | None = None
+
+    @classmethod
+    def from_env(cls) -> "EventLog | None":
+        """Log configured by SPEC_ITERATOR_EVENT_LOG, or None if it is off."""
+        directory = os.getenv("SPEC_ITERATOR_EVENT_LOG")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            fsync_interval=float(os.getenv("SPEC_ITERATOR_EVENT_LOG_FSYNC_MS", "50")) / 1000,
+            snapshot_every=int(os.getenv("SPEC_ITERATOR_EVENT_LOG_SNAPSHOT_EVERY", str(DEFAULT_SNAPSHOT_EVERY))),
+        )
+
+    def _segments(self) -> list[int]:
+        return sorted(int(p.stem) for p in self.directory.glob("*.log") if p.stem.isdigit())
+
+    def _path(self, seq: int) -> Path:
+        return self.directory / f"{seq:010d}.log"
+
+    def _fsync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # Recovery
+
+    def _read(self, upto: int) -> tuple[list[tuple[bytes, list]], int]:
+        """(data, records) of the segments up to seq `upto`, from the newest base segment on."""
+        segments = []
+        for seq in self._segments():
+            if seq > upto:
+                break
+            try:
+                data = self._path(seq).read_bytes()
+            except FileNotFoundError:
+                continue  # removed by a compaction, whose base segment comes later
+            records, valid = scan(data)
+            if valid < len(data):
+                print(f"> Event log segment {seq} has {len(data) - valid} unreadable trailing bytes; ignored",
+                      file=sys.stderr)
+            if records and records[0][0] == _BASE:
+                segments.clear()
+            segments.append((data, records))
+        return segments, sum(len(records) for _, records in segments)
+
+    @staticmethod
+    def _latest_resets(segments: list[tuple[bytes, list]]) -> dict[bytes, int]:
+        """Index (over all records in order) of each session's last full snapshot or deletion."""
+        latest: dict[bytes, int] = {}
+        index = 0
+        for _, records in segments:
+            for kind, session_id, _, _, _ in records:
+                if kind in _RESET_CODES:
+                    latest[session_id] = index
+                index += 1
+        return latest
+
+    def recover(self) -> dict[str, list[tuple[int, bytes]]]:
+        """Every live session's records on disk, from its latest full snapshot on.
+
+        Payloads are not decoded here; `replay` turns a session's records into its data.
+        """
+        started = time.perf_counter()
+        segments, total = self._read(self._seq - 1)
+        latest = self._latest_resets(segments)
+
+        needed: dict[bytes, list[tuple[int, bytes]]] = {}
+        index = -1
+        for data, records in segments:
+            for kind, session_id, _, payload_start, end in records:
+                index += 1
+                start = latest.get(session_id)
+                # Records before a session's latest snapshot are superseded
+                if start is None or index < start:
+                    continue
+                if kind == _DELETED:
+                    continue
+                if index == start:
+                    needed[session_id] = [(kind, data[payload_start:end])]
+                else:
+                    needed[session_id].append((kind, data[payload_start:end]))
+
+        recovered = {session_id.decode("ascii"): records for session_id, records in needed.items()}
+        self._since_full.update((session_id, len(records) - 1) for session_id, records in recovered.items())
+        self.recovery = {
+            "sessions": len(recovered),
+            "records": total,
+            "records_kept": sum(len(records) for records in recovered.values()),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        self._maybe_compact()
+        return recovered
+
+    # Appends
+
+    def needs_snapshot(self, session_id: str) -> bool:
+        """Whether the session's next change should be written as a full snapshot."""
+        count = self._since_full.get(session_id)
+        return count is None or count >= self.snapshot_every
+
+    def append(self, session_id: str, events: list[tuple[EventKind, Any]]) -> None:
+        """Write one change to a session as a single record; fsynced by the next batch.
+
+        `events` is either one CREATED, SNAPSHOT or DELETED event, or the change's
+        QUESTIONS, ANSWERS, STATUS and FIELDS events.
+        """
+        if not events:
+            return
+        kind = events[0][0]
+        if kind in RESETS:
+            blob = encode(kind, session_id, events[0][1])
+        else:
+            blob = encode(EventKind.CHANGES, session_id, [[int(event), value] for event, value in events])
+        if kind == EventKind.DELETED:
+            self._since_full.pop(session_id, None)
+        elif kind in RESETS:
+            self._since_full[session_id] = 0
+            self.snapshots += 1
+        else:
+            self._since_full[session_id] = self._since_full.get(session_id, 0) + 1
+
+        with self._lock:
+            if self._fd is None or self._size >= self.segment_bytes:
+                self._roll()
+            os.write(self._fd, blob)
+            self._size += len(blob)
+            self._dirty = True
+        self.events += len(events)
+        self.records += 1
+        self.bytes_written += len(blob)
+        if self.fsync_interval <= 0:
+            self.sync()
+
+    def _roll(self) -> None:
+        """Seal the current segment (if any) and start the next one. Called with the lock held."""
+        if self._fd is not None:
+            self._retired.append(self._fd)
+            self._seq += 1
+        self._fd = os.open(self._path(self._seq), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = 0
+        self._new_segment = True
+        if self._syncer is None and self.fsync_interval > 0:
+            self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+            self._syncer.start()
+        if self._retired:
+            self._maybe_compact()
+
+    def sync(self) -> None:
+        """fsync everything written so far."""
+        with self._lock:
+            fd, dirty, retired, new_segment = self._fd, self._dirty, self._retired, self._new_segment
+            self._dirty = self._new_segment = False
+            self._retired = []
+        for old in retired:
+            os.fsync(old)
+            os.close(old)
+        if dirty and fd is not None:
+            os.fsync(fd)
+            self.fsyncs += 1
+        if new_segment:
+            self._fsync_directory()
+
+    def _sync_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    # Compaction
+
+    def _maybe_compact(self) -> None:
+        sealed = [seq for seq in self._segments() if seq < self._seq]
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if len(sealed) < COMPACT_AFTER:
+            return
+        self._compactor = threading.Thread(target=self._compact, args=(sealed[-1],), daemon=True)
+        self._compactor.start()
+
+    def _compact(self, upto: int) -> None:
+        """Replace the segments up to `upto` with one base segment of the records still needed."""
+        started = time.perf_counter()
+        segments, _ = self._read(upto)
+        latest = self._latest_resets(segments)
+        tmp = self.directory / f"{upto:010d}.log.tmp"
+        with open(tmp, "wb") as out:
+            out.write(encode(EventKind.BASE, "", None))
+            index = -1
+            for data, records in segments:
+                for kind, session_id, start, _, end in records:
+                    index += 1
+                    reset = latest.get(session_id)
+                    if reset is None or index < reset or kind == _DELETED:
+                        continue
+                    out.write(data[start:end])
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self._path(upto))
+        self._fsync_directory()
+        # A crash before these are gone is harmless: recovery starts at the base record
+        for seq in self._segments():
+            if seq < upto:
+                self._path(seq).unlink(missing_ok=True)
+        self.compactions += 1
+        self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    # Shutdown and stats
+
+    def close(self) -> None:
+        """Stop the fsync thread and make everything written durable."""
+        self._stop.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        self.sync()
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def describe(self) -> dict[str, Any]:
+        segments = self._segments()
+        return {
+            "directory": str(self.directory),
+            "segments": len(segments),
+            "bytes_on_disk": sum(self._path(seq).stat().st_size for seq in segments if self._path(seq).exists()),
+            "events_written": self.events,
+            "records_written": self.records,
+            "bytes_written": self.bytes_written,
+            "snapshots_written": self.snapshots,
+            "fsyncs": self.fsyncs,
+            "fsync_interval_ms": self.fsync_interval * 1000,
+            "compactions": self.compactions,
+            "last_compaction_ms": self.last_compaction_ms,
+            "recovery": self.recovery,
+        }
@@ -0,0 +1,155 @@
+"""Rule-based stand-ins for the Claude prompts, used while the Claude circuit is open.
+
+Questions come from a fixed per-category bank, picked for the categories with the lowest
+completeness and skipping anything the session has already asked. Output is deterministic
+and takes a fraction of a millisecond for a session of typical size.
+"""
+
+from models import (
+    AnalyzedQuestion,
+    GapAnalysis,
+    GapItem,
+    Impact,
+    QuestionCategory,
+    QuestionPriority,
+    Session,
+)
+from similarity import DUPLICATE_THRESHOLD, similarity, terms
+
+C, I, N = QuestionPriority.CRITICAL, QuestionPriority.IMPORTANT, QuestionPriority.NICE_TO_HAVE
+
+# (question, priority, why) per category, most important first
+QUESTION_BANK: dict[QuestionCategory, tuple[tuple[str, QuestionPriority, str], ...]] = {
+    QuestionCategory.FUNCTIONAL: (
+        ("Who are the primary users, and what is the main task each of them needs to complete?", C,
+         "Scope and priorities follow from who the system serves."),
+        ("What does a successful end-to-end flow look like, step by step?", C,
+         "The core flow defines the MVP."),
+        ("Which features are required for the first release, and which can wait?", C,
+         "Separates MVP scope from later work."),
+        ("What data does the system need to create, read, update or delete?", I,
+         "The data model drives most of the design."),
+        ("Are there different roles or permission levels, and what may each do?", I,
+         "Access rules change both UI and backend."),
+        ("Which notifications or reports should the system produce, and for whom?", N,
+         "Outputs beyond the core flow are often forgotten."),
+    ),
+    QuestionCategory.TECHNICAL: (
+        ("Which existing systems, APIs or data sources must this integrate with?", C,
+         "Integrations are the most common source of hidden effort."),
+        ("What volume of users, requests or records should it handle at launch and in a year?", I,
+         "Scale determines architecture and hosting."),
+        ("Are there required platforms, languages, frameworks or hosting environments?", I,
+         "Constraints on the stack narrow the design."),
+        ("How should users authenticate, and is there an existing identity provider?", I,
+         "Authentication is hard to retrofit."),
+        ("How fresh must data be: real-time, near real-time, or periodic?", I,
+         "Latency requirements shape the data flow."),
+        ("What are the availability and backup expectations?", N,
+         "Defines operational requirements."),
+    ),
+    QuestionCategory.UX: (
+        ("On which devices and screen sizes will people use this most?", C,
+         "Determines layout and interaction design."),
+        ("How technical are the users, and how much guidance do they need?", I,
+         "Sets the level of onboarding and help."),
+        ("What should users see first when they open it?", I,
+         "The landing view carries the core value."),
+        ("Are there accessibility or localization requirements?", I,
+         "Both are costly to add later."),
+        ("Is there an existing design system or brand guideline to follow?", N,
+         "Avoids rework on visual design."),
+    ),
+    QuestionCategory.EDGE_CASE: (
+        ("What should happen when a required external service is unavailable?", C,
+         "Failure behaviour needs to be specified, not discovered."),
+        ("How should invalid, duplicate or conflicting input be handled?", I,
+         "Defines validation rules and error messages."),
+        ("What happens if two users change the same item at the same time?", I,
+         "Concurrency rules prevent lost updates."),
+        ("How should partially completed work be recovered after an interruption?", I,
+         "Users lose trust when progress disappears."),
+        ("Are there limits on sizes, counts or rates that users might exceed?", N,
+         "Limits need defined behaviour at the boundary."),
+    ),
+    QuestionCategory.CONSTRAINT: (
+        ("What is the deadline or target date, and what drives it?", C,
+         "Time constraints decide what fits in scope."),
+        ("What budget or team capacity is available?", I,
+         "Resources bound the solution."),
+        ("Are there regulatory, privacy or data-residency requirements?", C,
+         "Compliance can rule out whole approaches."),
+        ("How will success be measured after launch?", I,
+         "Measurable goals guide trade-offs."),
+        ("Which decisions have already been made and are not open for discussion?", N,
+         "Fixed decisions narrow the options to explore."),
+    ),
+}
+
+BANK_TERMS = {
+    category: tuple(terms(question) for question, _, _ in questions)
+    for category, questions in QUESTION_BANK.items()
+}
+
+# CompletenessScore field for each category
+SCORE_FIELD = {
+    QuestionCategory.FUNCTIONAL: "functional",
+    QuestionCategory.TECHNICAL: "technical",
+    QuestionCategory.UX: "ux",
+    QuestionCategory.EDGE_CASE: "edge_cases",
+    QuestionCategory.CONSTRAINT: "constraints",
+}
+
+
+def weakest_categories(session: Session) -> list[QuestionCategory]:
+    """Categories ordered from lowest to highest completeness."""
+    return sorted(QuestionCategory, key=lambda category: getattr(session.completeness, SCORE_FIELD[category]))
+
+
+def fallback_questions(session: Session, count: int = 4) -> list[AnalyzedQuestion]:
+    """Up to count unasked bank questions, one per category at a time, weakest categories first."""
+    asked = [terms(c.question) for c in session.clarifications]
+    pools = {
+        category: [
+            entry
+            for entry, bank_terms in zip(QUESTION_BANK[category], BANK_TERMS[category])
+            if all(similarity(bank_terms, a) < DUPLICATE_THRESHOLD for a in asked)
+        ]
+        for category in weakest_categories(session)
+    }
+
+    picked: list[AnalyzedQuestion] = []
+    while len(picked) < count and any(pools.values()):
+        for category, pool in pools.items():
+            if pool and len(picked) < count:
+                question, priority, why = pool.pop(0)
+                picked.append(AnalyzedQuestion(question=question, category=category, priority=priority, why=why))
+    return picked
+
+
+def fallback_gap_analysis(session: Session) -> GapAnalysis:
+    """Gaps from completeness scores and unanswered questions, without a model call."""
+    pending_critical = [
+        c for c in session.clarifications if c.answer is None and c.priority == QuestionPriority.CRITICAL
+    ]
+    gaps = []
+    for category in weakest_categories(session):
+        score = getattr(session.completeness, SCORE_FIELD[category])
+        if score >= 70:
+            continue
+        pending = sum(1 for c in session.clarifications if c.category == category and c.answer is None)
+        gaps.append(GapItem(
+            category=category,
+            description=f"{SCORE_FIELD[category].replace('_', ' ').capitalize()} coverage is {score}%"
+            + (f" with {pending} unanswered question(s)" if pending else ""),
+            impact=Impact.HIGH if score < 40 else Impact.MEDIUM,
+            recommendation=(
+                "Answer the pending questions in this category." if pending
+                else "Continue with spec_answer_questions to get questions for this category."
+            ),
+        ))
+    return GapAnalysis(
+        gaps=gaps,
+        ready_to_generate=session.completeness.overall >= 80 and not pending_critical,
+        blocking_gaps=[c.question for c in pending_critical],
+    )
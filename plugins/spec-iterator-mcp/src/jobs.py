@@ -0,0 +1,148 @@
+"""Background jobs for long-running tool calls, run in a bounded worker pool."""
+
+import asyncio
+import time
+import uuid
+from enum import Enum
+from typing import Any, Awaitable, Callable
+
+# Finished jobs are kept for polling for this long, and at most this many
+JOB_RESULT_TTL_SECONDS = 3600
+JOB_MAX_FINISHED = 1024
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """One submitted tool call and, once finished, its result or error."""
+
+    def __init__(self, tool: str, session_id: str, tenant: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.session_id = session_id
+        self.tenant = tenant
+        self.status = JobStatus.QUEUED
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: str | None = None
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def describe(self) -> dict[str, Any]:
+        """Status fields for spec_job_status; the result is added by the caller."""
+        now = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "tool": self.tool,
+            "session_id": self.session_id,
+            "status": self.status.value,
+            "queued_seconds": round((self.started_at or now) - self.created_at, 3),
+            "running_seconds": round(now - self.started_at, 3) if self.started_at else None,
+        }
+
+
+class JobQueue:
+    """Runs submitted jobs with at most `workers` executing at once.
+
+    Jobs run in their own tasks, independent of the request that submitted them, so they
+    finish even if the client disconnects.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers)
+        self._jobs: dict[str, Job] = {}
+
+    @property
+    def active(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def _prune(self) -> None:
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(finished) - JOB_MAX_FINISHED
+        for job in finished:  # insertion order, oldest first
+            if excess > 0 or now - job.finished_at > JOB_RESULT_TTL_SECONDS:
+                del self._jobs[job.id]
+                excess -= 1
+
+    def submit(
+        self,
+        tool: str,
+        session_id: str,
+        fn: Callable[[], Awaitable[str]],
+        tenant: str | None = None,
+        succeeded: Callable[[str], bool] = lambda result: True,
+    ) -> Job:
+        """Queue fn and return its job immediately.
+
+        Args:
+            tool: Name of the tool call being run.
+            session_id: Session the call works on.
+            fn: The work to run.
+            tenant: Caller that submitted the job; only they may poll or cancel it.
+            succeeded: Decides whether a result is a success (tools report errors in-band).
+        """
+        self._prune()
+        job = Job(tool, session_id, tenant)
+        self._jobs[job.id] = job
+
+        async def execute():
+            try:
+                async with self._slots:
+                    job.status = JobStatus.RUNNING
+                    job.started_at = time.time()
+                    job.result = await fn()
+                    job.status = JobStatus.SUCCEEDED if succeeded(job.result) else JobStatus.FAILED
+            except asyncio.CancelledError:
+                job.status = JobStatus.CANCELLED
+            except Exception as e:
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+
+        def settle(task: asyncio.Task) -> None:
+            # A task cancelled before it first ran never enters execute()
+            if not job.done:
+                job.status = JobStatus.CANCELLED
+                job.finished_at = time.time()
+
+        job.task = asyncio.create_task(execute())
+        job.task.add_done_callback(settle)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        """Wait up to timeout seconds for the job to finish. Returns whether it has."""
+        if not job.done and timeout > 0:
+            await asyncio.wait({job.task}, timeout=timeout)
+        return job.done
+
+    def cancel(self, job: Job) -> bool:
+        """Cancel a queued or running job. Returns False if it had already finished."""
+        if job.done:
+            return False
+        job.task.cancel()
+        return True
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until every submitted job has finished. Returns False if the deadline passed first."""
+        pending = {job.task for job in self._jobs.values() if not job.done}
+        if pending:
+            await asyncio.wait(pending, timeout=max(timeout, 0))
+        return not self.active
@@ -1,18 +1,41 @@
 """Spec Iterator MCP Server - Transform rough requirements into complete specifications."""
 
+# Imported first so PROCESS_START marks the beginning of module import
+from startup import PROCESS_START, import_breakdown, print_report, warm_up
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import importlib
 import json
+import math
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
-import anthropic
-import uvicorn
 from dotenv import load_dotenv
-from mcp.server.fastmcp import FastMCP
-from starlette.middleware.cors import CORSMiddleware
-
-from middleware import SmitheryConfigMiddleware
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import ValidationError
+
+from breaker import CircuitBreaker, CircuitOpenError, ClaudeUnavailable
+from budget import DEFAULT_INPUT_BUDGET, MAX_MAX_TOKENS, TokenBudget
+from capture import enable_capture, enable_replay, get_capture, get_replay
+from chunking import (
+    DEFAULT_LARGE_INPUT_CHARS,
+    build_digest,
+    merge_analyses,
+    section_heading,
+    split_sections,
+)
+from coalesce import SingleFlight, payload_digest
+from compact import CompactSession
+from eventlog import EventLog
+from jobs import Job, JobQueue
 from models import (
     Audience,
     Clarification,
@@ -21,110 +44,266 @@ from models import (
     GeneratedSpec,
     QuestionCategory,
     QuestionPriority,
+    AnalyzedQuestion,
     RequirementAnalysis,
     GeneratedQuestions,
+    SectionAnalysis,
     Session,
     SessionContext,
     SessionStatus,
+    build_schemas,
 )
+from fallback import fallback_gap_analysis, fallback_questions
+from profiling import LoopWatchdog, RequestProfile, phase, profile_path
 from prompts import (
     REQUIREMENT_ANALYZER_PROMPT,
+    SECTION_ANALYZER_PROMPT,
     QUESTION_GENERATOR_PROMPT,
     GAP_ANALYZER_PROMPT,
     SPEC_COMPILER_PROMPT,
+    PROMPT_NAMES,
     build_analyzer_input,
+    build_section_analyzer_input,
     build_question_generator_input,
     build_gap_analyzer_input,
     build_spec_compiler_input,
 )
+from similarity import (
+    WARM_START_HINT_THRESHOLD,
+    WARM_START_REUSE_THRESHOLD,
+    SessionIndex,
+    dedupe_questions,
+)
+from session_token import SessionTokens, TokenError, TokenTooLarge
+from shutdown import DrainState
+from store import SessionStore
+
+if TYPE_CHECKING:
+    # Imported on the first Claude call (or by the post-bind warm-up) to keep cold start fast
+    import anthropic
 
 # Load environment variables
 load_dotenv()
 
-# Initialize FastMCP server
+# Stateless mode: responses carry a signed session token that any replica can serve
+state_tokens = SessionTokens.from_env()
+
+# Initialize FastMCP server. In stateless mode the MCP transport keeps no per-connection
+# state either, so a client's requests can land on any replica.
 mcp = FastMCP(
     name="spec-iterator",
-    instructions="Transform rough requirements into complete technical specifications through AI-powered clarification dialogues."
+    instructions="Transform rough requirements into complete technical specifications through AI-powered clarification dialogues.",
+    stateless_http=state_tokens is not None,
 )
 
-# In-memory session storage
-sessions: dict[str, Session] = {}
+# In-memory session storage (optionally restored from a snapshot left by the previous process).
+# Sessions are kept compact between tool calls; see SessionStore.checkout.
+sessions: SessionStore = SessionStore(compress=os.getenv("SPEC_ITERATOR_COMPRESS_SESSIONS", "1") != "0")
+
+# Durable append-only record of session changes, replayed on restart (attached in main())
+event_log = EventLog.from_env()
+
+# Stops Claude calls while the API is failing; tools fall back to the local question bank meanwhile
+claude_breaker = CircuitBreaker(
+    error_rate=float(os.getenv("SPEC_ITERATOR_BREAKER_ERROR_RATE", "0.5")),
+    min_calls=int(os.getenv("SPEC_ITERATOR_BREAKER_MIN_CALLS", "5")),
+    cooldown=float(os.getenv("SPEC_ITERATOR_BREAKER_COOLDOWN", "30")),
+)
+
+# Estimated input tokens above which prompt inputs are trimmed (0 sends them whole)
+token_budget = TokenBudget(int(os.getenv("SPEC_ITERATOR_INPUT_TOKEN_BUDGET", str(DEFAULT_INPUT_BUDGET))))
+
+# How many times a reply cut off at max_tokens is continued before it is used as is
+MAX_CONTINUATIONS = int(os.getenv("SPEC_ITERATOR_MAX_CONTINUATIONS", "2"))
+
+# Requirements at least this long are analyzed in concurrent sections (0 always sends them whole)
+LARGE_INPUT_CHARS = int(os.getenv("SPEC_ITERATOR_LARGE_INPUT_CHARS", str(DEFAULT_LARGE_INPUT_CHARS)))
+
+# Share of the latest round's questions to answer before follow-up questions are generated
+# (0 generates a round on every spec_answer_questions call)
+ROUND_ANSWER_FRACTION = float(os.getenv("SPEC_ITERATOR_ROUND_ANSWER_FRACTION", "0.6"))
+
+# Set on SIGTERM: new sessions are refused while in-flight requests finish
+drain = DrainState()
+
+# Per-session locks and coalescing of duplicate in-flight tool calls
+single_flight = SingleFlight()
+
+# Past requirements, for warm-starting similar new sessions
+session_index = SessionIndex()
+
+# Worker pool for spec_generate / spec_get_gaps calls made with background=true
+jobs = JobQueue(workers=int(os.getenv("SPEC_ITERATOR_JOB_WORKERS", "4")))
+
+# Upper bound for spec_job_status long-polls, below common proxy idle timeouts
+JOB_POLL_MAX_SECONDS = 25
+
+# Per-request profiling: admins send the token in this header, or sessions are allow-listed
+PROFILE_HEADER = "x-spec-profile"
+PROFILE_TOKEN = os.getenv("SPEC_ITERATOR_PROFILE_TOKEN")
+PROFILE_SESSIONS = frozenset(s.strip() for s in os.getenv("SPEC_ITERATOR_PROFILE_SESSIONS", "").split(",") if s.strip())
+
+# Reports callbacks that block the event loop longer than this (0 turns the watchdog off)
+LOOP_LAG_MS = float(os.getenv("SPEC_ITERATOR_LOOP_LAG_MS", "250"))
+loop_watchdog = LoopWatchdog(LOOP_LAG_MS) if LOOP_LAG_MS > 0 else None
+
+
+def current_request(ctx: Context | None):
+    """The Starlette request behind a tool call; None over stdio."""
+    if ctx is None:
+        return None
+    try:
+        return ctx.request_context.request
+    except ValueError:
+        return None
 
-# Anthropic client (initialized lazily)
-_client: anthropic.Anthropic | None = None
-_current_api_key: str | None = None
 
+def request_api_key(ctx: Context | None) -> str | None:
+    """API key that SmitheryConfigMiddleware decoded for the current HTTP request, if any."""
+    request = current_request(ctx)
+    if request is None:
+        return None
+    return getattr(request.state, "api_key", None)
 
-def set_api_key(api_key: str) -> None:
-    """Set the API key from Smithery config middleware."""
-    global _current_api_key, _client
-    if api_key and api_key != _current_api_key:
-        _current_api_key = api_key
-        _client = None  # Reset client to use new key
 
+def tenant_of(api_key: str | None) -> str | None:
+    """Tenant recorded on sessions: a digest of the caller's API key, None for the server's own key."""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
 
-def get_client() -> anthropic.Anthropic:
+
+def is_profile_admin(headers) -> bool:
+    """Whether request headers carry the profiling admin token."""
+    supplied = headers.get(PROFILE_HEADER)
+    return bool(PROFILE_TOKEN and supplied and hmac.compare_digest(supplied, PROFILE_TOKEN))
+
+
+@lru_cache(maxsize=32)
+def _client_for(api_key: str) -> "anthropic.Anthropic":
+    """One Anthropic client (and connection pool) per API key."""
+    import anthropic
+
+    return anthropic.Anthropic(api_key=api_key)
+
+
+def get_client(api_key: str | None = None) -> "anthropic.Anthropic":
     """Get or create Anthropic client."""
-    global _client
-    if _client is None:
-        # Try Smithery config first, then env var
-        api_key = _current_api_key or os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "ANTHROPIC_API_KEY is required. "
-                "Configure it in Smithery or set as environment variable."
-            )
-        _client = anthropic.Anthropic(api_key=api_key)
-    return _client
+    # Try Smithery config first, then env var
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "ANTHROPIC_API_KEY is required. "
+            "Configure it in Smithery or set as environment variable."
+        )
+    return _client_for(api_key)
 
 
-async def call_claude(system_prompt: str, user_input: str) -> str:
+async def call_claude(system_prompt: str, user_input: str, api_key: str | None = None) -> str:
     """Call Claude API with error handling."""
+    prompt = PROMPT_NAMES.get(system_prompt, "other")
+    user_input = token_budget.fit(prompt, system_prompt, user_input)
+
+    replay = get_replay()
+    if replay is not None:
+        with phase("claude"):
+            return await replay.respond(system_prompt, user_input)
+
+    import anthropic
+
     try:
-        client = get_client()
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_input}]
-        )
+        client = get_client(api_key)
+    except ValueError as e:
+        raise ValueError(f"API call failed: {str(e)}")
+
+    # Fail fast during an outage instead of waiting out a timeout on every call
+    if not claude_breaker.allow():
+        raise CircuitOpenError(claude_breaker.retry_after())
+    generation = claude_breaker.generation
+
+    healthy = False  # whether the API answered, for the breaker
+    try:
+        started = time.perf_counter()
+        messages = [{"role": "user", "content": user_input}]
+        max_tokens = token_budget.max_tokens(prompt)
+        text = ""
+        input_tokens = output_tokens = 0
+        for continuation in range(MAX_CONTINUATIONS + 1):
+            healthy = False
+            # The SDK call blocks; run it off the event loop so other requests and jobs proceed
+            with phase("claude"):
+                response = await asyncio.to_thread(
+                    client.messages.create,
+                    model="claude-sonnet-4-20250514",
+                    max_tokens=max_tokens,
+                    system=system_prompt,
+                    messages=messages
+                )
+
+            healthy = True
+            for block in response.content:
+                if block.type == "text":
+                    text += block.text
+                    break
+            input_tokens = input_tokens or response.usage.input_tokens
+            output_tokens += response.usage.output_tokens
+            if response.stop_reason != "max_tokens" or continuation == MAX_CONTINUATIONS:
+                break
+            # Cut off mid-output: have Claude continue its own partial answer. A prefill may
+            # not end in whitespace, which JSON does not need anyway.
+            text = text.rstrip()
+            messages = [
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": text},
+            ]
+            max_tokens = MAX_MAX_TOKENS
 
-        for block in response.content:
-            if block.type == "text":
-                return block.text
-        return ""
+        token_budget.observe(
+            prompt, len(system_prompt) + len(user_input), input_tokens, output_tokens, continuation
+        )
+        capture = get_capture()
+        if capture is not None:
+            capture.record_claude(system_prompt, user_input, text, time.perf_counter() - started)
+        return text
 
     except anthropic.AuthenticationError:
+        healthy = True  # the API is up; this key is not
         raise ValueError(
             "API authentication failed. The ANTHROPIC_API_KEY may be invalid or expired. "
             "Please check your API key at console.anthropic.com."
         )
     except anthropic.RateLimitError:
-        raise ValueError(
+        raise ClaudeUnavailable(
             "API rate limit exceeded. Wait a few moments and try again, "
             "or check your usage at console.anthropic.com."
         )
     except anthropic.APIStatusError as e:
         if e.status_code >= 500:
-            raise ValueError(
+            raise ClaudeUnavailable(
                 "Anthropic API is temporarily unavailable. "
                 "Wait a few moments and retry the operation."
             )
+        healthy = True
         raise ValueError(f"API call failed: {e.message}")
+    except anthropic.APIConnectionError as e:
+        raise ClaudeUnavailable(f"Could not reach the Anthropic API: {str(e)}")
     except Exception as e:
         raise ValueError(f"API call failed: {str(e)}")
+    finally:
+        claude_breaker.record(healthy, generation)
 
 
 def parse_json_response(response: str) -> dict[str, Any]:
     """Parse JSON from Claude response, handling markdown code blocks."""
-    cleaned = response.strip()
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    elif cleaned.startswith("```"):
-        cleaned = cleaned[3:]
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
-    return json.loads(cleaned.strip())
+    with phase("parse"):
+        cleaned = response.strip()
+        if cleaned.startswith("```json"):
+            cleaned = cleaned[7:]
+        elif cleaned.startswith("```"):
+            cleaned = cleaned[3:]
+        if cleaned.endswith("```"):
+            cleaned = cleaned[:-3]
+        return json.loads(cleaned.strip())
 
 
 def calculate_completeness(session: Session) -> CompletenessScore:
@@ -275,26 +454,227 @@ def format_spec_as_markdown(spec: GeneratedSpec, session: Session) -> str:
 
 # MCP Tools
 
-@mcp.tool()
-async def spec_start_session(
-    requirement: str,
-    domain: str | None = None,
-    audience: str | None = None
-) -> str:
-    """Start a new specification clarification session from a rough or incomplete requirement.
+def succeeded(result: str) -> bool:
+    """Whether a tool result may be replayed for an idempotency key (errors are retried)."""
+    try:
+        data = json.loads(result)
+    except json.JSONDecodeError:
+        return True  # markdown spec
+    return not (isinstance(data, dict) and "error" in data)
 
-    USE THIS TOOL WHEN: You have a vague requirement like "build a dashboard" or "we need order tracking"
-    and need to systematically uncover missing details before implementation.
 
-    RETURNS: A session_id (save this!) and initial clarifying questions organized by category.
+def session_token_fields(session: Session) -> dict[str, str]:
+    """The session_token field for a response in stateless mode (empty otherwise)."""
+    if state_tokens is None:
+        return {}
+    try:
+        with phase("session_token"):
+            return {"session_token": state_tokens.issue(session)}
+    except TokenTooLarge as e:
+        return {"session_token_error": str(e)}
 
-    TYPICAL WORKFLOW: spec_start_session -> spec_answer_questions (repeat until 80%+) -> spec_generate
 
-    Args:
-        requirement: The initial requirement, idea, or feature request to clarify.
-        domain: Optional domain context (e.g., 'e-commerce', 'healthcare', 'fintech').
-        audience: Optional target audience ('technical', 'business', or 'mixed').
+def attach_session_token(session: Session, result: str) -> str:
+    """Add a fresh session token to a successful JSON tool result in stateless mode."""
+    if state_tokens is None:
+        return result
+    try:
+        data = json.loads(result)
+    except json.JSONDecodeError:
+        return result  # markdown spec
+    if not isinstance(data, dict) or "error" in data:
+        return result
+    return json.dumps({**data, **session_token_fields(session)}, indent=2)
+
+
+def adopt_session_token(session_id: str, session_token: str | None) -> str | None:
+    """Load the session carried by a stateless-mode token. Returns an error response if it is invalid."""
+    if session_token is None or state_tokens is None:
+        return None
+    try:
+        data = state_tokens.open(session_token, session_id)
+    except TokenError as e:
+        return json.dumps({
+            "error": "Invalid session token",
+            "details": str(e),
+            "session_id": session_id,
+            "recovery": "Send the session_token from the latest response for this session, unmodified.",
+        }, indent=2)
+    held = sessions.version(session_id)
+    if held is not None and data.get("version", 1) < held:
+        return json.dumps({
+            "error": "Stale session token",
+            "details": f"The token holds version {data.get('version', 1)} of the session; this server has version {held}.",
+            "session_id": session_id,
+            "recovery": "Call spec_get_status without a session_token for the latest state and token.",
+        }, indent=2)
+    if sessions.put_data(session_id, data):
+        session_index.add(
+            session_id, data["requirement"], (data.get("context") or {}).get("domain"), data.get("tenant")
+        )
+    return None
+
+
+async def profiled(tool: str, session_id: str | None, ctx: Context | None, run: Callable[[], Awaitable[str]]) -> str:
+    """Run a tool call, under the profiler if an admin asked for it or the session is allow-listed."""
+    request = current_request(ctx)
+    requested = (request is not None and is_profile_admin(request.headers)) or (
+        "*" in PROFILE_SESSIONS or session_id in PROFILE_SESSIONS
+    )
+    if not requested:
+        return await run()
+
+    with RequestProfile(tool, session_id) as profile:
+        result = await run()
+    breakdown = profile.breakdown()
+    breakdown["file"] = str(profile.write())
+    if request is not None:
+        breakdown["download"] = f"/profiles/{profile.id} (send the {PROFILE_HEADER} header)"
+
+    try:
+        data = json.loads(result)
+    except json.JSONDecodeError:
+        return f"{result}\n\n<!-- profile: {json.dumps(breakdown)} -->\n"  # markdown spec
+    if not isinstance(data, dict):
+        return result
+    return json.dumps({**data, "profile": breakdown}, indent=2)
+
+
+@mcp.custom_route("/profiles/{profile_id}", methods=["GET"])
+async def download_profile(request):
+    """Collapsed-stack profile of a profiled call, for flamegraph.pl, inferno or speedscope."""
+    from starlette.responses import FileResponse, PlainTextResponse
+
+    if not is_profile_admin(request.headers):
+        return PlainTextResponse("Forbidden", status_code=403)
+    path = profile_path(request.path_params["profile_id"])
+    if path is None:
+        return PlainTextResponse("Profile not found", status_code=404)
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+async def with_session(session_id: str, fn: Callable[..., Awaitable[str]], *args: Any) -> str:
+    """Run fn(session, *args) with the session checked out of the store for the whole call."""
+    with sessions.checkout(session_id) as session:
+        return attach_session_token(session, await fn(session, *args))
+
+
+def index_sessions() -> int:
+    """Add every stored session (including restored ones) to the warm-start index."""
+    for session_id, requirement, domain, tenant in sessions.requirements():
+        session_index.add(session_id, requirement, domain, tenant)
+    return len(session_index)
+
+
+def find_warm_start(requirement: str, domain: str | None, tenant: str | None) -> tuple[Session, float] | None:
+    """Tenant's most similar earlier session that has answered questions to offer, with its similarity.
+
+    Other tenants' sessions are never offered: their clarifications and assumptions are theirs.
+    """
+    for session_id, score in session_index.search(requirement, domain, tenant):
+        if score < WARM_START_HINT_THRESHOLD:
+            break
+        source = sessions.get(session_id)
+        if source is not None and any(c.answer is not None for c in source.clarifications):
+            return source, score
+    return None
+
+
+FALLBACK_NOTES = {
+    "claude_unavailable": "Claude was unavailable, so this result comes from the built-in rule-based generator. "
+                          "Later rounds use Claude again once it recovers.",
+    "unusable_output": "Claude answered, but its reply could not be used, so this result comes from the built-in "
+                       "rule-based generator. Claude is not unavailable: the reply is not recorded against the "
+                       "circuit breaker, and the next round calls Claude as usual.",
+}
+
+
+def fallback_note(reason: str, kind: str = "claude_unavailable") -> dict[str, str]:
+    """Marks a response produced without Claude, and why: an outage or an unusable reply."""
+    return {
+        "mode": "local_question_bank",
+        "kind": kind,
+        "reason": reason,
+        "note": FALLBACK_NOTES[kind],
+    }
+
+
+async def analyze_sections(
+    sections: list[str],
+    domain: str | None,
+    audience: str | None,
+    known_questions: list[str],
+    api_key: str | None,
+) -> list[str | BaseException]:
+    """Claude's analysis of each section of a long requirement, requested concurrently.
+
+    Failed sections are returned as their exception. Raises ClaudeUnavailable if all of
+    them failed because of it.
+    """
+    outline = [section_heading(section) for section in sections]
+
+    async def analyze(position: int, section: str) -> str:
+        with phase("prompt_build"):
+            input_text = build_section_analyzer_input(
+                section, position, outline, domain, audience, known_questions=known_questions
+            )
+        return await call_claude(SECTION_ANALYZER_PROMPT, input_text, api_key)
+
+    results = await asyncio.gather(
+        *(analyze(position, section) for position, section in enumerate(sections)),
+        return_exceptions=True,
+    )
+    if all(isinstance(r, ClaudeUnavailable) for r in results):
+        raise results[0]
+    return results
+
+
+def merge_sections(
+    requirement: str, sections: list[str], responses: list[str | BaseException]
+) -> tuple[RequirementAnalysis, str, dict[str, int]]:
+    """Merged analysis, digest and section counts from the per-section Claude responses.
+
+    A section whose analysis failed is represented in the digest by a clip of its text.
+    Raises ValueError if no section could be analyzed.
     """
+    analyses: list[SectionAnalysis] = []
+    summaries: list[tuple[str, str]] = []
+    errors = []
+    for section, response in zip(sections, responses):
+        analysis = None
+        if isinstance(response, BaseException):
+            errors.append(str(response))
+        else:
+            try:
+                data = parse_json_response(response)
+                with phase("validate"):
+                    analysis = SectionAnalysis(**data)
+            except (json.JSONDecodeError, ValidationError, TypeError) as e:
+                errors.append(f"Unusable section analysis: {e}")
+        if analysis is not None:
+            analyses.append(analysis)
+        summaries.append((section_heading(section), section if analysis is None else analysis.summary))
+    if not analyses:
+        raise ValueError(f"No section of the requirement could be analyzed: {errors[0]}")
+
+    analysis = merge_analyses(analyses)
+    digest = build_digest(analysis.core_need, len(requirement), summaries, analysis.entities)
+    return analysis, digest, {
+        "sections": len(sections),
+        "sections_failed": len(errors),
+        "requirement_chars": len(requirement),
+        "digest_chars": len(digest),
+    }
+
+
+async def _start_session(
+    requirement: str,
+    domain: str | None,
+    audience: str | None,
+    reuse_similar: bool,
+    api_key: str | None,
+) -> str:
+    """Create a session and its first round of questions."""
     # Create session
     session_id = str(uuid.uuid4())
     now = datetime.now()
@@ -313,15 +693,68 @@ async def spec_start_session(
         requirement=requirement,
         context=SessionContext(domain=domain, audience=audience_enum),
         round_count=1,
+        tenant=tenant_of(api_key),
     )
 
-    # Analyze requirement
-    input_text = build_analyzer_input(requirement, domain, audience)
-    response = await call_claude(REQUIREMENT_ANALYZER_PROMPT, input_text)
+    warm_start = find_warm_start(requirement, domain, session.tenant) if reuse_similar else None
+    known_questions = [
+        AnalyzedQuestion(question=c.question, category=c.category, priority=c.priority, why=c.why)
+        for c in warm_start[0].clarifications
+        if c.answer is not None
+    ] if warm_start else []
+    reused = warm_start is not None and warm_start[1] >= WARM_START_REUSE_THRESHOLD
+
+    # Analyze requirement, unless a near-identical earlier session already vetted its questions.
+    # Long documents are analyzed in sections at once, and later rounds get a digest of them.
+    fallback_reason = None
+    sections = None
+    if not reused:
+        try:
+            if 0 < LARGE_INPUT_CHARS <= len(requirement):
+                with phase("prompt_build"):
+                    sections = split_sections(requirement)
+                responses = await analyze_sections(
+                    sections, domain, audience, [q.question for q in known_questions], api_key
+                )
+            else:
+                with phase("prompt_build"):
+                    input_text = build_analyzer_input(
+                        requirement, domain, audience, known_questions=[q.question for q in known_questions]
+                    )
+                response = await call_claude(REQUIREMENT_ANALYZER_PROMPT, input_text, api_key)
+        except ClaudeUnavailable as e:
+            fallback_reason = str(e)
+
+    large_input = None
 
     try:
-        data = parse_json_response(response)
-        analysis = RequirementAnalysis(**data)
+        if fallback_reason:
+            analysis = RequirementAnalysis(
+                core_need=requirement if sections is None else section_heading(sections[0]),
+                entities=[],
+                implicit_assumptions=[],
+                questions=fallback_questions(session, count=5),
+            )
+            if sections is not None:
+                # No summaries without Claude; clips of the sections stand in for them
+                session.requirement_digest = build_digest(
+                    analysis.core_need, len(requirement), [(section_heading(s), s) for s in sections], []
+                )
+        elif reused:
+            source = warm_start[0]
+            analysis = RequirementAnalysis(
+                core_need=requirement,
+                entities=[],
+                implicit_assumptions=source.assumptions,
+                questions=known_questions,
+            )
+            session.assumptions = list(source.assumptions)
+        elif sections is not None:
+            analysis, session.requirement_digest, large_input = merge_sections(requirement, sections, responses)
+        else:
+            data = parse_json_response(response)
+            with phase("validate"):
+                analysis = RequirementAnalysis(**data)
 
         # Convert to clarifications
         clarifications = [
@@ -337,8 +770,9 @@ async def spec_start_session(
 
         session.clarifications = clarifications
         sessions[session_id] = session
+        session_index.add(session_id, requirement, domain, session.tenant)
 
-        return json.dumps({
+        result = {
             "session_id": session_id,
             "status": "in_progress",
             "analysis": {
@@ -357,7 +791,20 @@ async def spec_start_session(
             ],
             "completeness": session.completeness.model_dump(),
             "instructions": "Use spec_answer_questions to provide answers to these questions.",
-        }, indent=2)
+            **session_token_fields(session),
+        }
+        if warm_start:
+            result["warm_start"] = {
+                "source_session_id": warm_start[0].id,
+                "similarity": round(warm_start[1], 3),
+                "mode": "reused" if reused else "hinted",
+            }
+        if large_input:
+            result["large_input"] = large_input
+        if fallback_reason:
+            result["fallback"] = fallback_note(fallback_reason)
+        with phase("render"):
+            return json.dumps(result, indent=2)
 
     except Exception as e:
         return json.dumps({
@@ -368,27 +815,91 @@ async def spec_start_session(
 
 
 @mcp.tool()
-async def spec_answer_questions(
-    session_id: str,
-    answers: list[dict[str, str]]
+async def spec_start_session(
+    requirement: str,
+    domain: str | None = None,
+    audience: str | None = None,
+    idempotency_key: str | None = None,
+    reuse_similar: bool = True,
+    ctx: Context | None = None,
 ) -> str:
-    """Provide answers to clarifying questions in an active session.
+    """Start a new specification clarification session from a rough or incomplete requirement.
 
-    USE THIS TOOL WHEN: You have a session_id from spec_start_session and want to answer pending questions.
+    USE THIS TOOL WHEN: You have a vague requirement like "build a dashboard" or "we need order tracking"
+    and need to systematically uncover missing details before implementation.
 
-    RETURNS: Updated completeness scores and any new follow-up questions.
+    RETURNS: A session_id (save this!) and initial clarifying questions organized by category.
+    In stateless mode also a session_token, to pass back with the next call for this session.
+
+    TYPICAL WORKFLOW: spec_start_session -> spec_answer_questions (repeat until 80%+) -> spec_generate
 
     Args:
-        session_id: The session_id returned from spec_start_session.
-        answers: List of {"question_id": "q1_1", "answer": "your answer"} objects.
+        requirement: The initial requirement, idea, or feature request to clarify.
+        domain: Optional domain context (e.g., 'e-commerce', 'healthcare', 'fintech').
+        audience: Optional target audience ('technical', 'business', or 'mixed').
+        idempotency_key: Optional client-chosen key; retries with the same key return the original session.
+        reuse_similar: Start from the answered questions of a closely matching earlier session (default true).
     """
-    session = sessions.get(session_id)
-    if not session:
+    await sessions.ready()
+    if drain.draining:
         return json.dumps({
-            "error": "Session not found",
-            "session_id": session_id,
-            "recovery": "Use spec_list_sessions to see available sessions, or spec_start_session to create a new one.",
-        })
+            "error": "Server is restarting",
+            "recovery": "Retry in a few seconds. Existing sessions are preserved across the restart.",
+        }, indent=2)
+
+    api_key = request_api_key(ctx)
+
+    async def start() -> str:
+        return await _start_session(requirement, domain, audience, reuse_similar, api_key)
+
+    # Only calls that name the same idempotency key share a session. Identical requirements are
+    # not enough: on a deployment with a shared key every caller is the same tenant.
+    if idempotency_key is None:
+        return await profiled("spec_start_session", None, ctx, start)
+    # Keyed per tenant, so callers with different API keys never share a session
+    return await profiled("spec_start_session", None, ctx, lambda: single_flight.run(
+        ("spec_start_session", tenant_of(api_key), idempotency_key),
+        start,
+        remember=True,
+        cacheable=succeeded,
+    ))
+
+
+def round_progress(session: Session) -> dict[str, Any]:
+    """Answers to the latest round of questions, and whether the next round may be generated.
+
+    The next round is due once ROUND_ANSWER_FRACTION of the latest round is answered, or all
+    of its critical questions are.
+    """
+    prefix = f"q{session.round_count}_"
+    latest = [c for c in session.clarifications if c.id.startswith(prefix)]
+    answered = sum(1 for c in latest if c.answer is not None)
+    critical_pending = sum(
+        1 for c in latest if c.answer is None and c.priority == QuestionPriority.CRITICAL
+    )
+    has_critical = any(c.priority == QuestionPriority.CRITICAL for c in latest)
+    # Rounded first so that e.g. 0.6 * 5 asks for 3 answers, not 4
+    needed = math.ceil(round(ROUND_ANSWER_FRACTION * len(latest), 6))
+    return {
+        "answered": answered,
+        "total": len(latest),
+        "needed": needed,
+        "critical_pending": critical_pending,
+        "ready": answered >= needed or (has_critical and not critical_pending),
+    }
+
+
+async def _answer_questions(
+    session: Session,
+    answers: list[dict[str, str]],
+    api_key: str | None,
+    force_new_round: bool = False,
+) -> str:
+    """Record answers and generate the next round of questions once the current one is answered enough.
+
+    Runs under the session lock.
+    """
+    session_id = session.id
 
     # Apply answers
     for ans in answers:
@@ -402,114 +913,312 @@ async def spec_answer_questions(
 
     # Check if we need more questions
     needs_more = session.completeness.overall < 80 and session.round_count < 5
+    # A partial submission only records its answers; no Claude call until the round is answered enough
+    deferred = needs_more and not force_new_round and not round_progress(session)["ready"]
     new_questions: list[Clarification] = []
+    duplicates_suppressed = 0
+    fallback_reason = None
+    fallback_kind = "claude_unavailable"
 
-    if needs_more:
-        input_text = build_question_generator_input(session)
-        response = await call_claude(QUESTION_GENERATOR_PROMPT, input_text)
+    # The version is raised once the round is complete, so a poll during the Claude call cannot
+    # cache a half-finished round under the new version; in `finally`, so a call that fails
+    # (an invalid API key, say) still reports the answers recorded above as a change.
+    try:
+        if needs_more and not deferred:
+            with phase("prompt_build"):
+                input_text = build_question_generator_input(session)
+            candidates = []
+            try:
+                response = await call_claude(QUESTION_GENERATOR_PROMPT, input_text, api_key)
+                data = parse_json_response(response)
+                with phase("validate"):
+                    candidates = GeneratedQuestions(**data).questions
+            except ClaudeUnavailable as e:
+                fallback_reason = str(e)
+            except (json.JSONDecodeError, ValidationError, TypeError) as e:
+                fallback_reason = f"Unusable question generator output: {e}"
+                fallback_kind = "unusable_output"
+            if fallback_reason:
+                # Keep the session moving rather than returning a round without questions
+                candidates = fallback_questions(session)
+
+            try:
+                questions, duplicates = dedupe_questions(session.clarifications, candidates)
+
+                # Mostly re-asked questions: request replacements once, naming what was rejected
+                if duplicates and len(duplicates) >= len(questions) and not fallback_reason:
+                    with phase("prompt_build"):
+                        input_text = build_question_generator_input(session, rejected=[q.question for q in duplicates])
+                    try:
+                        response = await call_claude(QUESTION_GENERATOR_PROMPT, input_text, api_key)
+                        data = parse_json_response(response)
+                        with phase("validate"):
+                            replacement = GeneratedQuestions(**data)
+                        more, more_duplicates = dedupe_questions(
+                            session.clarifications, questions + replacement.questions
+                        )
+                        questions = more
+                        duplicates += more_duplicates
+                    except Exception:
+                        pass  # Keep the non-duplicate questions from the first call
+
+                duplicates_suppressed = len(duplicates)
+                new_questions = [
+                    Clarification(
+                        id=f"q{session.round_count + 1}_{i+1}",
+                        question=q.question,
+                        category=q.category,
+                        priority=q.priority,
+                        why=q.why,
+                    )
+                    for i, q in enumerate(questions)
+                ]
+
+                session.clarifications.extend(new_questions)
+            except Exception:
+                pass  # Continue without new questions
+
+        if not deferred:
+            session.round_count += 1
+        session.completeness = calculate_completeness(session)
+
+        if session.completeness.overall >= 80:
+            session.status = SessionStatus.READY_TO_GENERATE
+    finally:
+        session.version += 1
 
-        try:
-            data = parse_json_response(response)
-            generated = GeneratedQuestions(**data)
-
-            new_questions = [
-                Clarification(
-                    id=f"q{session.round_count + 1}_{i+1}",
-                    question=q.question,
-                    category=q.category,
-                    priority=q.priority,
-                    why=q.why,
-                )
-                for i, q in enumerate(generated.questions)
-            ]
+    pending = [c for c in session.clarifications if c.answer is None]
+    progress = round_progress(session)
+    del progress["ready"]
+
+    if session.status == SessionStatus.READY_TO_GENERATE:
+        next_step = "Completeness threshold reached. Use spec_generate to create the specification."
+    elif deferred:
+        next_step = (
+            f"Answer {max(progress['needed'] - progress['answered'], 1)} more of this round's questions "
+            "(or all of its critical ones) to get follow-up questions, or pass force_new_round=true."
+        )
+    else:
+        next_step = f"Answer the {len(pending)} pending questions to continue."
 
-            session.clarifications.extend(new_questions)
-        except Exception:
-            pass  # Continue without new questions
+    with phase("render"):
+        return json.dumps({
+            "session_id": session_id,
+            "status": session.status.value,
+            "completeness": session.completeness.model_dump(),
+            "round": session.round_count,
+            "round_progress": progress,
+            "follow_up_deferred": deferred,
+            "answers_recorded": len(answers),
+            "duplicates_suppressed": duplicates_suppressed,
+            **({"fallback": fallback_note(fallback_reason, fallback_kind)} if fallback_reason else {}),
+            "pending_questions": [
+                {
+                    "id": c.id,
+                    "question": c.question,
+                    "category": c.category.value,
+                    "priority": c.priority.value,
+                }
+                for c in pending
+            ],
+            "next_step": next_step,
+        }, indent=2)
 
-    session.round_count += 1
-    session.completeness = calculate_completeness(session)
 
-    if session.completeness.overall >= 80:
-        session.status = SessionStatus.READY_TO_GENERATE
+@mcp.tool()
+async def spec_answer_questions(
+    session_id: str,
+    answers: list[dict[str, str]],
+    idempotency_key: str | None = None,
+    force_new_round: bool = False,
+    session_token: str | None = None,
+    ctx: Context | None = None,
+) -> str:
+    """Provide answers to clarifying questions in an active session.
 
-    pending = [c for c in session.clarifications if c.answer is None]
+    USE THIS TOOL WHEN: You have a session_id from spec_start_session and want to answer pending questions.
 
-    return json.dumps({
-        "session_id": session_id,
-        "status": session.status.value,
-        "completeness": session.completeness.model_dump(),
-        "round": session.round_count,
-        "answers_recorded": len(answers),
-        "pending_questions": [
-            {
-                "id": c.id,
-                "question": c.question,
-                "category": c.category.value,
-                "priority": c.priority.value,
-            }
-            for c in pending
-        ],
-        "next_step": (
-            "Completeness threshold reached. Use spec_generate to create the specification."
-            if session.status == SessionStatus.READY_TO_GENERATE
-            else f"Answer the {len(pending)} pending questions to continue."
-        ),
-    }, indent=2)
+    RETURNS: Updated completeness scores, and follow-up questions once most of the current
+    round (or all of its critical questions) is answered. Until then answers are only recorded.
+
+    Args:
+        session_id: The session_id returned from spec_start_session.
+        answers: List of {"question_id": "q1_1", "answer": "your answer"} objects.
+        idempotency_key: Optional client-chosen key; retries with the same key return the original result.
+        force_new_round: Generate follow-up questions now, however much of the round is answered.
+        session_token: Stateless mode: the session_token from the latest response for this session.
+    """
+    await sessions.ready()
+    error = adopt_session_token(session_id, session_token)
+    if error:
+        return error
+    if session_id not in sessions:
+        return json.dumps({
+            "error": "Session not found",
+            "session_id": session_id,
+            "recovery": "Use spec_list_sessions to see available sessions, or spec_start_session to create a new one.",
+        })
+
+    # Identical overlapping submissions (client retries) share one round and one Claude call
+    return await profiled("spec_answer_questions", session_id, ctx, lambda: single_flight.run(
+        ("spec_answer_questions", session_id, idempotency_key or payload_digest(answers, force_new_round)),
+        lambda: with_session(session_id, _answer_questions, answers, request_api_key(ctx), force_new_round),
+        session_id=session_id,
+        remember=idempotency_key is not None,
+        cacheable=succeeded,
+    ))
+
+
+async def _get_gaps(session: Session, api_key: str | None) -> str:
+    """Run gap analysis for a session."""
+    session_id = session.id
+
+    with phase("prompt_build"):
+        input_text = build_gap_analyzer_input(session)
+    fallback_reason = None
+    try:
+        response = await call_claude(GAP_ANALYZER_PROMPT, input_text, api_key)
+    except ClaudeUnavailable as e:
+        fallback_reason = str(e)
+
+    try:
+        if fallback_reason:
+            analysis = fallback_gap_analysis(session)
+        else:
+            data = parse_json_response(response)
+            with phase("validate"):
+                analysis = GapAnalysis(**data)
+
+        with phase("render"):
+            return json.dumps({
+                "session_id": session_id,
+                "completeness": session.completeness.model_dump(),
+                "gap_analysis": {
+                    "gaps": [g.model_dump() for g in analysis.gaps],
+                    "ready_to_generate": analysis.ready_to_generate,
+                    "blocking_gaps": analysis.blocking_gaps,
+                },
+                "recommendation": (
+                    "Ready to generate specification. Use spec_generate."
+                    if analysis.ready_to_generate
+                    else f"Resolve blocking gaps first: {', '.join(analysis.blocking_gaps)}"
+                ),
+                **({"fallback": fallback_note(fallback_reason)} if fallback_reason else {}),
+            }, indent=2)
+
+    except Exception as e:
+        return json.dumps({
+            "error": "Failed to analyze gaps",
+            "details": str(e),
+            "completeness": session.completeness.model_dump(),
+            "recovery": "Try again or use spec_get_status for a simpler progress check.",
+        }, indent=2)
 
 
 @mcp.tool()
-async def spec_get_gaps(session_id: str) -> str:
+async def spec_get_gaps(
+    session_id: str,
+    background: bool = False,
+    session_token: str | None = None,
+    ctx: Context | None = None,
+) -> str:
     """Analyze what's missing in a specification session and get recommendations.
 
     USE THIS TOOL WHEN: You want to understand why completeness is low or identify blocking gaps.
 
     Args:
         session_id: The session_id to analyze.
+        background: Return a job_id immediately and run the analysis in the background (poll spec_job_status).
+        session_token: Stateless mode: the session_token from the latest response for this session.
     """
-    session = sessions.get(session_id)
-    if not session:
+    await sessions.ready()
+    error = adopt_session_token(session_id, session_token)
+    if error:
+        return error
+    if session_id not in sessions:
         return json.dumps({
             "error": "Session not found",
             "session_id": session_id,
             "recovery": "Use spec_list_sessions to see available sessions.",
         })
 
-    input_text = build_gap_analyzer_input(session)
-    response = await call_claude(GAP_ANALYZER_PROMPT, input_text)
+    api_key = request_api_key(ctx)
 
-    try:
-        data = parse_json_response(response)
-        analysis = GapAnalysis(**data)
+    def run():
+        return single_flight.run(
+            ("spec_get_gaps", session_id),
+            lambda: with_session(session_id, _get_gaps, api_key),
+            session_id=session_id,
+        )
+
+    if background:
+        return submit_job("spec_get_gaps", session_id, run, api_key)
+    return await profiled("spec_get_gaps", session_id, ctx, run)
+
+
+async def _generate(session: Session, format: str, api_key: str | None) -> str:
+    """Compile a session into a specification."""
+    session_id = session.id
+
+    if session.completeness.overall < 60:
+        return json.dumps({
+            "warning": "Completeness is below 60%. Spec may have significant gaps.",
+            "completeness": session.completeness.model_dump(),
+            "suggestion": "Continue answering questions or use spec_get_gaps to see what's missing.",
+        }, indent=2)
 
+    with phase("prompt_build"):
+        input_text = build_spec_compiler_input(session)
+    try:
+        response = await call_claude(SPEC_COMPILER_PROMPT, input_text, api_key)
+    except ClaudeUnavailable as e:
+        # No local stand-in for spec compilation; the session is unchanged and can be retried
         return json.dumps({
+            "error": "Claude is unavailable",
+            "details": str(e),
             "session_id": session_id,
             "completeness": session.completeness.model_dump(),
-            "gap_analysis": {
-                "gaps": [g.model_dump() for g in analysis.gaps],
-                "ready_to_generate": analysis.ready_to_generate,
-                "blocking_gaps": analysis.blocking_gaps,
-            },
-            "recommendation": (
-                "Ready to generate specification. Use spec_generate."
-                if analysis.ready_to_generate
-                else f"Resolve blocking gaps first: {', '.join(analysis.blocking_gaps)}"
-            ),
+            "recovery": "Retry spec_generate shortly - your session progress is saved.",
         }, indent=2)
 
+    try:
+        data = parse_json_response(response)
+        with phase("validate"):
+            spec = GeneratedSpec(**data)
+
+        session.status = SessionStatus.COMPLETE
+        session.updated_at = datetime.now()
+        session.version += 1
+
+        with phase("render"):
+            if format == "markdown":
+                return format_spec_as_markdown(spec, session)
+
+            return json.dumps({
+                "session_id": session_id,
+                "status": "complete",
+                "completeness": session.completeness.model_dump(),
+                "specification": spec.model_dump(),
+            }, indent=2)
+
     except Exception as e:
         return json.dumps({
-            "error": "Failed to analyze gaps",
+            "error": "Failed to generate specification",
             "details": str(e),
+            "session_id": session_id,
             "completeness": session.completeness.model_dump(),
-            "recovery": "Try again or use spec_get_status for a simpler progress check.",
+            "recovery": "Try again - your session progress is saved.",
         }, indent=2)
 
 
 @mcp.tool()
 async def spec_generate(
     session_id: str,
-    format: str = "markdown"
+    format: str = "markdown",
+    idempotency_key: str | None = None,
+    background: bool = False,
+    session_token: str | None = None,
+    ctx: Context | None = None,
 ) -> str:
     """Generate the final structured specification from a completed session.
 
@@ -518,74 +1227,160 @@ async def spec_generate(
     Args:
         session_id: The session_id to compile into a specification.
         format: Output format - 'markdown' (default) or 'json'.
+        idempotency_key: Optional client-chosen key; retries with the same key return the original spec.
+        background: Return a job_id immediately and generate in the background (poll spec_job_status).
+        session_token: Stateless mode: the session_token from the latest response for this session.
     """
-    session = sessions.get(session_id)
-    if not session:
+    await sessions.ready()
+    error = adopt_session_token(session_id, session_token)
+    if error:
+        return error
+    if session_id not in sessions:
         return json.dumps({
             "error": "Session not found",
             "session_id": session_id,
             "recovery": "Use spec_list_sessions to see available sessions.",
         })
 
-    if session.completeness.overall < 60:
+    api_key = request_api_key(ctx)
+
+    def run():
+        return single_flight.run(
+            ("spec_generate", session_id, idempotency_key or format),
+            lambda: with_session(session_id, _generate, format, api_key),
+            session_id=session_id,
+            remember=idempotency_key is not None,
+            cacheable=succeeded,
+        )
+
+    if background:
+        return submit_job("spec_generate", session_id, run, api_key)
+    return await profiled("spec_generate", session_id, ctx, run)
+
+
+def submit_job(tool: str, session_id: str, run: Callable[[], Awaitable[str]], api_key: str | None) -> str:
+    """Queue a tool call on the worker pool and describe the job to the client.
+
+    The job belongs to the caller's tenant, and reports failed if the tool returns an error.
+    """
+    if drain.draining:
         return json.dumps({
-            "warning": "Completeness is below 60%. Spec may have significant gaps.",
-            "completeness": session.completeness.model_dump(),
-            "suggestion": "Continue answering questions or use spec_get_gaps to see what's missing.",
+            "error": "Server is restarting",
+            "recovery": "Retry in a few seconds. Existing sessions are preserved across the restart.",
         }, indent=2)
 
-    input_text = build_spec_compiler_input(session)
-    response = await call_claude(SPEC_COMPILER_PROMPT, input_text)
+    job = jobs.submit(tool, session_id, run, tenant=tenant_of(api_key), succeeded=succeeded)
+    return json.dumps({
+        **job.describe(),
+        "next_step": f"Poll spec_job_status(job_id, wait_seconds={JOB_POLL_MAX_SECONDS}) until the status is succeeded.",
+    }, indent=2)
 
-    try:
-        data = parse_json_response(response)
-        spec = GeneratedSpec(**data)
 
-        session.status = SessionStatus.COMPLETE
-        session.updated_at = datetime.now()
+def describe_job(job: Job) -> str:
+    """Job status, with the parsed result or the error once finished."""
+    data = job.describe()
+    if job.result is not None:
+        try:
+            data["result"] = json.loads(job.result)
+        except json.JSONDecodeError:
+            data["result"] = job.result  # markdown spec
+    if job.error is not None:
+        data["error"] = job.error
+        data["recovery"] = f"Resubmit {job.tool} once the problem is resolved."
+    return json.dumps(data, indent=2)
+
+
+def find_job(job_id: str, ctx: Context | None) -> Job | None:
+    """The job, if it exists and was submitted by the caller's tenant."""
+    job = jobs.get(job_id)
+    if job is None or job.tenant != tenant_of(request_api_key(ctx)):
+        return None  # Another tenant's job is reported as not found, not as forbidden
+    return job
+
+
+@mcp.tool()
+async def spec_job_status(job_id: str, wait_seconds: float = 0, ctx: Context | None = None) -> str:
+    """Check a background job started by spec_generate or spec_get_gaps, and get its result.
 
-        if format == "markdown":
-            return format_spec_as_markdown(spec, session)
+    USE THIS TOOL WHEN: A tool call returned a job_id instead of a result.
 
+    Args:
+        job_id: The job_id returned when the job was submitted.
+        wait_seconds: Long-poll: wait up to this many seconds (max 25) for the job to finish.
+    """
+    job = find_job(job_id, ctx)
+    if job is None:
         return json.dumps({
-            "session_id": session_id,
-            "status": "complete",
-            "completeness": session.completeness.model_dump(),
-            "specification": spec.model_dump(),
+            "error": "Job not found",
+            "job_id": job_id,
+            "recovery": "Finished jobs are kept for an hour and do not survive a server restart. Resubmit the call.",
         }, indent=2)
 
-    except Exception as e:
+    await jobs.wait(job, min(max(wait_seconds, 0), JOB_POLL_MAX_SECONDS))
+    return describe_job(job)
+
+
+@mcp.tool()
+async def spec_cancel_job(job_id: str, ctx: Context | None = None) -> str:
+    """Cancel a queued or running background job.
+
+    A Claude call that has already started is allowed to finish so its result can still
+    update the session, but the job reports cancelled and returns no result.
+
+    Args:
+        job_id: The job_id to cancel.
+    """
+    job = find_job(job_id, ctx)
+    if job is None:
         return json.dumps({
-            "error": "Failed to generate specification",
-            "details": str(e),
-            "session_id": session_id,
-            "completeness": session.completeness.model_dump(),
-            "recovery": "Try again - your session progress is saved.",
+            "error": "Job not found",
+            "job_id": job_id,
+            "recovery": "Use the job_id returned by spec_generate or spec_get_gaps.",
         }, indent=2)
 
+    jobs.cancel(job)
+    await jobs.wait(job, 1)
+    return describe_job(job)
+
 
 @mcp.tool()
-async def spec_get_status(session_id: str) -> str:
+async def spec_get_status(
+    session_id: str,
+    session_token: str | None = None,
+    if_version: int | None = None,
+) -> str:
     """Get a quick status overview of a clarification session.
 
     USE THIS TOOL WHEN: You need to check progress or resume work on a session.
 
     Args:
         session_id: The session_id to check.
+        session_token: Stateless mode: the session_token from the latest response for this session.
+        if_version: When polling, the version from the previous response; an unchanged session
+            returns only {"not_modified": true}.
     """
-    session = sessions.get(session_id)
-    if not session:
+    await sessions.ready()
+    error = adopt_session_token(session_id, session_token)
+    if error:
+        return error
+    version = sessions.version(session_id)
+    if version is None:
         return json.dumps({
             "error": "Session not found",
             "session_id": session_id,
             "recovery": "Use spec_list_sessions to see available sessions.",
         })
+    if version == if_version:
+        return json.dumps({"session_id": session_id, "version": version, "not_modified": True})
+
+    session = sessions[session_id]
 
     pending = [c for c in session.clarifications if c.answer is None]
     answered = [c for c in session.clarifications if c.answer is not None]
 
     return json.dumps({
         "session_id": session_id,
+        "version": session.version,
         "status": session.status.value,
         "created_at": session.created_at.isoformat(),
         "updated_at": session.updated_at.isoformat(),
@@ -606,26 +1401,46 @@ async def spec_get_status(session_id: str) -> str:
             for c in pending
         ],
         "assumptions": session.assumptions,
+        **session_token_fields(session),
     }, indent=2)
 
 
+def describe_listed(s: Session | CompactSession) -> dict[str, Any]:
+    """A session's entry in spec_list_sessions."""
+    return {
+        "id": s.id,
+        "requirement": s.requirement[:100] + ("..." if len(s.requirement) > 100 else ""),
+        "status": s.status.value,
+        "completeness": s.completeness.overall,
+        "created_at": s.created_at.isoformat(),
+        "version": s.version,
+    }
+
+
 @mcp.tool()
-async def spec_list_sessions() -> str:
+async def spec_list_sessions(since: str | None = None) -> str:
     """List all clarification sessions stored on this server.
 
     USE THIS TOOL WHEN: You need to find a previous session or see all work in progress.
+
+    Args:
+        since: When polling, the cursor from the previous response. Only sessions created or
+            changed since then are returned, under "changed" ({"not_modified": true} if none).
+            A full listing comes back instead when the cursor has expired, e.g. after a restart.
     """
+    await sessions.ready()
+    changed = sessions.changed_since(since) if since else None
+    if changed is not None:
+        if not changed:
+            return json.dumps({"cursor": sessions.cursor, "not_modified": True})
+        return json.dumps({
+            "cursor": sessions.cursor,
+            "changed": [describe_listed(s) for s in changed],
+        }, indent=2)
+
     return json.dumps({
-        "sessions": [
-            {
-                "id": s.id,
-                "requirement": s.requirement[:100] + ("..." if len(s.requirement) > 100 else ""),
-                "status": s.status.value,
-                "completeness": s.completeness.overall,
-                "created_at": s.created_at.isoformat(),
-            }
-            for s in sessions.values()
-        ]
+        "cursor": sessions.cursor,
+        "sessions": [describe_listed(s) for s in sessions.summaries()],
     }, indent=2)
 
 
@@ -635,10 +1450,13 @@ async def spec_info() -> str:
 
     USE THIS TOOL WHEN: You want to verify the server is working correctly.
     """
-    active = [s for s in sessions.values() if s.status == SessionStatus.IN_PROGRESS]
-    complete = [s for s in sessions.values() if s.status == SessionStatus.COMPLETE]
+    await sessions.ready()
+    statuses = [s.status for s in sessions.summaries()]
+    active = [s for s in statuses if s == SessionStatus.IN_PROGRESS]
+    complete = [s for s in statuses if s == SessionStatus.COMPLETE]
 
     api_status = "configured" if os.getenv("ANTHROPIC_API_KEY") else "missing"
+    circuit = claude_breaker.describe()
 
     return json.dumps({
         "server": {
@@ -647,25 +1465,32 @@ async def spec_info() -> str:
             "description": "Transform rough requirements into complete technical specifications through AI-powered clarification dialogues",
         },
         "health": {
-            "status": "healthy" if api_status == "configured" else "degraded",
+            "status": "healthy" if api_status == "configured" and circuit["state"] == "closed" else "degraded",
             "api": api_status,
             "api_message": (
                 "Anthropic API key is configured"
                 if api_status == "configured"
                 else "ANTHROPIC_API_KEY environment variable is missing"
             ),
+            "claude_circuit": circuit,
         },
         "statistics": {
             "total_sessions": len(sessions),
             "active_sessions": len(active),
             "completed_sessions": len(complete),
+            "active_jobs": jobs.active,
         },
+        "event_loop": loop_watchdog.describe() if loop_watchdog else None,
+        "token_budget": token_budget.describe(),
+        "event_log": event_log.describe() if event_log else None,
         "capabilities": {
             "tools": [
                 "spec_start_session",
                 "spec_answer_questions",
                 "spec_get_gaps",
                 "spec_generate",
+                "spec_job_status",
+                "spec_cancel_job",
                 "spec_get_status",
                 "spec_list_sessions",
                 "spec_info",
@@ -678,6 +1503,9 @@ async def spec_info() -> str:
                 "constraints (10%)",
             ],
             "output_formats": ["markdown", "json"],
+            "session_tokens": (
+                "off" if state_tokens is None else "encrypted" if state_tokens.encrypt else "signed"
+            ),
         },
         "usage": {
             "typical_workflow": "spec_start_session -> spec_answer_questions (repeat) -> spec_generate",
@@ -686,16 +1514,66 @@ async def spec_info() -> str:
     }, indent=2)
 
 
-def main():
-    """Run the MCP server."""
-    # Get port from environment (Smithery sets PORT=8081)
-    port = int(os.getenv("PORT", "8080"))
+# In-process API, for callers without an MCP client in the loop (batch.py). Results are the
+# tool results; sessions are passed checked out of `sessions` (see SessionStore.checkout).
+
+async def start_session(
+    requirement: str,
+    domain: str | None = None,
+    audience: str | None = None,
+    reuse_similar: bool = True,
+    api_key: str | None = None,
+) -> str:
+    """Create a session and its first round of questions, as spec_start_session does."""
+    return await _start_session(requirement, domain, audience, reuse_similar, api_key)
+
+
+async def answer_questions(
+    session: Session,
+    answers: list[dict[str, str]],
+    api_key: str | None = None,
+    force_new_round: bool = False,
+) -> str:
+    """Record answers on a checked-out session and generate the next round if it is due."""
+    return await _answer_questions(session, answers, api_key, force_new_round)
+
+
+async def generate(session: Session, format: str = "markdown", api_key: str | None = None) -> str:
+    """Compile a checked-out session into a specification."""
+    return await _generate(session, format, api_key)
+
+
+def create_app():
+    """Build the ASGI app with Smithery, capture, compression and CORS middleware."""
+    # HTTP-only imports, kept out of stdio mode
+    from starlette.middleware.cors import CORSMiddleware
+
+    from middleware import CaptureMiddleware, CompressionMiddleware, DrainMiddleware, SmitheryConfigMiddleware
 
     # Get the ASGI app and add middleware
     app = mcp.streamable_http_app()
 
     # Add Smithery config middleware to extract API key from query params
-    app.add_middleware(SmitheryConfigMiddleware, set_api_key=set_api_key)
+    app.add_middleware(SmitheryConfigMiddleware)
+
+    # Track in-flight requests so SIGTERM can drain them
+    app.add_middleware(DrainMiddleware, state=drain)
+
+    # Opt-in traffic capture (SPEC_ITERATOR_CAPTURE=/path/to/capture.jsonl)
+    capture_path = os.getenv("SPEC_ITERATOR_CAPTURE")
+    if capture_path:
+        app.add_middleware(CaptureMiddleware, capture=enable_capture(capture_path))
+
+    # Serve Claude responses from a capture instead of the API
+    replay_path = os.getenv("SPEC_ITERATOR_REPLAY")
+    if replay_path:
+        enable_replay(replay_path, speed=float(os.getenv("SPEC_ITERATOR_REPLAY_SPEED", "1")))
+
+    # Compress larger responses (br or gzip, as the client accepts); outside capture so
+    # captures stay readable. 0 turns compression off.
+    compress_min_bytes = int(os.getenv("SPEC_ITERATOR_COMPRESS_MIN_BYTES", "1024"))
+    if compress_min_bytes > 0:
+        app.add_middleware(CompressionMiddleware, min_size=compress_min_bytes)
 
     # Add CORS middleware (Smithery requirements)
     app.add_middleware(
@@ -708,8 +1586,156 @@ def main():
         max_age=86400,
     )
 
+    return app
+
+
+def warm_client() -> None:
+    """Create the env-key client and open its connection so the first tool call reuses it."""
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if api_key and os.getenv("SPEC_ITERATOR_WARMUP", "1") != "0":
+        get_client(api_key).models.list(limit=1)
+
+
+async def drain_and_snapshot(timeout: float) -> None:
+    """Refuse new sessions, let in-flight requests and jobs finish, then hand sessions to the next process."""
+    drain.draining = True
+    deadline = time.monotonic() + timeout
+    print(f"> Draining {drain.inflight} in-flight request(s) and {jobs.active} job(s) (up to {timeout:.0f}s)")
+    if not await drain.wait_idle(timeout):
+        print(f"> Drain deadline passed with {drain.inflight} request(s) still running")
+    if not await jobs.wait_idle(deadline - time.monotonic()):
+        print(f"> Drain deadline passed with {jobs.active} job(s) still running")
+
+    if event_log is not None:
+        event_log.close()
+    snapshot_path = os.getenv("SPEC_ITERATOR_SNAPSHOT")
+    if snapshot_path:
+        await sessions.ready()
+        started = time.perf_counter()
+        count = sessions.save_snapshot(snapshot_path)
+        print(f"> Saved {count} session(s) to {snapshot_path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+async def serve(app, port: int, app_ready: float, startup_report: bool = False) -> None:
+    """Serve until shutdown, warming deferred imports and clients once the socket is bound."""
+    import uvicorn
+    from sse_starlette.sse import AppStatus
+
+    drain_timeout = float(os.getenv("SPEC_ITERATOR_DRAIN_TIMEOUT", "25"))
+
+    # sse-starlette would end in-flight SSE responses on SIGTERM; they are ended after draining
+    AppStatus.disable_automatic_graceful_drain()
+
+    class DrainingServer(uvicorn.Server):
+        async def shutdown(self, sockets=None):
+            # Stop accepting connections, then drain before uvicorn closes the app
+            for server in self.servers:
+                server.close()
+            await drain_and_snapshot(drain_timeout)
+            AppStatus.should_exit = True
+            # Only idle GET streams remain; don't hold the process open for them
+            self.config.timeout_graceful_shutdown = 1
+            await super().shutdown(sockets)
+
+    server = DrainingServer(uvicorn.Config(app, host="0.0.0.0", port=port, log_level="debug"))
+    if loop_watchdog:
+        loop_watchdog.start()
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started and not serve_task.done():
+        await asyncio.sleep(0.001)
+    listening = time.perf_counter()
+
+    warmup_timings: dict[str, float] = {}
+    warmup = threading.Thread(
+        target=warm_up,
+        args=({
+            "session snapshot restore": sessions.load_snapshot,
+            "warm-start index": index_sessions,
+            "anthropic import": lambda: importlib.import_module("anthropic"),
+            "pydantic schemas": build_schemas,
+            "client + connection pool": warm_client,
+        }, warmup_timings),
+        daemon=True,
+    )
+    warmup.start()
+
+    if startup_report:
+        print_report("Startup report (ms since main.py started)", [
+            ("module imports + app build", (app_ready - PROCESS_START) * 1000),
+            ("uvicorn import + bind", (listening - app_ready) * 1000),
+            ("time to listening", (listening - PROCESS_START) * 1000),
+        ])
+        await asyncio.to_thread(warmup.join)
+        print_report("Background warm-up (after listening)", list(warmup_timings.items()))
+        print_report("Import time by package (fresh interpreter)", await asyncio.to_thread(import_breakdown))
+
+    await serve_task
+
+
+async def serve_stdio() -> None:
+    """Serve the tools over stdin/stdout for a local client, using the env API key.
+
+    Nothing may be printed to stdout here; it carries the protocol.
+    """
+    threading.Thread(
+        target=warm_up,
+        args=({
+            "session snapshot restore": sessions.load_snapshot,
+            "warm-start index": index_sessions,
+            "anthropic import": lambda: importlib.import_module("anthropic"),
+            "pydantic schemas": build_schemas,
+            "client + connection pool": warm_client,
+        }, {}),
+        daemon=True,
+    ).start()
+
+    if loop_watchdog:
+        loop_watchdog.start()
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await jobs.wait_idle(float(os.getenv("SPEC_ITERATOR_DRAIN_TIMEOUT", "25")))
+        if event_log is not None:
+            event_log.close()
+        snapshot_path = os.getenv("SPEC_ITERATOR_SNAPSHOT")
+        if snapshot_path:
+            sessions.save_snapshot(snapshot_path)
+
+
+def main():
+    """Run the MCP server."""
+    parser = argparse.ArgumentParser(description="Spec Iterator MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=("http", "stdio"),
+        default=os.getenv("SPEC_ITERATOR_TRANSPORT", "http"),
+        help="http (streamable HTTP on $PORT, the default) or stdio for local clients.",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print import-time and time-to-listening breakdowns after binding.",
+    )
+    args = parser.parse_args()
+
+    # Sessions handed off by the previous process are decoded lazily after bind
+    snapshot_path = os.getenv("SPEC_ITERATOR_SNAPSHOT")
+    if snapshot_path:
+        sessions.attach_snapshot(snapshot_path)
+    if event_log is not None:
+        sessions.attach_log(event_log)
+
+    if args.transport == "stdio":
+        asyncio.run(serve_stdio())
+        return
+
+    # Get port from environment (Smithery sets PORT=8081)
+    port = int(os.getenv("PORT", "8080"))
+
+    app = create_app()
+
     print(f"> Server starting on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="debug")
+    asyncio.run(serve(app, port, time.perf_counter(), startup_report=args.startup_report))
 
 
 if __name__ == "__main__":
@@ -1,51 +1,308 @@
-"""Smithery configuration middleware for extracting API keys from query parameters."""
+"""HTTP middleware: Smithery config extraction, path normalization, drain tracking, capture
+and response compression.
+
+All middleware here is raw ASGI rather than BaseHTTPMiddleware, which would add a task
+and a body stream per request and buffer streamed MCP responses.
+"""
 
 import base64
 import json
-from typing import Callable
-from urllib.parse import parse_qs, urlparse
+import time
+import zlib
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping
+from urllib.parse import parse_qs
+
+from shutdown import DrainState
+
+EMPTY_CONFIG: Mapping[str, Any] = MappingProxyType({})
+
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+@lru_cache(maxsize=128)
+def decode_smithery_config(config_b64: str) -> Mapping[str, Any]:
+    """Decode the base64 JSON `config` query param; cached since clients resend it verbatim."""
+    try:
+        config = json.loads(base64.b64decode(config_b64).decode("utf-8"))
+    except Exception:
+        # Cache malformed configs too, so garbage isn't re-decoded on every request
+        return EMPTY_CONFIG
+    if not isinstance(config, dict):
+        return EMPTY_CONFIG
+    return MappingProxyType(config)
 
 
-class SmitheryConfigMiddleware(BaseHTTPMiddleware):
-    """Middleware that extracts Smithery config from base64-encoded query parameter."""
+class SmitheryConfigMiddleware:
+    """Middleware that extracts Smithery config from base64-encoded query parameter.
 
-    def __init__(self, app, set_api_key: Callable[[str], None]):
-        super().__init__(app)
-        self.set_api_key = set_api_key
+    The API key is handed to the tools through the request state (`request.state.api_key`)
+    instead of process globals, so concurrent tenants never see each other's key.
+    """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
         # Only process /mcp endpoints
-        if request.url.path.startswith("/mcp"):
+        if scope["type"] == "http" and scope["path"].startswith("/mcp") and scope["query_string"]:
+            config_b64 = parse_qs(scope["query_string"].decode("latin-1")).get("config")
+            if config_b64:
+                api_key = decode_smithery_config(config_b64[0]).get("ANTHROPIC_API_KEY")
+                if api_key:
+                    scope.setdefault("state", {})["api_key"] = api_key
+
+        await self.app(scope, receive, send)
+
+
+class MCPPathRedirectMiddleware:
+    """Middleware that normalizes /mcp to /mcp/ for consistent routing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Redirect /mcp to /mcp/
+        if scope["type"] == "http" and scope["path"] == "/mcp":
+            scope = dict(scope, path="/mcp/", raw_path=b"/mcp/")
+
+        await self.app(scope, receive, send)
+
+
+class DrainMiddleware:
+    """Middleware that counts in-flight MCP requests so shutdown can let them finish.
+
+    Long-lived GET streams are not counted; they carry no tool work and are closed on exit.
+    """
+
+    def __init__(self, app, state: DrainState):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "GET" or not scope["path"].startswith("/mcp"):
+            await self.app(scope, receive, send)
+            return
+
+        self.state.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.state.inflight -= 1
+
+
+class CaptureMiddleware:
+    """Middleware that records MCP exchanges to a TrafficCapture file.
+
+    The request body is teed from `receive` without consuming it before the MCP transport.
+    """
+
+    def __init__(self, app, capture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        # Long-lived GET streams carry server notifications only; skip them
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/mcp")
+            or scope["method"] not in ("POST", "DELETE")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        clock = time.perf_counter()
+        body = bytearray()
+        response = bytearray()
+        response_start: dict = {}
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            elif message["type"] == "http.response.body":
+                response.extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive, capturing_send)
+        finally:
+            # Path-normalizing redirects are not MCP traffic
+            if 300 <= response_start.get("status", 0) < 400:
+                return
             try:
-                # Get config from query params
-                config_b64 = request.query_params.get("config")
-                if config_b64:
-                    # Decode base64 and parse JSON
-                    config_json = base64.b64decode(config_b64).decode("utf-8")
-                    config = json.loads(config_json)
-
-                    # Extract API key
-                    api_key = config.get("ANTHROPIC_API_KEY")
-                    if api_key:
-                        self.set_api_key(api_key)
+                self.capture.record_http(
+                    started=started,
+                    elapsed=time.perf_counter() - clock,
+                    method=scope["method"],
+                    path=scope["path"],
+                    headers={k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]},
+                    body=bytes(body),
+                    status=response_start.get("status", 0),
+                    response_headers={
+                        k.decode("latin-1"): v.decode("latin-1")
+                        for k, v in response_start.get("headers", [])
+                    },
+                    response=bytes(response),
+                )
             except Exception:
-                # Silently fail - let the request continue
+                # Capture must never break serving
                 pass
 
-        return await call_next(request)
 
+GZIP_LEVEL = 6
+# Brotli's default quality (11) is meant for static assets; 4 compresses about as fast as gzip
+BROTLI_QUALITY = 4
 
-class MCPPathRedirectMiddleware(BaseHTTPMiddleware):
-    """Middleware that normalizes /mcp to /mcp/ for consistent routing."""
 
-    async def dispatch(self, request: Request, call_next):
-        # Redirect /mcp to /mcp/
-        if request.url.path == "/mcp":
-            scope = request.scope
-            scope["path"] = "/mcp/"
-            scope["raw_path"] = b"/mcp/"
+def _brotli():
+    """The brotli module if installed (pip install 'spec-iterator-mcp[compress]'), else None."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> str | None:
+    """Best of br and gzip that an Accept-Encoding header allows, or None."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    if brotli_available and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def vary_on_encoding(headers: list[tuple[bytes, bytes]]) -> list[tuple[bytes, bytes]]:
+    """Response headers with Accept-Encoding added to Vary (merged into an existing Vary header)."""
+    merged = []
+    found = False
+    for name, value in headers:
+        if name.lower() == b"vary":
+            found = True
+            listed = {v.strip().lower() for v in value.split(b",")}
+            if b"accept-encoding" not in listed and b"*" not in listed:
+                value = value + b", accept-encoding"
+        merged.append((name, value))
+    if not found:
+        merged.append((b"vary", b"accept-encoding"))
+    return merged
+
+
+class _Encoder:
+    """Incremental br/gzip encoder whose output can be flushed after every chunk."""
+
+    def __init__(self, encoding: str, brotli):
+        self.brotli = brotli if encoding == "br" else None
+        if self.brotli is not None:
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compressed data, flushed so the client can decode everything sent so far."""
+        if self.brotli is not None:
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.brotli is not None:
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Middleware that compresses responses for clients that send Accept-Encoding: br or gzip.
+
+    A complete reply below min_size is sent as is, so small replies (e.g. not-modified polls)
+    cost nothing extra. Other responses are compressed chunk by chunk and flushed after each
+    one, so every event of a stream still reaches the client as soon as it is sent. An
+    event stream (text/event-stream) that continues past its first chunk is compressed
+    however small that chunk is, since later events are often much larger than the first.
+
+    Every response carries Vary: Accept-Encoding, compressed or not, so shared caches never
+    serve a compressed body to a client that did not ask for one, or the reverse.
+    """
+
+    def __init__(self, app, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+        self.brotli = _brotli()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = choose_encoding(value.decode("latin-1"), self.brotli is not None)
+                break
+        if encoding is None:
+            async def varying_send(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": vary_on_encoding(message.get("headers", []))}
+                await send(message)
+
+            await self.app(scope, receive, varying_send)
+            return
+
+        start: dict = {}
+        encoder: _Encoder | None = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal encoder, passthrough
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+                event_stream = more_body and any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers
+                )
+                if (
+                    (len(body) < self.min_size and not event_stream)
+                    or any(k.lower() == b"content-encoding" for k, _ in headers)
+                ):
+                    passthrough = True
+                    await send({**start, "headers": vary_on_encoding(start.get("headers", []))})
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.brotli)
+                headers = vary_on_encoding(headers)
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                if not more_body:
+                    body = encoder.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+
+            data = encoder.chunk(body) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
 
-        return await call_next(request)
+        await self.app(scope, receive, compressing_send)
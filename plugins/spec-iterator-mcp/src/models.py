@@ -3,7 +3,7 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class QuestionCategory(str, Enum):
@@ -50,8 +50,20 @@ class Impact(str, Enum):
     LOW = "low"
 
 
+class Model(BaseModel):
+    """Base for all models. Validators are built on first use, or by build_schemas()."""
+
+    model_config = ConfigDict(defer_build=True)
+
+
+def build_schemas() -> None:
+    """Build every deferred validator now, e.g. in the background after the server binds."""
+    for model in Model.__subclasses__():
+        model.model_rebuild(force=True)
+
+
 # Core models
-class Clarification(BaseModel):
+class Clarification(Model):
     id: str
     question: str
     answer: Optional[str] = None
@@ -60,7 +72,7 @@ class Clarification(BaseModel):
     why: Optional[str] = None
 
 
-class CompletenessScore(BaseModel):
+class CompletenessScore(Model):
     overall: int = 10
     functional: int = 15
     technical: int = 10
@@ -69,13 +81,13 @@ class CompletenessScore(BaseModel):
     constraints: int = 10
 
 
-class SessionContext(BaseModel):
+class SessionContext(Model):
     domain: Optional[str] = None
     audience: Optional[Audience] = None
     complexity: Complexity = Complexity.MODERATE
 
 
-class Session(BaseModel):
+class Session(Model):
     id: str
     created_at: datetime
     updated_at: datetime
@@ -86,67 +98,91 @@ class Session(BaseModel):
     assumptions: list[str] = Field(default_factory=list)
     status: SessionStatus = SessionStatus.IN_PROGRESS
     round_count: int = 0
+    # Raised by every tool call that changes the session, for conditional reads
+    version: int = 1
+    # Section summaries of a long requirement document, sent to prompts in place of the text
+    requirement_digest: Optional[str] = None
+    # Digest of the API key that started the session (None for the server's own key);
+    # warm starts only draw on sessions of the same tenant
+    tenant: Optional[str] = None
 
 
 # LLM response models
-class AnalyzedQuestion(BaseModel):
+class AnalyzedQuestion(Model):
     question: str
     category: QuestionCategory
     priority: QuestionPriority
     why: str
 
 
-class RequirementAnalysis(BaseModel):
+class RequirementAnalysis(Model):
     core_need: str
     entities: list[str]
     implicit_assumptions: list[str]
     questions: list[AnalyzedQuestion]
 
 
-class GeneratedQuestions(BaseModel):
+class SectionAnalysis(Model):
+    summary: str
+    core_need: str = ""
+    entities: list[str] = Field(default_factory=list)
+    implicit_assumptions: list[str] = Field(default_factory=list)
+    questions: list[AnalyzedQuestion] = Field(default_factory=list)
+
+
+class GeneratedQuestions(Model):
     questions: list[AnalyzedQuestion]
     observations: list[str] = Field(default_factory=list)
 
 
-class GapItem(BaseModel):
+class AssumedAnswer(Model):
+    question_id: str
+    answer: str
+
+
+class AssumedAnswers(Model):
+    answers: list[AssumedAnswer]
+
+
+class GapItem(Model):
     category: QuestionCategory
     description: str
     impact: Impact
     recommendation: str
 
 
-class GapAnalysis(BaseModel):
+class GapAnalysis(Model):
     gaps: list[GapItem]
     ready_to_generate: bool
     blocking_gaps: list[str]
 
 
-class ProblemStatement(BaseModel):
+class ProblemStatement(Model):
     pain: str
     who: str
     current_workarounds: list[str]
 
 
-class UserFlowStep(BaseModel):
+class UserFlowStep(Model):
     step: int
     actor: str
     action: str
     outcome: str
 
 
-class Feature(BaseModel):
+class Feature(Model):
     name: str
     description: str
     acceptance_criteria: list[str]
     priority: FeaturePriority
 
 
-class EdgeCase(BaseModel):
+class EdgeCase(Model):
     scenario: str
     handling: str
 
 
-class GeneratedSpec(BaseModel):
+class GeneratedSpec(Model):
     title: str
     problem_statement: ProblemStatement
     user_flow: list[UserFlowStep]
@@ -157,6 +193,6 @@ class GeneratedSpec(BaseModel):
 
 
 # API input models
-class AnswerInput(BaseModel):
+class AnswerInput(Model):
     question_id: str
     answer: str
@@ -0,0 +1,228 @@
+"""Opt-in per-request profiling and an event-loop lag watchdog.
+
+A profiled tool call records wall time per phase (lock wait, prompt build, Claude wait, parse,
+validate, render) and samples the event-loop thread's stack while one of the call's tasks is
+running. Samples are written in collapsed-stack format ("frame;frame;frame count" per line),
+which flamegraph.pl, inferno and speedscope all read.
+
+Phases cost one context-variable lookup when no profile is active.
+"""
+
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any
+
+SAMPLE_INTERVAL_SECONDS = 0.002
+MAX_STACK_DEPTH = 64
+KEEP_PROFILES = 64
+
+_current: contextvars.ContextVar["RequestProfile | None"] = contextvars.ContextVar("profile", default=None)
+_active: set["RequestProfile"] = set()
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("SPEC_ITERATOR_PROFILE_DIR") or Path(tempfile.gettempdir()) / "spec-iterator-profiles")
+
+
+def profile_path(profile_id: str) -> Path | None:
+    """File of a written profile; None for ids that are not ours (guards the download route)."""
+    if len(profile_id) != 32 or not all(ch in "0123456789abcdef" for ch in profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.folded"
+    return path if path.exists() else None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).stem}:{code.co_name}"
+
+
+def _folded_stack(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile: "RequestProfile", name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.profile.track()
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.profile.add(self.name, time.perf_counter() - self.started)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str) -> _Phase | _NoPhase:
+    """Time a block as one phase of the profiled request, if this call is being profiled."""
+    profile = _current.get()
+    if profile is None:
+        return _NO_PHASE
+    return _Phase(profile, name)
+
+
+class RequestProfile:
+    """Phase timings and loop-thread stack samples for one tool call.
+
+    Use as a context manager around the call. Tasks the call spawns inherit the profile
+    and are attributed to it from their first phase on.
+    """
+
+    def __init__(self, tool: str, session_id: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.session_id = session_id
+        self.phases: dict[str, float] = {}
+        self.stalls: list[dict[str, Any]] = []
+        self.samples: Counter[str] = Counter()
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    def track(self) -> None:
+        """Attribute loop-thread samples taken while the current task runs to this profile."""
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+
+    def add(self, name: str, seconds: float) -> None:
+        if not self._stop.is_set():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def _sample(self, loop_thread: int) -> None:
+        while not self._stop.wait(SAMPLE_INTERVAL_SECONDS):
+            # Read without the loop's cooperation; a task switching mid-read costs one sample
+            if asyncio.current_task(self._loop) not in self._tasks:
+                continue
+            frame = sys._current_frames().get(loop_thread)
+            if frame is not None:
+                self.samples[_folded_stack(frame)] += 1
+
+    def __enter__(self) -> "RequestProfile":
+        self._loop = asyncio.get_running_loop()
+        self._token = _current.set(self)
+        self.track()
+        _active.add(self)
+        threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True).start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self._started
+        self._stop.set()
+        _active.discard(self)
+        _current.reset(self._token)
+        self._tasks.clear()
+
+    def write(self) -> Path:
+        """Write the samples as a collapsed-stack file, pruning the oldest profiles."""
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.id}.folded"
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.samples.most_common()), encoding="utf-8")
+        for old in sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)[:-KEEP_PROFILES]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def breakdown(self) -> dict[str, Any]:
+        """Summary for the tool response; time not covered by a phase is reported as `other`."""
+        phases = {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+        phases["other"] = round(max(self.elapsed - sum(self.phases.values()), 0.0) * 1000, 2)
+        return {
+            "profile_id": self.id,
+            "total_ms": round(self.elapsed * 1000, 2),
+            "phases_ms": phases,
+            "samples": sum(self.samples.values()),
+            "sample_interval_ms": SAMPLE_INTERVAL_SECONDS * 1000,
+            "loop_stalls": self.stalls,
+        }
+
+
+class LoopWatchdog:
+    """Flags callbacks that block the event loop for longer than threshold_ms.
+
+    A task on the loop refreshes a heartbeat; a thread notices when it goes stale and
+    captures the loop thread's stack at that moment, which is the blocking code.
+    """
+
+    def __init__(self, threshold_ms: float = 250):
+        self.threshold = threshold_ms / 1000
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.recent: deque[dict[str, Any]] = deque(maxlen=16)
+        self._heartbeat = time.monotonic()
+
+    async def _beat(self) -> None:
+        interval = self.threshold / 4
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(interval)
+            # How late the loop got back to this task
+            self.max_lag_ms = max(self.max_lag_ms, (time.monotonic() - self._heartbeat - interval) * 1000)
+
+    def _watch(self, loop_thread: int) -> None:
+        reported = None
+        while True:
+            time.sleep(self.threshold / 4)
+            beat = self._heartbeat
+            lag = time.monotonic() - beat
+            if lag < self.threshold or beat == reported:
+                continue
+            reported = beat  # one report per stall
+            frame = sys._current_frames().get(loop_thread)
+            stack = traceback.format_stack(frame, limit=8) if frame is not None else []
+            stall = {
+                "blocked_ms": round(lag * 1000),  # at least; measured when detected
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "where": stack[-1].strip().splitlines()[0] if stack else None,
+            }
+            self.stalls += 1
+            self.recent.append(stall)
+            for profile in list(_active):
+                profile.stalls.append(stall)
+            # stderr: stdout carries the protocol in stdio mode
+            print(f"> Event loop blocked for {stall['blocked_ms']}+ ms in:\n{''.join(stack)}", file=sys.stderr)
+
+    def start(self) -> None:
+        """Start watching the running loop."""
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        threading.Thread(target=self._watch, args=(threading.get_ident(),), daemon=True).start()
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "recent_stalls": list(self.recent),
+        }
@@ -10,6 +10,7 @@ Your job is to analyze a rough requirement and generate targeted clarifying ques
 
 ## Input
 You will receive a requirement text and optional context (domain, audience).
+It may also include known_questions: questions that were useful for a similar requirement.
 
 ## Output
 Return a JSON object with:
@@ -40,7 +41,44 @@ Return a JSON object with:
 3. Prioritize by impact on implementation
 4. Avoid yes/no questions - ask for specifics
 5. Reference concrete scenarios when possible
-6. First round should establish scope and users"""
+6. First round should establish scope and users
+7. If known_questions are given, reuse the ones that apply (verbatim or adapted) and only add what they miss"""
+
+
+SECTION_ANALYZER_PROMPT = """You are a senior product analyst reading one section of a long requirement document (a PRD, spec or meeting transcript).
+
+Other analysts read the other sections at the same time; your results are merged with theirs.
+
+## Input
+You will receive:
+- The section text and its position in the document
+- The headings of all sections, as an outline of the whole document
+- Optional context (domain, audience)
+- Optionally, known_questions: questions that were useful for a similar requirement
+
+## Output
+Return a JSON object with:
+{
+  "summary": "What this section requires, with the concrete names, numbers and decisions it states",
+  "core_need": "The fundamental problem being solved, as far as this section shows",
+  "entities": ["Key entities/concepts in this section"],
+  "implicit_assumptions": ["Things this section assumes but does not state"],
+  "questions": [
+    {
+      "question": "The clarifying question",
+      "category": "functional|technical|ux|edge_case|constraint",
+      "priority": "critical|important|nice_to_have",
+      "why": "Why this information matters"
+    }
+  ]
+}
+
+## Rules
+1. Keep the summary under 400 characters; later rounds see it instead of the section text
+2. Generate 2-5 questions about what this section leaves unclear
+3. Skip topics the outline shows another section covers
+4. Avoid yes/no questions - ask for specifics
+5. If known_questions are given, reuse the ones that apply to this section"""
 
 
 QUESTION_GENERATOR_PROMPT = """You are a clarification specialist that generates follow-up questions based on previous answers.
@@ -50,6 +88,7 @@ You will receive:
 - Original requirement
 - Previously asked questions with answers
 - Current completeness scores by category
+- Optionally, rejected_as_duplicates: questions you proposed that repeat earlier ones
 
 ## Output
 Return a JSON object with:
@@ -71,7 +110,8 @@ Return a JSON object with:
 3. Generate 3-5 questions per round
 4. Later rounds should focus on edge cases and constraints
 5. If answers reveal new scope, ask about it
-6. Stop if all categories are above 80%"""
+6. Stop if all categories are above 80%
+7. Never re-ask a previous question in new words; if rejected_as_duplicates is present, replace those with questions about uncovered topics"""
 
 
 GAP_ANALYZER_PROMPT = """You are a requirements gap analyzer.
@@ -153,21 +193,102 @@ Return a JSON object with:
 6. Prioritize ruthlessly - MVP should be buildable in 2-4 weeks"""
 
 
-def build_analyzer_input(requirement: str, domain: str | None = None, audience: str | None = None) -> str:
-    """Build input for requirement analyzer."""
-    return json.dumps({
+ASSUMPTION_PROMPT = """You answer clarifying questions on behalf of an absent stakeholder, using only the evidence provided.
+
+## Input
+You will receive:
+- Original requirement and context
+- Supporting evidence (user complaints, market signals, existing tools)
+- Pending questions, each with an id and category
+
+## Output
+Return a JSON object with:
+{
+  "answers": [
+    {
+      "question_id": "The id of the pending question",
+      "answer": "The most defensible answer, stated concretely"
+    }
+  ]
+}
+
+## Rules
+1. Answer every pending question
+2. Ground answers in the evidence; where it is silent, choose the conventional default for this kind of product
+3. Prefer the smallest scope that solves the stated pain
+4. Be specific - name numbers, limits and behaviours rather than "it depends"
+5. Never ask questions back"""
+
+
+# Short name of each system prompt, for per-prompt token budgets and stats
+PROMPT_NAMES = {
+    REQUIREMENT_ANALYZER_PROMPT: "analyzer",
+    SECTION_ANALYZER_PROMPT: "sections",
+    QUESTION_GENERATOR_PROMPT: "questions",
+    GAP_ANALYZER_PROMPT: "gaps",
+    SPEC_COMPILER_PROMPT: "compiler",
+    ASSUMPTION_PROMPT: "assumptions",
+}
+
+
+def build_analyzer_input(
+    requirement: str,
+    domain: str | None = None,
+    audience: str | None = None,
+    known_questions: list[str] | None = None,
+) -> str:
+    """Build input for requirement analyzer.
+
+    `known_questions` are questions answered in a similar earlier session.
+    """
+    payload = {
         "requirement": requirement,
         "context": {
             "domain": domain,
             "audience": audience
         }
-    })
+    }
+    if known_questions:
+        payload["known_questions"] = known_questions
+    return json.dumps(payload)
 
 
-def build_question_generator_input(session: Session) -> str:
-    """Build input for follow-up question generator."""
-    return json.dumps({
-        "requirement": session.requirement,
+def build_section_analyzer_input(
+    section: str,
+    position: int,
+    outline: list[str],
+    domain: str | None = None,
+    audience: str | None = None,
+    known_questions: list[str] | None = None,
+) -> str:
+    """Build input for analyzing section `position` (0-based) of a long requirement document."""
+    payload = {
+        "section": section,
+        "position": f"{position + 1} of {len(outline)}",
+        "outline": outline,
+        "context": {
+            "domain": domain,
+            "audience": audience
+        }
+    }
+    if known_questions:
+        payload["known_questions"] = known_questions
+    return json.dumps(payload)
+
+
+def requirement_text(session: Session) -> str:
+    """The requirement as prompts after the first see it: the digest of a long document, else the text."""
+    return session.requirement_digest or session.requirement
+
+
+def build_question_generator_input(session: Session, rejected: list[str] | None = None) -> str:
+    """Build input for follow-up question generator.
+
+    `rejected` lists proposed questions that were dropped as near-duplicates, to request
+    targeted replacements.
+    """
+    payload = {
+        "requirement": requirement_text(session),
         "context": {
             "domain": session.context.domain,
             "audience": session.context.audience.value if session.context.audience else None
@@ -182,13 +303,16 @@ def build_question_generator_input(session: Session) -> str:
         ],
         "completeness": session.completeness.model_dump(),
         "round_count": session.round_count
-    })
+    }
+    if rejected:
+        payload["rejected_as_duplicates"] = rejected
+    return json.dumps(payload)
 
 
 def build_gap_analyzer_input(session: Session) -> str:
     """Build input for gap analyzer."""
     return json.dumps({
-        "requirement": session.requirement,
+        "requirement": requirement_text(session),
         "clarifications": [c.model_dump() for c in session.clarifications],
         "completeness": session.completeness.model_dump(),
         "assumptions": session.assumptions
@@ -199,7 +323,7 @@ def build_spec_compiler_input(session: Session) -> str:
     """Build input for spec compiler."""
     answered = [c for c in session.clarifications if c.answer is not None]
     return json.dumps({
-        "requirement": session.requirement,
+        "requirement": requirement_text(session),
         "context": {
             "domain": session.context.domain,
             "audience": session.context.audience.value if session.context.audience else None
@@ -208,3 +332,24 @@ def build_spec_compiler_input(session: Session) -> str:
         "assumptions": session.assumptions,
         "completeness": session.completeness.model_dump()
     }, default=str)
+
+
+def build_assumption_input(session: Session, evidence: dict) -> str:
+    """Build input for answering pending questions from evidence (batch mode)."""
+    return json.dumps({
+        "requirement": requirement_text(session),
+        "context": {
+            "domain": session.context.domain,
+            "audience": session.context.audience.value if session.context.audience else None
+        },
+        "evidence": evidence,
+        "pending_questions": [
+            {
+                "id": c.id,
+                "question": c.question,
+                "category": c.category.value
+            }
+            for c in session.clarifications
+            if c.answer is None
+        ]
+    }, default=str)
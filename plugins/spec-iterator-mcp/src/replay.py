@@ -0,0 +1,224 @@
+"""Re-drive a spec-iterator server with traffic recorded by SPEC_ITERATOR_CAPTURE.
+
+Usage:
+    python replay.py capture.jsonl                 # in-process server, 1x speed
+    python replay.py capture.jsonl --speed 10      # compress inter-arrival times 10x
+    python replay.py capture.jsonl --url http://localhost:8080
+
+Without --url the server is started in-process with Claude responses served from the
+capture. An external server must be started with SPEC_ITERATOR_REPLAY=<capture file>.
+
+Session ids differ between the capture and the replay, so ids returned by the live
+server are mapped onto the captured ones before dependent requests are sent.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from capture import read_capture
+
+ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32}")
+DEPENDENCY_TIMEOUT = 30.0
+
+
+class IdMapper:
+    """Maps session ids seen in the capture onto the ones issued by the live server."""
+
+    def __init__(self, produced: set[str]):
+        self.produced = produced
+        self.mapping: dict[str, str] = {}
+        self._ready: dict[str, asyncio.Event] = defaultdict(asyncio.Event)
+
+    def learn(self, captured_text: str, live_text: str) -> None:
+        captured_ids = list(dict.fromkeys(ID_PATTERN.findall(captured_text)))
+        live_ids = list(dict.fromkeys(ID_PATTERN.findall(live_text)))
+        for old, new in zip(captured_ids, live_ids):
+            if old in self.produced and old not in self.mapping:
+                self.mapping[old] = new
+                self._ready[old].set()
+
+    async def wait_for(self, text: str) -> None:
+        """Wait until every server-issued id referenced in text has a live counterpart."""
+        pending = [i for i in set(ID_PATTERN.findall(text)) if i in self.produced and i not in self.mapping]
+        for old in pending:
+            try:
+                await asyncio.wait_for(self._ready[old].wait(), DEPENDENCY_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+    def rewrite(self, text: str) -> str:
+        return ID_PATTERN.sub(lambda m: self.mapping.get(m.group(0), m.group(0)), text)
+
+
+def tool_name(record: dict[str, Any]) -> str:
+    body = record.get("body")
+    if isinstance(body, dict):
+        if body.get("method") == "tools/call":
+            return body.get("params", {}).get("name", "tools/call")
+        return body.get("method", record["method"])
+    return record["method"]
+
+
+def mcp_session_of(record: dict[str, Any]) -> str:
+    """The MCP transport session a captured request belongs to."""
+    return (
+        record.get("headers", {}).get("mcp-session-id")
+        or record.get("response_headers", {}).get("mcp-session-id", "")
+    )
+
+
+async def send_one(
+    client: httpx.AsyncClient,
+    base_url: str,
+    record: dict[str, Any],
+    mapper: IdMapper,
+) -> tuple[str, float, bool]:
+    body = record.get("body")
+    body_text = json.dumps(body) if isinstance(body, (dict, list)) else (body or "")
+    headers = dict(record.get("headers", {}))
+
+    await mapper.wait_for(body_text + headers.get("mcp-session-id", ""))
+    body_text = mapper.rewrite(body_text)
+    if "mcp-session-id" in headers:
+        headers["mcp-session-id"] = mapper.rewrite(headers["mcp-session-id"])
+
+    started = time.perf_counter()
+    try:
+        response = await client.request(
+            record["method"], base_url + record["path"], content=body_text or None, headers=headers
+        )
+        elapsed = time.perf_counter() - started
+    except httpx.HTTPError:
+        return tool_name(record), time.perf_counter() - started, False
+
+    live_headers = response.headers.get("mcp-session-id", "")
+    captured_headers = record.get("response_headers", {}).get("mcp-session-id", "")
+    mapper.learn(captured_headers + " " + record.get("response", ""), live_headers + " " + response.text)
+    return tool_name(record), elapsed, response.status_code < 400
+
+
+async def replay(records: list[dict[str, Any]], base_url: str, speed: float) -> dict[str, Any]:
+    """Send captured requests with their original inter-arrival times divided by speed."""
+    requests = sorted((r for r in records if r.get("kind") == "http"), key=lambda r: r["ts"])
+    if not requests:
+        return {"requests": 0}
+
+    produced: set[str] = set()
+    for r in requests:
+        produced.update(ID_PATTERN.findall(r.get("response_headers", {}).get("mcp-session-id", "")))
+        produced.update(ID_PATTERN.findall(r.get("response", "")))
+    mapper = IdMapper(produced)
+
+    # Within one MCP session, a request that started after an earlier one finished must
+    # not overtake it (e.g. tools/call before initialize, or DELETE before the last call)
+    done = [asyncio.Event() for _ in requests]
+    predecessors: list[list[int]] = []
+    for i, record in enumerate(requests):
+        mcp_session = mcp_session_of(record)
+        predecessors.append([
+            j for j in range(i)
+            if mcp_session_of(requests[j]) == mcp_session
+            and requests[j]["ts"] + requests[j]["ms"] / 1000 <= record["ts"]
+        ])
+
+    first_ts = requests[0]["ts"]
+    start = time.perf_counter()
+
+    async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
+        async def scheduled(i, record):
+            try:
+                if speed > 0:
+                    delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                for j in predecessors[i]:
+                    await done[j].wait()
+                return await send_one(client, base_url, record, mapper)
+            finally:
+                done[i].set()
+
+        results = await asyncio.gather(*(scheduled(i, r) for i, r in enumerate(requests)))
+
+    wall = time.perf_counter() - start
+    by_tool: dict[str, list[float]] = defaultdict(list)
+    errors = 0
+    for name, elapsed, ok in results:
+        by_tool[name].append(elapsed * 1000)
+        errors += not ok
+
+    def summarize(values: list[float]) -> dict[str, float]:
+        ordered = sorted(values)
+        return {
+            "count": len(ordered),
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "tools": {name: summarize(values) for name, values in sorted(by_tool.items())},
+    }
+
+
+async def run_in_process(capture_path: Path, speed: float) -> dict[str, Any]:
+    """Start the server in this process with Claude responses served from the capture."""
+    import uvicorn
+
+    os.environ["SPEC_ITERATOR_REPLAY"] = str(capture_path)
+    os.environ["SPEC_ITERATOR_REPLAY_SPEED"] = str(speed)
+    os.environ.pop("SPEC_ITERATOR_CAPTURE", None)
+    from main import create_app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        return await replay(read_capture(capture_path), f"http://127.0.0.1:{port}", speed)
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured MCP traffic against spec-iterator.")
+    parser.add_argument("capture", type=Path, help="Capture file written via SPEC_ITERATOR_CAPTURE.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor (0 = as fast as possible).")
+    parser.add_argument("--url", help="Base URL of an already running server to target instead of an in-process one.")
+    parser.add_argument("--output", type=Path, help="Write the JSON summary to this file.")
+    args = parser.parse_args()
+
+    if args.url:
+        summary = asyncio.run(replay(read_capture(args.capture), args.url.rstrip("/"), args.speed))
+    else:
+        summary = asyncio.run(run_in_process(args.capture, args.speed))
+
+    report = json.dumps(summary, indent=2)
+    print(report)
+    if args.output:
+        args.output.write_text(report)
+    return 1 if summary.get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Signed session tokens for stateless mode, where the client carries the session between calls.
+
+A token is the session's `model_dump(mode="json")` data, msgpack-encoded and zlib-compressed,
+optionally AES-GCM encrypted, and HMAC-SHA256 signed over everything before the signature:
+
+    version (1) | flags (1) | key id (4) | body | HMAC (32)      -> base64url, no padding
+
+Any replica configured with the same secret can verify a token and serve the session.
+Several comma-separated secrets may be configured: the first signs, all of them verify, so
+secrets can be rotated without invalidating tokens already handed out.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import re
+import struct
+import zlib
+from typing import Any
+
+import msgpack
+
+from models import Session
+
+TOKEN_VERSION = 1
+FLAG_ENCRYPTED = 0x01
+HEADER = struct.Struct(">BB4s")
+MAC_BYTES = 32
+NONCE_BYTES = 12
+DEFAULT_MAX_BYTES = 16384
+
+# Text limits applied to answered questions, tightest last, when a token is over the size limit
+COMPACTION_LIMITS = (400, 160, 60, 16)
+ROUND_ID = re.compile(r"q(\d+)_")
+
+
+class TokenError(Exception):
+    """A session token is malformed, was not signed with a configured secret, or was altered."""
+
+
+class TokenTooLarge(TokenError):
+    """A session cannot be compacted into a token under the size limit."""
+
+
+def _derive(secret: bytes, purpose: bytes) -> bytes:
+    return hmac.new(secret, b"spec-iterator " + purpose, hashlib.sha256).digest()
+
+
+def _round(clarification_id: str) -> int:
+    match = ROUND_ID.match(clarification_id)
+    return int(match.group(1)) if match else 0
+
+
+def _clip(text: str | None, limit: int) -> str | None:
+    # Answers stay non-empty so completeness scoring still counts them as answered
+    if text is None or len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def compact_rounds(data: dict[str, Any], limit: int | None) -> None:
+    """Shrink answered questions in place: drop their `why`, and clip their text to limit.
+
+    Pending questions are never touched, so the client still sees what it is being asked;
+    answered questions from the latest round are only clipped at the tightest limit.
+    """
+    clarifications = data["clarifications"]
+    latest = max((_round(c["id"]) for c in clarifications), default=0)
+    tightest = limit == COMPACTION_LIMITS[-1]
+    for c in clarifications:
+        if c["answer"] is None:
+            continue
+        c["why"] = None
+        if limit is not None and (tightest or _round(c["id"]) < latest):
+            c["question"] = _clip(c["question"], limit)
+            c["answer"] = _clip(c["answer"], limit)
+
+
+class SessionTokens:
+    """Issues and verifies session tokens with a set of shared secrets."""
+
+    def __init__(self, secrets: list[str], encrypt: bool = False, max_bytes: int = DEFAULT_MAX_BYTES):
+        if not secrets:
+            raise ValueError("At least one secret is required")
+        self.max_bytes = max_bytes
+        self.encrypt = encrypt
+        # key id -> (signing key, encryption key)
+        self._keys: dict[bytes, tuple[bytes, bytes]] = {}
+        for secret in secrets:
+            signing = _derive(secret.encode("utf-8"), b"sign")
+            key_id = hashlib.sha256(signing).digest()[:4]
+            self._keys[key_id] = (signing, _derive(secret.encode("utf-8"), b"encrypt"))
+        self._key_id = next(iter(self._keys))
+        self._aeads: dict[bytes, Any] = {}
+        if encrypt:
+            self._aead(self._key_id)  # fail at startup, not on the first call
+
+    def _aead(self, key_id: bytes):
+        aead = self._aeads.get(key_id)
+        if aead is None:
+            try:
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+            except ImportError:
+                raise RuntimeError(
+                    "Encrypted session tokens need the 'cryptography' package "
+                    "(pip install 'spec-iterator-mcp[encrypt]')"
+                ) from None
+            aead = self._aeads[key_id] = AESGCM(self._keys[key_id][1])
+        return aead
+
+    @classmethod
+    def from_env(cls) -> "SessionTokens | None":
+        """Tokens configured by SPEC_ITERATOR_STATE_SECRET, or None if stateless mode is off."""
+        secrets = [s.strip() for s in os.getenv("SPEC_ITERATOR_STATE_SECRET", "").split(",") if s.strip()]
+        if not secrets:
+            return None
+        return cls(
+            secrets,
+            encrypt=os.getenv("SPEC_ITERATOR_STATE_ENCRYPT", "0") != "0",
+            max_bytes=int(os.getenv("SPEC_ITERATOR_STATE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+        )
+
+    # Issue
+
+    def _seal(self, data: dict[str, Any]) -> str:
+        header = HEADER.pack(TOKEN_VERSION, FLAG_ENCRYPTED if self.encrypt else 0, self._key_id)
+        body = zlib.compress(msgpack.packb(data, use_bin_type=True), 6)
+        if self.encrypt:
+            nonce = os.urandom(NONCE_BYTES)
+            body = nonce + self._aead(self._key_id).encrypt(nonce, body, header)
+        signed = header + body
+        token = signed + hmac.new(self._keys[self._key_id][0], signed, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(token).rstrip(b"=").decode("ascii")
+
+    def issue(self, session: Session) -> str:
+        """Token for the session, compacting answered rounds if it would exceed max_bytes."""
+        data = session.model_dump(mode="json")
+        token = self._seal(data)
+        for limit in (None, *COMPACTION_LIMITS):
+            if len(token) <= self.max_bytes:
+                return token
+            compact_rounds(data, limit)
+            token = self._seal(data)
+        if len(token) <= self.max_bytes:
+            return token
+        raise TokenTooLarge(f"Session {session.id} needs {len(token)} bytes, over the {self.max_bytes} byte limit")
+
+    # Verify
+
+    def open(self, token: str, session_id: str) -> dict[str, Any]:
+        """Verify a token and return its session data (model_dump(mode="json") shape)."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise TokenError("Session token is not valid base64") from None
+        if len(raw) < HEADER.size + MAC_BYTES:
+            raise TokenError("Session token is truncated")
+
+        signed, mac = raw[:-MAC_BYTES], raw[-MAC_BYTES:]
+        version, flags, key_id = HEADER.unpack_from(signed)
+        if version != TOKEN_VERSION:
+            raise TokenError(f"Unsupported session token version {version}")
+        keys = self._keys.get(key_id)
+        if keys is None or not hmac.compare_digest(mac, hmac.new(keys[0], signed, hashlib.sha256).digest()):
+            raise TokenError("Session token signature does not match")
+
+        body = signed[HEADER.size:]
+        if flags & FLAG_ENCRYPTED:
+            body = self._aead(key_id).decrypt(body[:NONCE_BYTES], body[NONCE_BYTES:], signed[: HEADER.size])
+        data = msgpack.unpackb(zlib.decompress(body), raw=False)
+        if data.get("id") != session_id:
+            raise TokenError("Session token belongs to a different session")
+        return data
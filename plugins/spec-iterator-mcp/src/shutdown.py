@@ -0,0 +1,22 @@
+"""Shutdown coordination shared by the tools, the HTTP drain middleware and the serve loop.
+
+Kept apart from middleware.py so stdio mode, which has no HTTP stack, does not import it.
+"""
+
+import asyncio
+import time
+
+
+class DrainState:
+    """Whether the server is draining, and how many MCP requests are still in flight."""
+
+    def __init__(self):
+        self.draining = False
+        self.inflight = 0
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until no MCP request is in flight. Returns False if the deadline passed first."""
+        deadline = time.monotonic() + timeout
+        while self.inflight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.inflight
@@ -0,0 +1,210 @@
+"""Local similarity search: near-duplicate questions and similar past requirements.
+
+Text is reduced to sets of stemmed content words. Questions are compared with set cosine
+similarity (|A & B| / sqrt(|A| * |B|)), which tolerates rewording and reordering; past
+requirements are found through an IDF-weighted inverted index. Nothing leaves the process.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Iterable
+
+from models import AnalyzedQuestion, Clarification, QuestionPriority
+
+DUPLICATE_THRESHOLD = 0.6
+
+# Requirement similarity above which a past session's answered questions are reused as-is,
+# and above which they are passed to the analyzer as hints
+WARM_START_REUSE_THRESHOLD = 0.85
+WARM_START_HINT_THRESHOLD = 0.5
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could
+did do does doing for from had has have how i if in into is it its just may me
+might more most must my no not of on or other our should so some such than that
+the their them then there these they this those to too under up us very was we
+were what when where which while who whom why will with would you your
+""".split())
+
+PRIORITY_RANK = {
+    QuestionPriority.NICE_TO_HAVE: 0,
+    QuestionPriority.IMPORTANT: 1,
+    QuestionPriority.CRITICAL: 2,
+}
+
+
+def _stem(token: str) -> str:
+    """Very light suffix stripping, enough to match plurals and verb forms."""
+    for suffix in ("ing", "ies", "ed", "es", "ly", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+
+def terms(text: str) -> frozenset[str]:
+    """Stemmed content words of a question."""
+    return frozenset(
+        _stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS
+    )
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / math.sqrt(len(a) * len(b))
+
+
+class QuestionIndex:
+    """Term sets of the questions asked so far in a session."""
+
+    def __init__(self, questions: Iterable[str] = ()):
+        self._terms: list[frozenset[str]] = []
+        for question in questions:
+            self.add(question)
+
+    def add(self, question: str) -> None:
+        self._terms.append(terms(question))
+
+    def best_match(self, question: str) -> tuple[int, float]:
+        """Position of the most similar indexed question and its score (-1, 0.0 if empty)."""
+        candidate = terms(question)
+        best, best_score = -1, 0.0
+        for i, existing in enumerate(self._terms):
+            score = similarity(candidate, existing)
+            if score > best_score:
+                best, best_score = i, score
+        return best, best_score
+
+
+def dedupe_questions(
+    clarifications: list[Clarification],
+    candidates: list[AnalyzedQuestion],
+    threshold: float = DUPLICATE_THRESHOLD,
+) -> tuple[list[AnalyzedQuestion], list[AnalyzedQuestion]]:
+    """Split generated questions into new ones and near-duplicates of earlier questions.
+
+    A duplicate of a still-pending clarification is merged into it by keeping the higher
+    priority; a duplicate of an answered one is simply dropped.
+    """
+    index = QuestionIndex(c.question for c in clarifications)
+    kept: list[AnalyzedQuestion] = []
+    duplicates: list[AnalyzedQuestion] = []
+
+    for question in candidates:
+        match, score = index.best_match(question.question)
+        if score < threshold:
+            kept.append(question)
+            index.add(question.question)
+            continue
+
+        duplicates.append(question)
+        if match < len(clarifications):
+            existing = clarifications[match]
+            if existing.answer is None and PRIORITY_RANK[question.priority] > PRIORITY_RANK[existing.priority]:
+                existing.priority = question.priority
+
+    return kept, duplicates
+
+
+class SessionIndex:
+    """Inverted index over session requirements and domains, for warm-starting new sessions.
+
+    Lookups accumulate IDF weights over the postings of the query's terms, skipping terms
+    that occur in too many sessions to discriminate, then rescore the best candidates with
+    exact IDF-weighted cosine similarity. Sessions are added one at a time; the document
+    frequencies used for weighting are always current.
+
+    Each session belongs to a tenant, and lookups only return sessions of the tenant asking.
+    """
+
+    # Terms present in more than this fraction of sessions are not walked during lookups
+    COMMON_TERM_FRACTION = 0.05
+    COMMON_TERM_MIN = 64
+    CANDIDATES = 32
+
+    def __init__(self):
+        self._postings: dict[str, set[str]] = defaultdict(set)
+        self._documents: dict[str, frozenset[str]] = {}
+        self._tenants: dict[str, str | None] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document(requirement: str, domain: str | None = None) -> frozenset[str]:
+        domain_terms = {f"domain:{term}" for term in terms(domain)} if domain else set()
+        return terms(requirement) | domain_terms
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, session_id: str, requirement: str, domain: str | None = None, tenant: str | None = None) -> None:
+        document = self.document(requirement, domain)
+        with self._lock:
+            if session_id in self._documents:
+                return
+            self._documents[session_id] = document
+            self._tenants[session_id] = tenant
+            for term in document:
+                self._postings[term].add(session_id)
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._documents) + 1) / (len(self._postings.get(term, ())) + 1)) + 1
+
+    def _common_term_candidates(self, query: frozenset[str], tenant: str | None) -> list[str]:
+        """Sessions of tenant sharing the most of the query's (all common) terms, via set intersections."""
+        present = sorted(
+            (self._postings[term] for term in query if self._postings.get(term)), key=len
+        )
+        if not present:
+            return []
+        candidates = {session_id for session_id in present[0] if self._tenants[session_id] == tenant}
+        for postings in present[1:]:
+            narrowed = candidates & postings
+            if not narrowed:
+                break
+            candidates = narrowed
+            if len(candidates) <= self.CANDIDATES:
+                break
+        return list(candidates)[: self.CANDIDATES * 4]
+
+    def search(
+        self, requirement: str, domain: str | None = None, tenant: str | None = None, limit: int = 5
+    ) -> list[tuple[str, float]]:
+        """Tenant's most similar indexed sessions as (session_id, cosine similarity), best first."""
+        query = self.document(requirement, domain)
+        with self._lock:
+            if not query or not self._documents:
+                return []
+
+            idf = {term: self._idf(term) for term in query}
+            walk_limit = max(self.COMMON_TERM_MIN, len(self._documents) * self.COMMON_TERM_FRACTION)
+            walked = [term for term in query if 0 < len(self._postings.get(term, ())) <= walk_limit]
+            if walked:
+                scores: dict[str, float] = defaultdict(float)
+                for term in walked:
+                    weight = idf[term] ** 2
+                    for session_id in self._postings[term]:
+                        scores[session_id] += weight
+                candidates = heapq.nlargest(self.CANDIDATES, scores, key=scores.__getitem__)
+                tenants = self._tenants
+                if any(tenants[session_id] != tenant for session_id in candidates):
+                    # Other tenants' sessions made the cut; rank this tenant's own instead
+                    own = (session_id for session_id in scores if tenants[session_id] == tenant)
+                    candidates = heapq.nlargest(self.CANDIDATES, own, key=scores.__getitem__)
+            else:
+                candidates = self._common_term_candidates(query, tenant)
+
+            query_norm = math.sqrt(sum(w * w for w in idf.values()))
+            results = []
+            for session_id in candidates:
+                document = self._documents[session_id]
+                overlap = sum(idf[term] ** 2 for term in query & document)
+                document_norm = math.sqrt(sum(self._idf(term) ** 2 for term in document))
+                results.append((session_id, overlap / (query_norm * document_norm)))
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:limit]
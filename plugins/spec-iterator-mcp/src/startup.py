@@ -0,0 +1,61 @@
+"""Cold-start helpers: background warm-up after bind and the --startup-report breakdown."""
+
+import os
+import re
+import subprocess
+import sys
+import time
+import traceback
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable
+
+# Interpreter-relative reference point; main imports this module first
+PROCESS_START = time.perf_counter()
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)")
+
+
+def import_breakdown(module: str = "main", top: int = 8) -> list[tuple[str, float]]:
+    """Cumulative import time in ms per top-level package, measured in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    )
+
+    totals: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Depth 1 entries are the direct imports of `module`
+        if indent == 3:
+            totals[name.split(".")[0]] += cumulative_us / 1000
+
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def warm_up(steps: dict[str, Callable[[], object]], timings: dict[str, float]) -> None:
+    """Run deferred startup work off the request path, recording each step's duration in ms."""
+    for label, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # The server keeps serving without this step, but a failed restore must not look
+            # like sessions that were never there
+            print(f"> Warm-up step '{label}' failed:", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+        timings[label] = (time.perf_counter() - started) * 1000
+
+
+def print_report(title: str, rows: list[tuple[str, float]]) -> None:
+    """Print one section of the startup report (values in ms)."""
+    print(f"> {title}")
+    for label, ms in rows:
+        print(f"  {label:<36} {ms:>9.1f} ms")
+    sys.stdout.flush()
@@ -0,0 +1,353 @@
+"""Session storage with msgpack snapshots for hand-off between server processes.
+
+With an event log attached, every change is also appended to it as it happens, and the
+sessions are recovered from the log on the first access after a restart.
+"""
+
+import asyncio
+import os
+import threading
+from collections.abc import Iterator, MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import msgpack
+
+from compact import CompactSession
+from eventlog import EventKind, EventLog, replay, session_events
+from models import Session
+
+SNAPSHOT_VERSION = 1
+
+
+def restored_data(restored: bytes | list[tuple[int, bytes]]) -> dict[str, Any]:
+    """Session data from a snapshot blob or from event log records."""
+    if isinstance(restored, bytes):
+        return msgpack.unpackb(restored, raw=False)
+    return replay(restored)
+
+
+class SessionStore(MutableMapping[str, Session]):
+    """Session map that keeps idle sessions compact and can be seeded lazily from a snapshot.
+
+    Sessions live in one of three tiers:
+    - checked out: pydantic `Session` objects in use by a tool call (see `checkout`)
+    - compact: `CompactSession` records, the resident form between calls
+    - restored: msgpack blobs from a snapshot, or a session's records from the event log,
+      decoded on first access
+
+    Reading `store[session_id]` outside a checkout returns a detached copy; changes to it
+    are only kept if it is assigned back.
+
+    The store also numbers its changes, so listings can be polled for what changed since a
+    `cursor` (see `changed_since`). Cursors are only valid within the process that issued them.
+    """
+
+    def __init__(self, compress: bool = True):
+        self.compress = compress
+        self._live: dict[str, Session] = {}
+        self._pins: dict[str, int] = {}
+        self._compact: dict[str, CompactSession] = {}
+        self._restored: dict[str, bytes | list[tuple[int, bytes]]] = {}
+        self._snapshot_path: Path | None = None
+        self._log: EventLog | None = None
+        self._log_pending = False
+        # Compact form of each checked-out session as it was when the checkout began
+        self._before: dict[str, CompactSession] = {}
+        self._load_lock = threading.Lock()
+        # Change number of each session's latest change, oldest first; restored sessions have none
+        self._changes: dict[str, int] = {}
+        self._change_seq = 0
+        self._last_removal = 0
+        self._epoch = os.urandom(4).hex()
+
+    # Restore
+
+    def attach_snapshot(self, path: str | Path) -> None:
+        """Restore from this file on first access (or when load_snapshot is called)."""
+        self._snapshot_path = Path(path)
+
+    def attach_log(self, log: EventLog) -> None:
+        """Append every change to log from now on, and recover its sessions on first access."""
+        self._log = log
+        self._log_pending = True
+
+    @property
+    def _restore_pending(self) -> bool:
+        return self._snapshot_path is not None or self._log_pending
+
+    async def ready(self) -> None:
+        """Wait, off the event loop, until a pending restore is done.
+
+        Tool calls await this before touching the store: the restore runs on the warm-up
+        thread under `_load_lock`, and taking that lock on the event loop would stall
+        every other request until it finished.
+        """
+        if self._restore_pending:
+            await asyncio.to_thread(self.load_snapshot)
+
+    def load_snapshot(self) -> int:
+        """Recover from the attached log and snapshot, if not done yet. Returns the number of sessions restored.
+
+        The log is complete up to the last write, so its sessions take precedence.
+        """
+        if not self._restore_pending:
+            return 0
+        with self._load_lock:
+            count = 0
+            if self._log_pending:
+                try:
+                    recovered = {
+                        session_id: records
+                        for session_id, records in self._log.recover().items()
+                        if session_id not in self._live and session_id not in self._compact
+                    }
+                    self._restored.update(recovered)
+                    count += len(recovered)
+                finally:
+                    self._log_pending = False
+
+            path = self._snapshot_path
+            if path is None or not path.exists():
+                self._snapshot_path = None
+                return count
+            try:
+                payload = msgpack.unpackb(path.read_bytes(), raw=False)
+                if payload.get("version") != SNAPSHOT_VERSION:
+                    return count
+                restored = {
+                    session_id: blob
+                    for session_id, blob in payload["sessions"]
+                    if session_id not in self._live and session_id not in self._compact
+                    and session_id not in self._restored
+                }
+                self._restored.update(restored)
+                return count + len(restored)
+            finally:
+                # Cleared last so other threads wait on the lock until the restore is complete
+                self._snapshot_path = None
+
+    def _compacted(self, session_id: str) -> CompactSession | None:
+        """The compact record of a session that is not checked out, decoding a restored blob if needed."""
+        if self._restore_pending:
+            self.load_snapshot()
+        compact = self._compact.get(session_id)
+        if compact is None and session_id in self._restored:
+            data = restored_data(self._restored.pop(session_id))
+            compact = self._compact[session_id] = CompactSession.from_data(data, self.compress)
+        return compact
+
+    # Checkout
+
+    @contextmanager
+    def checkout(self, session_id: str) -> Iterator[Session]:
+        """Use a session as a pydantic model for the duration of a tool call.
+
+        Concurrent checkouts share one object; when the last one ends, the session is
+        compacted again with whatever changes were made. Raises KeyError if it does not exist.
+        """
+        session = self._live.get(session_id)
+        if session is None:
+            compact = self._compacted(session_id)
+            if compact is None:
+                raise KeyError(session_id)
+            session = self._live[session_id] = compact.to_session()
+            del self._compact[session_id]
+            self._before[session_id] = compact
+        self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        try:
+            yield session
+        finally:
+            self._pins[session_id] -= 1
+            if not self._pins[session_id]:
+                del self._pins[session_id]
+                before = self._before.pop(session_id, None)
+                # Deleted while checked out: nothing to put back
+                if self._live.pop(session_id, None) is not None:
+                    self._compact[session_id] = CompactSession.from_session(session, self.compress)
+                    if before is None or session.version != before.version:
+                        self._changed(session_id)
+                    if self._log is not None:
+                        self._log_changes(session_id, before, session)
+
+    def _log_changes(self, session_id: str, before: CompactSession | None, session: Session) -> None:
+        """Append what a checkout changed; a full snapshot when due or when no delta describes it."""
+        events = None
+        if before is not None and not self._log.needs_snapshot(session_id):
+            events = session_events(before, session)
+        if events is None:
+            events = [(EventKind.SNAPSHOT, session.model_dump(mode="json"))]
+        self._log.append(session_id, events)
+
+    def put_data(self, session_id: str, data: dict[str, Any]) -> bool:
+        """Store a session given as model_dump(mode="json") data, e.g. from a state token.
+
+        A session checked out by a running call, or already held at the same or a newer version,
+        is left alone, so a replayed or out-of-date token cannot roll it back. Returns whether it
+        was stored.
+        """
+        if session_id in self._pins:
+            return False
+        held = self.version(session_id)
+        if held is not None and data.get("version", 1) <= held:
+            return False
+        self._restored.pop(session_id, None)
+        self._live.pop(session_id, None)
+        self._compact[session_id] = CompactSession.from_data(data, self.compress)
+        self._changed(session_id)
+        if self._log is not None:
+            self._log.append(session_id, [(EventKind.SNAPSHOT, data)])
+        return True
+
+    # Versions and changes
+
+    def version(self, session_id: str) -> int | None:
+        """A session's version without rebuilding it, or None if it does not exist."""
+        session = self._live.get(session_id)
+        if session is not None:
+            return session.version
+        compact = self._compacted(session_id)
+        return None if compact is None else compact.version
+
+    @property
+    def cursor(self) -> str:
+        """Marks the current state, for a later changed_since call."""
+        return f"{self._epoch}.{self._change_seq}"
+
+    def changed_since(self, cursor: str) -> list[Session | CompactSession] | None:
+        """Sessions created or changed after cursor was issued, oldest change first.
+
+        None means the changes cannot be told from the cursor (issued by another process, or
+        sessions were removed since) and a full listing is needed.
+        """
+        epoch, _, seq = cursor.partition(".")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        since = int(seq)
+        if since < self._last_removal or since > self._change_seq:
+            return None
+        changed = []
+        for session_id, change in reversed(self._changes.items()):
+            if change <= since:
+                break
+            changed.append(session_id)
+        summaries = []
+        for session_id in reversed(changed):
+            session = self._live.get(session_id) or self._compacted(session_id)
+            if session is not None:
+                summaries.append(session)
+        return summaries
+
+    def _changed(self, session_id: str) -> None:
+        self._change_seq += 1
+        # Re-inserted so the dict stays ordered by change number
+        self._changes.pop(session_id, None)
+        self._changes[session_id] = self._change_seq
+
+    # Listing
+
+    def requirements(self) -> Iterator[tuple[str, str, str | None, str | None]]:
+        """(session_id, requirement, domain, tenant) of every session, without materializing restored ones."""
+        if self._restore_pending:
+            self.load_snapshot()
+        for session_id, session in list(self._live.items()):
+            yield session_id, session.requirement, session.context.domain, session.tenant
+        for session_id, compact in list(self._compact.items()):
+            yield session_id, compact.requirement, compact.domain, compact.tenant
+        for session_id, restored in list(self._restored.items()):
+            data = restored_data(restored)
+            yield session_id, data["requirement"], (data.get("context") or {}).get("domain"), data.get("tenant")
+
+    def summaries(self) -> Iterator[Session | CompactSession]:
+        """Every session as an object with id, requirement, status, completeness and created_at."""
+        if self._restore_pending:
+            self.load_snapshot()
+        yield from list(self._live.values())
+        for session_id in list(self._compact) + list(self._restored):
+            compact = self._compacted(session_id)
+            if compact is not None:
+                yield compact
+
+    # Snapshot save
+
+    def save_snapshot(self, path: str | Path) -> int:
+        """Atomically write every session to path. Returns the number of sessions written."""
+        if self._restore_pending:
+            self.load_snapshot()
+        records = [
+            (session_id, msgpack.packb(s.model_dump(mode="json"), use_bin_type=True))
+            for session_id, s in self._live.items()
+        ]
+        records.extend(
+            (session_id, msgpack.packb(c.to_data(), use_bin_type=True))
+            for session_id, c in self._compact.items()
+        )
+        records.extend(
+            (session_id, restored if isinstance(restored, bytes) else msgpack.packb(replay(restored), use_bin_type=True))
+            for session_id, restored in self._restored.items()
+        )
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(msgpack.packb({"version": SNAPSHOT_VERSION, "sessions": records}, use_bin_type=True))
+        os.replace(tmp, path)
+        return len(records)
+
+    # MutableMapping
+
+    def __getitem__(self, session_id: str) -> Session:
+        session = self._live.get(session_id)
+        if session is not None:
+            return session
+        compact = self._compacted(session_id)
+        if compact is None:
+            raise KeyError(session_id)
+        return compact.to_session()
+
+    def __setitem__(self, session_id: str, session: Session) -> None:
+        self._changed(session_id)
+        if session_id in self._pins:
+            # Logged with the rest of the checkout's changes when it ends
+            self._restored.pop(session_id, None)
+            self._live[session_id] = session
+            return
+        if self._log is not None:
+            kind = EventKind.SNAPSHOT if session_id in self else EventKind.CREATED
+            self._log.append(session_id, [(kind, session.model_dump(mode="json"))])
+        self._restored.pop(session_id, None)
+        self._live.pop(session_id, None)
+        self._compact[session_id] = CompactSession.from_session(session, self.compress)
+
+    def __delitem__(self, session_id: str) -> None:
+        if self._restore_pending:
+            self.load_snapshot()
+        if session_id in self._live:
+            del self._live[session_id]
+        elif session_id in self._compact:
+            del self._compact[session_id]
+        else:
+            del self._restored[session_id]
+        self._changes.pop(session_id, None)
+        self._change_seq += 1
+        self._last_removal = self._change_seq
+        if self._log is not None:
+            self._log.append(session_id, [(EventKind.DELETED, None)])
+
+    def __iter__(self) -> Iterator[str]:
+        if self._restore_pending:
+            self.load_snapshot()
+        yield from list(self._live)
+        yield from list(self._compact)
+        yield from list(self._restored)
+
+    def __len__(self) -> int:
+        if self._restore_pending:
+            self.load_snapshot()
+        return len(self._live) + len(self._compact) + len(self._restored)
+
+    def __contains__(self, session_id: object) -> bool:
+        if self._restore_pending:
+            self.load_snapshot()
+        return session_id in self._live or session_id in self._compact or session_id in self._restored
@@ -0,0 +1,30 @@
+"""Shared test setup: the server modules live in the parent directory."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """main with fresh server state and Claude replaced by a fake client, which is returned."""
+    import fake_claude
+    import main
+    from breaker import CircuitBreaker
+    from coalesce import SingleFlight
+    from shutdown import DrainState
+    from similarity import SessionIndex
+    from store import SessionStore
+
+    monkeypatch.setattr(main, "sessions", SessionStore())
+    monkeypatch.setattr(main, "session_index", SessionIndex())
+    monkeypatch.setattr(main, "single_flight", SingleFlight())
+    monkeypatch.setattr(main, "claude_breaker", CircuitBreaker())
+    monkeypatch.setattr(main, "drain", DrainState())
+    monkeypatch.setattr(main, "state_tokens", None)
+    monkeypatch.setattr(main, "event_log", None)
+    monkeypatch.setattr(main, "get_client", main.get_client)  # restored after install() replaces it
+    return fake_claude.install(main)
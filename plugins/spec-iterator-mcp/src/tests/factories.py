@@ -0,0 +1,36 @@
+"""Sessions for tests, built without calling Claude."""
+
+from datetime import datetime, timezone
+
+from models import Clarification, QuestionCategory, QuestionPriority, Session, SessionContext
+
+
+def make_session(session_id: str = "sess_1", questions: int = 3, requirement: str = "Order tracking for a small shop") -> Session:
+    now = datetime.now(timezone.utc)
+    return Session(
+        id=session_id,
+        created_at=now,
+        updated_at=now,
+        requirement=requirement,
+        context=SessionContext(domain="e-commerce"),
+        clarifications=[
+            Clarification(
+                id=f"q1_{i + 1}",
+                question=f"Question {i + 1}?",
+                category=QuestionCategory.FUNCTIONAL,
+                priority=QuestionPriority.IMPORTANT,
+                why="It matters.",
+            )
+            for i in range(questions)
+        ],
+        round_count=1,
+    )
+
+
+def answer(session: Session, question_id: str, text: str) -> Session:
+    """Answer one question and raise the version, as a tool call would."""
+    for c in session.clarifications:
+        if c.id == question_id:
+            c.answer = text
+    session.version += 1
+    return session
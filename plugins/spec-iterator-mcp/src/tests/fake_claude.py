@@ -0,0 +1,121 @@
+"""A stand-in for the Anthropic client that answers each system prompt with canned JSON."""
+
+import json
+from types import SimpleNamespace
+
+from prompts import (
+    ASSUMPTION_PROMPT,
+    GAP_ANALYZER_PROMPT,
+    QUESTION_GENERATOR_PROMPT,
+    REQUIREMENT_ANALYZER_PROMPT,
+    SECTION_ANALYZER_PROMPT,
+    SPEC_COMPILER_PROMPT,
+)
+
+CATEGORIES = ("functional", "technical", "ux", "edge_case", "constraint")
+
+ANALYSIS = {
+    "core_need": "Track orders",
+    "entities": ["Order"],
+    "implicit_assumptions": ["Customers have accounts"],
+    "questions": [
+        {
+            "question": f"Question {i} about the {category} side of order tracking?",
+            "category": category,
+            "priority": "critical" if i % 2 else "important",
+            "why": "It shapes the design.",
+        }
+        for i, category in enumerate(CATEGORIES)
+    ],
+}
+
+FOLLOW_UP = {
+    "questions": [
+        {
+            "question": "Which carriers must shipment tracking support at launch?",
+            "category": "technical",
+            "priority": "important",
+            "why": "Integrations drive effort.",
+        }
+    ],
+    "observations": [],
+}
+
+GAPS = {"gaps": [], "ready_to_generate": True, "blocking_gaps": []}
+
+SPEC = {
+    "title": "Order tracking",
+    "problem_statement": {"pain": "Customers ask where orders are", "who": "Shoppers", "current_workarounds": []},
+    "user_flow": [],
+    "features": [],
+    "edge_cases": [],
+    "assumptions": [],
+    "open_questions": [],
+}
+
+
+def section_analysis(user_input: str) -> dict:
+    position = json.loads(user_input)["position"].split()[0]
+    return {
+        "summary": f"Section {position} describes part of the order flow.",
+        "core_need": "Track orders",
+        "entities": ["Order", f"Area {position}"],
+        "implicit_assumptions": [],
+        "questions": [
+            {
+                "question": f"What limits apply to area {position} shipments?",
+                "category": "constraint",
+                "priority": "important",
+                "why": "Limits need defined behaviour.",
+            }
+        ],
+    }
+
+
+def response(text: str, user_input: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        stop_reason="end_turn",
+        usage=SimpleNamespace(input_tokens=len(user_input) // 4, output_tokens=100),
+    )
+
+
+class FakeMessages:
+    def __init__(self):
+        self.calls: list[tuple[str, str]] = []
+        # system prompt -> exception raised instead of answering, or text returned as is
+        self.errors: dict[str, Exception] = {}
+        self.raw: dict[str, str] = {}
+
+    def create(self, model, max_tokens, system, messages, **kwargs):
+        user_input = messages[0]["content"]
+        self.calls.append((system, user_input))
+        if system in self.errors:
+            raise self.errors[system]
+        if system in self.raw:
+            return response(self.raw[system], user_input)
+        if system == SECTION_ANALYZER_PROMPT:
+            data = section_analysis(user_input)
+        elif system == ASSUMPTION_PROMPT:
+            pending = json.loads(user_input)["pending_questions"]
+            data = {"answers": [{"question_id": q["id"], "answer": "Assumed."} for q in pending]}
+        else:
+            data = {
+                REQUIREMENT_ANALYZER_PROMPT: ANALYSIS,
+                QUESTION_GENERATOR_PROMPT: FOLLOW_UP,
+                GAP_ANALYZER_PROMPT: GAPS,
+                SPEC_COMPILER_PROMPT: SPEC,
+            }[system]
+        return response(json.dumps(data), user_input)
+
+
+class FakeClaude:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+
+def install(main) -> FakeClaude:
+    """Route main's Claude calls to a new fake client, whatever API key they carry."""
+    client = FakeClaude()
+    main.get_client = lambda api_key=None: client
+    return client
@@ -0,0 +1,14 @@
+"""Run the server with the fake Claude client, for tests that need real server processes."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fake_claude  # noqa: E402
+import main  # noqa: E402
+
+if __name__ == "__main__":
+    fake_claude.install(main)
+    main.main()
@@ -0,0 +1,36 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import batch
+
+
+pytestmark = pytest.mark.usefixtures("server")
+
+
+async def test_names_that_slugify_alike_get_separate_specs(tmp_path):
+    source = tmp_path / "opportunities.jsonl"
+    opportunities = [
+        {"name": "Order Tracking!", "pain_summary": "Shoppers cannot see where orders are"},
+        {"name": "order tracking", "pain_summary": "Shop owners answer the same emails all day"},
+    ]
+    source.write_text("".join(json.dumps(o) + "\n" for o in opportunities), encoding="utf-8")
+    output_dir = tmp_path / "specs"
+
+    result = await batch.run_batch(source, output_dir, concurrency=2)
+
+    assert result["done"] == 2 and result["failed"] == 0
+    specs = sorted(output_dir.glob("*-spec.md"))
+    assert len(specs) == 2
+    assert all(p.name.startswith("order-tracking-") for p in specs)
+
+    # A rerun finds both entries in the checkpoint
+    again = await batch.run_batch(source, output_dir, concurrency=2)
+    assert again["skipped"] == 2
+
+
+def test_specs_default_to_the_plugin_outputs():
+    plugin = Path(batch.__file__).resolve().parent.parent
+    assert batch.DEFAULT_OUTPUT_DIR == plugin / "outputs" / "specs"
+    assert "mcp-opportunity-pipeline" not in str(batch.DEFAULT_OUTPUT_DIR)
@@ -0,0 +1,28 @@
+import json
+import sys
+
+import bench
+import main
+
+
+def run_bench(monkeypatch, *args: str) -> int:
+    monkeypatch.setattr(sys, "argv", ["bench.py", *args])
+    return bench.main()
+
+
+def test_first_run_records_the_baseline(tmp_path, monkeypatch):
+    baseline = tmp_path / "baseline.json"
+    args = ("-k", "parse_json_response", "--baseline", str(baseline), "--time-threshold", "100")
+
+    assert run_bench(monkeypatch, *args) == 0
+    assert list(json.loads(baseline.read_text())) == ["parse_json_response"]
+    assert run_bench(monkeypatch, *args) == 0
+
+
+def test_list_poll_leaves_the_server_store_alone(server, monkeypatch):
+    monkeypatch.setattr(bench, "LISTED_SESSIONS", 5)
+    store = main.sessions
+
+    listing = json.loads(bench._list_poll(since_cursor=False)())
+    assert len(listing["sessions"]) == 5
+    assert main.sessions is store
@@ -0,0 +1,104 @@
+import pytest
+
+import breaker
+from breaker import CircuitBreaker, CircuitState
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, "monotonic", clock)
+    return clock
+
+
+def call(b: CircuitBreaker) -> int:
+    """Start a call the breaker allows; returns its generation."""
+    assert b.allow()
+    return b.generation
+
+
+def test_opens_at_error_rate(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=4, cooldown=30)
+    for ok in (True, False, True):
+        b.record(ok, call(b))
+    assert b.state == CircuitState.CLOSED
+    b.record(False, call(b))
+    assert b.state == CircuitState.OPEN
+    assert not b.allow()
+    assert b.times_opened == 1
+
+
+def test_old_outcomes_leave_the_window(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=2)
+    b.record(False, call(b))
+    clock.now += breaker.WINDOW_SECONDS + 1
+    b.record(True, call(b))
+    assert b.state == CircuitState.CLOSED
+    assert b.describe()["recent_failures"] == 0
+
+
+def test_single_probe_after_cooldown(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=1, cooldown=30)
+    b.record(False, call(b))
+    clock.now += 31
+    probe = call(b)
+    assert b.state == CircuitState.HALF_OPEN
+    assert not b.allow()
+
+    b.record(True, probe)
+    assert b.state == CircuitState.CLOSED
+    assert b.allow()
+
+
+def test_failed_probe_reopens(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=1, cooldown=30)
+    b.record(False, call(b))
+    clock.now += 31
+    b.record(False, call(b))
+    assert b.state == CircuitState.OPEN
+    assert b.times_opened == 2
+    assert b.retry_after() == 30
+
+
+def test_late_failures_do_not_reopen_after_probe(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=2, cooldown=30)
+    in_flight = [call(b) for _ in range(5)]
+    b.record(False, in_flight.pop())
+    b.record(False, in_flight.pop())
+    assert b.state == CircuitState.OPEN
+
+    # A late failure while open does not restart the cooldown or count again
+    b.record(False, in_flight.pop())
+    assert b.times_opened == 1
+    clock.now += 31
+    probe = call(b)
+    b.record(True, probe)
+    assert b.state == CircuitState.CLOSED
+
+    # The rest of the calls started before the circuit opened now fail late
+    for generation in in_flight:
+        b.record(False, generation)
+    assert b.state == CircuitState.CLOSED
+    assert b.times_opened == 1
+    assert b.describe()["recent_calls"] == 0
+
+
+def test_late_success_does_not_decide_the_probe(clock):
+    b = CircuitBreaker(error_rate=0.5, min_calls=1, cooldown=30)
+    slow = call(b)
+    b.record(False, call(b))
+    clock.now += 31
+    probe = call(b)
+
+    b.record(True, slow)
+    assert b.state == CircuitState.HALF_OPEN
+    b.record(False, probe)
+    assert b.state == CircuitState.OPEN
@@ -0,0 +1,83 @@
+import json
+
+from factories import make_session
+
+from budget import DEFAULT_MAX_TOKENS, MIN_OBSERVATIONS, TokenBudget, clip_middle, trim_payload
+from prompts import GAP_ANALYZER_PROMPT, build_gap_analyzer_input
+
+
+def test_estimate_counts_system_prompt():
+    budget = TokenBudget()
+    assert budget.estimate("gaps", "x" * 350, "y" * 350) == 200
+    assert budget.estimate("gaps", "", "y" * 350) == 100
+
+
+def test_fit_returns_input_within_budget():
+    budget = TokenBudget(1000)
+    text = json.dumps({"requirement": "short"})
+    assert budget.fit("gaps", GAP_ANALYZER_PROMPT, text) is text
+    assert budget.stats("gaps").trimmed == 0
+
+
+def test_fit_trims_when_system_prompt_pushes_over_budget():
+    budget = TokenBudget(1000)
+    # About 890 tokens alone, over 1000 with the system prompt
+    user_input = json.dumps({"clarifications": [{"id": "q1_1", "question": "Q?", "answer": "a" * 3000}]})
+    system_prompt = "s" * 2000
+
+    assert budget.fit("gaps", "", user_input) == user_input
+    fitted = budget.fit("gaps", system_prompt, user_input)
+    assert budget.estimate("gaps", system_prompt, fitted) <= 1000
+    assert budget.stats("gaps").trimmed == 1
+
+
+def test_fit_never_trims_pending_questions():
+    session = make_session(questions=200)
+    for c in session.clarifications[:150]:
+        c.answer = "a detailed answer " * 50
+    budget = TokenBudget(4000)
+    fitted = json.loads(budget.fit("gaps", GAP_ANALYZER_PROMPT, build_gap_analyzer_input(session)))
+    pending = {c.id: c.question for c in session.clarifications if c.answer is None}
+    sent = {c["id"]: c["question"] for c in fitted["clarifications"] if c.get("answer") is None}
+    assert sent == pending
+
+
+def test_fit_disabled_with_zero_budget():
+    budget = TokenBudget(0)
+    text = "x" * 100000
+    assert budget.fit("gaps", GAP_ANALYZER_PROMPT, text) is text
+
+
+def test_clip_middle_keeps_both_ends():
+    text = "start " + "x" * 1000 + " end"
+    clipped = clip_middle(text, 100)
+    assert clipped.startswith("start") and clipped.endswith("end")
+    assert len(clipped) < len(text)
+
+
+def test_trim_steps_drop_why_then_clip_answers():
+    payload = {"clarifications": [
+        {"id": "q1_1", "question": "Q?", "answer": "a" * 5000, "why": "because"},
+        {"id": "q1_2", "question": "P?", "answer": None, "why": "pending"},
+    ]}
+    assert trim_payload(payload, 0) == len("because")
+    assert payload["clarifications"][0]["why"] is None
+    assert payload["clarifications"][1]["why"] == "pending"
+    assert trim_payload(payload, 1) > 0
+    assert len(payload["clarifications"][0]["answer"]) < 1300
+
+
+def test_observe_calibrates_on_system_prompt_and_input():
+    budget = TokenBudget()
+    for _ in range(50):
+        budget.observe("gaps", input_chars=5000, input_tokens=1000, output_tokens=300, continuations=0)
+    assert abs(budget.stats("gaps").chars_per_token - 5.0) < 0.01
+    assert abs(budget.estimate("gaps", "s" * 2500, "u" * 2500) - 1000) <= 1
+
+
+def test_max_tokens_follows_observed_outputs():
+    budget = TokenBudget()
+    assert budget.max_tokens("gaps") == DEFAULT_MAX_TOKENS["gaps"]
+    for _ in range(MIN_OBSERVATIONS):
+        budget.observe("gaps", 1000, 250, 1000, 0)
+    assert budget.max_tokens("gaps") == 1536
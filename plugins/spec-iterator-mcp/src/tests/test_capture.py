@@ -0,0 +1,63 @@
+import json
+
+from capture import REDACTED, TrafficCapture, read_capture
+from middleware import CaptureMiddleware
+
+KEY = "sk-ant-REDACTED"
+CONFIG = "eyJBTlRIUk9QSUNfQVBJX0tFWSI6ICJzay1hbnQtc2VjcmV0In0="  # {"ANTHROPIC_API_KEY": "sk-ant-secret"}
+
+
+async def capture_exchange(path, body: bytes, response: bytes, headers: list[tuple[bytes, bytes]]) -> str:
+    async def app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"set-cookie", f"key={KEY}".encode()),
+        ]})
+        await send({"type": "http.response.body", "body": response})
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/mcp/",
+        "query_string": f"config={CONFIG}".encode(), "headers": headers,
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    capture = TrafficCapture(path)
+    await CaptureMiddleware(app, capture)(scope, receive, send)
+    capture.close()
+    return path.read_text()
+
+
+async def test_keys_headers_and_query_strings_never_reach_the_file(tmp_path):
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"note": f"my key is {KEY}"}})
+    text = await capture_exchange(
+        tmp_path / "capture.jsonl",
+        body.encode(),
+        json.dumps({"result": f"echo {KEY}"}).encode(),
+        [
+            (b"content-type", b"application/json"),
+            (b"authorization", f"Bearer {KEY}".encode()),
+            (b"x-api-key", KEY.encode()),
+            (b"mcp-session-id", b"abc"),
+        ],
+    )
+
+    assert "sk-ant" not in text
+    assert CONFIG not in text and "config=" not in text
+    [record] = read_capture(tmp_path / "capture.jsonl")
+    assert record["headers"] == {"content-type": "application/json", "mcp-session-id": "abc"}
+    assert record["response_headers"] == {"content-type": "application/json"}
+    assert record["body"]["params"]["note"] == f"my key is {REDACTED}"
+    assert record["response"] == json.dumps({"result": f"echo {REDACTED}"})
+
+
+async def test_a_captured_header_is_still_redacted(tmp_path):
+    text = await capture_exchange(
+        tmp_path / "capture.jsonl", b"", b"{}", [(b"mcp-session-id", KEY.encode())]
+    )
+    assert "sk-ant" not in text
+    assert read_capture(tmp_path / "capture.jsonl")[0]["headers"] == {"mcp-session-id": REDACTED}
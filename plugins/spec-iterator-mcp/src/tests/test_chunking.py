@@ -0,0 +1,100 @@
+import pytest
+
+from chunking import MAX_QUESTIONS, MAX_SECTIONS, SECTION_CHARS, merge_analyses, split_sections
+from models import AnalyzedQuestion, QuestionCategory, QuestionPriority, SectionAnalysis
+
+
+def paragraph(i: int, chars: int = 500) -> str:
+    words = f"Paragraph {i} describes one part of the order tracking workflow. "
+    return (words * (chars // len(words) + 1))[:chars].strip() + "."
+
+
+def test_short_documents_stay_whole():
+    text = "\n\n".join(paragraph(i) for i in range(3))
+    assert split_sections(text) == [text]
+
+
+def test_sections_break_at_paragraphs_and_keep_every_paragraph():
+    paragraphs = [paragraph(i) for i in range(30)]
+    sections = split_sections("\n\n".join(paragraphs))
+
+    assert 1 < len(sections) <= MAX_SECTIONS
+    assert all(len(s) <= SECTION_CHARS for s in sections)
+    assert [p for s in sections for p in s.split("\n\n")] == paragraphs
+
+
+def test_a_heading_starts_a_section_once_the_current_one_is_half_full():
+    body = [paragraph(i) for i in range(8)]  # about 4000 characters
+    text = "\n\n".join(body + ["## Delivery notifications", paragraph(99)])
+    sections = split_sections(text)
+    assert len(sections) == 2
+    assert sections[1].startswith("## Delivery notifications")
+
+
+@pytest.mark.parametrize("paragraphs", [100, 400])
+def test_long_documents_get_longer_sections_not_more(paragraphs):
+    sections = split_sections("\n\n".join(paragraph(i) for i in range(paragraphs)))
+    assert len(sections) == MAX_SECTIONS
+    sizes = [len(s) for s in sections]
+    assert max(sizes) <= 2.5 * min(sizes)
+
+
+def test_overlong_paragraphs_are_split_at_sentences():
+    text = paragraph(1, chars=20000).replace("\n", " ")
+    sections = split_sections(text)
+    assert len(sections) > 1
+    assert all(s.endswith(".") for s in sections)
+    assert "".join(s.replace(" ", "") for s in sections) == text.replace(" ", "")
+
+
+def question(text: str, category: QuestionCategory, priority=QuestionPriority.IMPORTANT) -> AnalyzedQuestion:
+    return AnalyzedQuestion(question=text, category=category, priority=priority, why="It matters.")
+
+
+F, T, U = QuestionCategory.FUNCTIONAL, QuestionCategory.TECHNICAL, QuestionCategory.UX
+
+
+def test_merge_dedupes_entities_assumptions_and_questions():
+    merged = merge_analyses([
+        SectionAnalysis(
+            summary="Ordering", core_need="Let shoppers track orders",
+            entities=["Order", "Customer"], implicit_assumptions=["Customers have accounts"],
+            questions=[question("Who are the primary users of the order tracking page?", F)],
+        ),
+        SectionAnalysis(
+            summary="Shipping", core_need="Ship orders",
+            entities=[" order ", "Carrier"], implicit_assumptions=["Customers have an account"],
+            questions=[question(
+                "Who are the main users of the order tracking page?", F, QuestionPriority.CRITICAL,
+            )],
+        ),
+    ])
+
+    assert merged.core_need == "Let shoppers track orders"
+    assert merged.entities == ["Order", "Customer", "Carrier"]
+    assert merged.implicit_assumptions == ["Customers have accounts"]
+    # The repeated question keeps the higher priority it was raised with
+    assert [(q.question, q.priority) for q in merged.questions] == [
+        ("Who are the main users of the order tracking page?", QuestionPriority.CRITICAL),
+    ]
+
+
+def test_merge_covers_every_category_before_filling_up():
+    topics = (
+        "refunds", "invoices", "coupons", "wishlists", "reviews", "returns",
+        "subscriptions", "gift cards", "loyalty points", "bundles", "preorders",
+    )
+    critical_functional = [question(f"How should {topic} work?", F, QuestionPriority.CRITICAL) for topic in topics]
+    merged = merge_analyses([
+        SectionAnalysis(summary="Features", questions=critical_functional),
+        SectionAnalysis(summary="Hosting", questions=[question("Which cloud hosts the service?", T)]),
+        SectionAnalysis(summary="Screens", questions=[
+            question("Which screen do shoppers see first?", U, QuestionPriority.NICE_TO_HAVE),
+        ]),
+    ])
+
+    assert len(merged.questions) == MAX_QUESTIONS
+    assert {q.category for q in merged.questions} == {F, T, U}
+    assert merged.questions[0].priority == QuestionPriority.CRITICAL
+    assert merged.questions[-1].category == U
+    assert merged.core_need == "Features"
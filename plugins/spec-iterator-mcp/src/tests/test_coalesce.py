@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+from coalesce import SingleFlight, payload_digest
+
+
+def test_payload_digest_ignores_key_order():
+    assert payload_digest({"a": 1, "b": [1, 2]}) == payload_digest({"b": [1, 2], "a": 1})
+    assert payload_digest({"a": 1}) != payload_digest({"a": 2})
+
+
+async def test_identical_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.run("key", work) for _ in range(5)))
+    assert results == [1] * 5
+    assert calls == 1
+
+
+async def test_session_calls_are_serialized():
+    flight = SingleFlight()
+    running = 0
+    overlap = False
+
+    async def work():
+        nonlocal running, overlap
+        running += 1
+        overlap |= running > 1
+        await asyncio.sleep(0.005)
+        running -= 1
+
+    await asyncio.gather(*(flight.run(("answer", i), work, session_id="sess_1") for i in range(5)))
+    assert not overlap
+
+
+async def test_session_locks_are_dropped_when_unused():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.001)
+
+    await asyncio.gather(*(flight.run(i, work, session_id=f"sess_{i % 50}") for i in range(500)))
+    assert flight._locks == {}
+
+
+async def test_lock_is_kept_while_calls_wait():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def first():
+        await release.wait()
+
+    async def second():
+        return "done"
+
+    holding = asyncio.create_task(flight.run("first", first, session_id="sess_1"))
+    waiting = asyncio.create_task(flight.run("second", second, session_id="sess_1"))
+    await asyncio.sleep(0.01)
+    lock, users = flight._locks["sess_1"]
+    assert lock.locked() and users == 2
+
+    release.set()
+    assert await waiting == "done"
+    await holding
+    assert "sess_1" not in flight._locks
+
+
+async def test_failed_and_cancelled_calls_drop_their_lock():
+    flight = SingleFlight()
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await flight.run("fail", fail, session_id="sess_1")
+    assert flight._locks == {}
+
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(flight.run("slow", slow, session_id="sess_2"))
+    await started.wait()
+    flight._inflight["slow"].cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert flight._locks == {}
+
+
+async def test_remembered_results_replay():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return "result"
+
+    assert await flight.run("idem", work, remember=True) == "result"
+    assert await flight.run("idem", work, remember=True) == "result"
+    assert calls == 1
+
+
+async def test_identical_starts_without_a_key_get_separate_sessions(server):
+    import main
+
+    first, second = await asyncio.gather(
+        main.spec_start_session("Order tracking page", reuse_similar=False),
+        main.spec_start_session("Order tracking page", reuse_similar=False),
+    )
+    assert json.loads(first)["session_id"] != json.loads(second)["session_id"]
+
+
+async def test_starts_with_the_same_key_share_a_session(server):
+    import main
+
+    first, second = await asyncio.gather(
+        main.spec_start_session("Order tracking page", idempotency_key="k1", reuse_similar=False),
+        main.spec_start_session("Order tracking page", idempotency_key="k1", reuse_similar=False),
+    )
+    assert json.loads(first)["session_id"] == json.loads(second)["session_id"]
@@ -0,0 +1,62 @@
+import itertools
+
+import pytest
+from factories import answer, make_session
+
+from compact import CompactSession
+from models import (
+    Audience,
+    Clarification,
+    Complexity,
+    CompletenessScore,
+    QuestionCategory,
+    QuestionPriority,
+    SessionStatus,
+)
+from store import SessionStore
+
+
+def test_every_coded_field_survives_the_round_trip():
+    session = make_session(questions=0)
+    pairs = itertools.product(QuestionCategory, QuestionPriority)
+    session.clarifications = [
+        Clarification(id=f"q1_{i}", question=f"Question {i}?", category=category, priority=priority, why="Because.")
+        for i, (category, priority) in enumerate(pairs)
+    ]
+    for status, audience, complexity in itertools.product(SessionStatus, [None, *Audience], Complexity):
+        session.status = status
+        session.context.audience = audience
+        session.context.complexity = complexity
+        assert CompactSession.from_session(session).to_session().model_dump() == session.model_dump()
+
+
+def test_summary_fields_are_read_without_rebuilding():
+    session = answer(make_session(), "q1_1", "Shop owners")
+    session.status = SessionStatus.READY_TO_GENERATE
+    session.completeness = CompletenessScore(overall=82, functional=90)
+    compact = CompactSession.from_session(session)
+
+    assert compact.status == SessionStatus.READY_TO_GENERATE
+    assert compact.completeness == session.completeness
+    assert compact.has_answers
+    assert not CompactSession.from_session(make_session()).has_answers
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_cold_text_is_compressed_only_when_asked(compress):
+    session = answer(make_session(), "q1_2", "Shop owners and their customers")
+    compact = CompactSession.from_session(session, compress)
+    assert (compact.cold is not None) == compress
+    assert compact.to_session().clarifications[1].answer == "Shop owners and their customers"
+
+
+def test_store_keeps_idle_sessions_compact():
+    store = SessionStore()
+    store["sess_1"] = make_session()
+    assert isinstance(store._compact["sess_1"], CompactSession)
+
+    with store.checkout("sess_1") as session:
+        assert "sess_1" not in store._compact
+        session.clarifications[0].answer = "Shop owners"
+    assert store._compact["sess_1"].has_answers
+    assert store["sess_1"].clarifications[0].answer == "Shop owners"
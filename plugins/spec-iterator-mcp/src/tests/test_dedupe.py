@@ -0,0 +1,53 @@
+from models import AnalyzedQuestion, Clarification, QuestionCategory, QuestionPriority
+from similarity import dedupe_questions
+
+USERS = "Who are the primary users of the order tracking page?"
+USERS_REWORDED = "Who are the main users of the order tracking page?"
+REFUNDS = "How should refunds be handled for cancelled orders?"
+
+C, I, N = QuestionPriority.CRITICAL, QuestionPriority.IMPORTANT, QuestionPriority.NICE_TO_HAVE
+
+
+def asked(question: str, priority: QuestionPriority, answer: str | None = None) -> Clarification:
+    return Clarification(
+        id="q1_1", question=question, category=QuestionCategory.FUNCTIONAL,
+        priority=priority, why="Scope.", answer=answer,
+    )
+
+
+def generated(question: str, priority: QuestionPriority) -> AnalyzedQuestion:
+    return AnalyzedQuestion(question=question, category=QuestionCategory.FUNCTIONAL, priority=priority, why="Scope.")
+
+
+def test_new_questions_are_kept():
+    kept, duplicates = dedupe_questions([asked(USERS, I)], [generated(REFUNDS, I)])
+    assert [q.question for q in kept] == [REFUNDS]
+    assert duplicates == []
+
+
+def test_rewording_of_a_pending_question_raises_its_priority():
+    existing = asked(USERS, N)
+    kept, duplicates = dedupe_questions([existing], [generated(USERS_REWORDED, C)])
+    assert kept == []
+    assert [q.question for q in duplicates] == [USERS_REWORDED]
+    assert existing.priority == C
+
+
+def test_rewording_never_lowers_a_priority():
+    existing = asked(USERS, C)
+    dedupe_questions([existing], [generated(USERS_REWORDED, N)])
+    assert existing.priority == C
+
+
+def test_rewording_of_an_answered_question_is_dropped_unmerged():
+    existing = asked(USERS, N, answer="Shop owners")
+    kept, duplicates = dedupe_questions([existing], [generated(USERS_REWORDED, C)])
+    assert kept == [] and len(duplicates) == 1
+    assert existing.priority == N
+
+
+def test_repeats_within_one_round_keep_the_first():
+    kept, duplicates = dedupe_questions([], [generated(USERS, I), generated(USERS_REWORDED, C), generated(REFUNDS, I)])
+    assert [q.question for q in kept] == [USERS, REFUNDS]
+    assert [q.question for q in duplicates] == [USERS_REWORDED]
+    assert kept[0].priority == I
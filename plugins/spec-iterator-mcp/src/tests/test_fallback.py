@@ -0,0 +1,25 @@
+import json
+
+import main
+from prompts import QUESTION_GENERATOR_PROMPT
+
+REQUIREMENT = "Order tracking page for a small online shop"
+
+
+async def test_unusable_generator_output_is_not_reported_as_an_outage(server):
+    started = json.loads(await main.spec_start_session(REQUIREMENT, reuse_similar=False))
+    server.messages.raw[QUESTION_GENERATOR_PROMPT] = "Here are some questions, but not as JSON."
+
+    answers = [{"question_id": started["questions"][0]["id"], "answer": "Shop owners"}]
+    result = json.loads(await main.spec_answer_questions(started["session_id"], answers, force_new_round=True))
+
+    assert result["pending_questions"]
+    assert result["fallback"]["kind"] == "unusable_output"
+    assert "not recorded against the circuit breaker" in result["fallback"]["note"]
+    assert main.claude_breaker.describe()["recent_failures"] == 0
+
+
+def test_outage_note():
+    note = main.fallback_note("Claude circuit is open")
+    assert note["kind"] == "claude_unavailable"
+    assert note["note"].startswith("Claude was unavailable")
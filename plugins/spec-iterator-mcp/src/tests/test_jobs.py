@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import jobs
+import main
+from breaker import CircuitBreaker
+from factories import make_session
+from jobs import JobQueue, JobStatus
+from models import CompletenessScore
+
+
+def caller(api_key: str | None):
+    """A tool-call context whose HTTP request carries this API key."""
+    request = SimpleNamespace(state=SimpleNamespace(api_key=api_key), headers={})
+    return SimpleNamespace(request_context=SimpleNamespace(request=request))
+
+
+def ready_session(session_id: str = "sess_1"):
+    session = make_session(session_id)
+    session.completeness = CompletenessScore(overall=85)
+    main.sessions[session_id] = session
+    return session
+
+
+async def test_jobs_are_only_visible_to_the_submitting_tenant(server):
+    ready_session()
+    alice, bob = caller("key-alice"), caller("key-bob")
+    job_id = json.loads(await main.spec_generate("sess_1", background=True, ctx=alice))["job_id"]
+
+    assert json.loads(await main.spec_job_status(job_id, ctx=bob))["error"] == "Job not found"
+    assert json.loads(await main.spec_cancel_job(job_id, ctx=bob))["error"] == "Job not found"
+    assert json.loads(await main.spec_job_status(job_id, wait_seconds=5, ctx=alice))["status"] == "succeeded"
+
+
+async def test_tool_error_marks_the_job_failed(server, monkeypatch):
+    ready_session()
+    # An open circuit makes spec_generate return an in-band error
+    monkeypatch.setattr(main, "claude_breaker", CircuitBreaker(min_calls=1))
+    main.claude_breaker.record(False, main.claude_breaker.generation)
+
+    job_id = json.loads(await main.spec_generate("sess_1", background=True))["job_id"]
+    status = json.loads(await main.spec_job_status(job_id, wait_seconds=5))
+    assert status["status"] == "failed"
+    assert status["result"]["error"] == "Claude is unavailable"
+
+
+async def test_queue_runs_at_most_workers_jobs_at_once():
+    queue = JobQueue(workers=2)
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "{}"
+
+    submitted = [queue.submit("spec_generate", f"sess_{i}", work) for i in range(3)]
+    await asyncio.sleep(0.01)
+    assert [job.status for job in submitted] == [JobStatus.RUNNING, JobStatus.RUNNING, JobStatus.QUEUED]
+
+    release.set()
+    assert await queue.wait_idle(1)
+    assert all(job.status == JobStatus.SUCCEEDED and job.result == "{}" for job in submitted)
+
+
+async def test_wait_returns_at_the_timeout_or_when_done():
+    queue = JobQueue()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "{}"
+
+    job = queue.submit("spec_get_gaps", "sess_1", work)
+    assert not await queue.wait(job, 0.01)
+    release.set()
+    assert await queue.wait(job, 1)
+    assert queue.get(job.id) is job
+
+
+async def test_cancel_queued_and_running_jobs():
+    queue = JobQueue(workers=1)
+
+    async def work():
+        await asyncio.sleep(10)
+        return "{}"
+
+    running = queue.submit("spec_generate", "sess_1", work)
+    queued = queue.submit("spec_generate", "sess_2", work)
+    await asyncio.sleep(0.01)
+
+    assert queue.cancel(queued) and queue.cancel(running)
+    assert await queue.wait_idle(1)
+    assert running.status == queued.status == JobStatus.CANCELLED
+    assert not queue.cancel(running)
+
+
+async def test_exceptions_fail_the_job():
+    queue = JobQueue()
+
+    async def work():
+        raise ValueError("API call failed")
+
+    job = queue.submit("spec_generate", "sess_1", work)
+    await queue.wait(job, 1)
+    assert job.status == JobStatus.FAILED
+    assert job.error == "API call failed"
+
+
+async def test_finished_jobs_expire(monkeypatch):
+    queue = JobQueue()
+
+    async def work():
+        return "{}"
+
+    job = queue.submit("spec_generate", "sess_1", work)
+    await queue.wait(job, 1)
+    assert queue.get(job.id) is job
+
+    now = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: now + jobs.JOB_RESULT_TTL_SECONDS + 1)
+    assert queue.get(job.id) is None
@@ -0,0 +1,98 @@
+import gzip
+
+import pytest
+
+from middleware import CompressionMiddleware, choose_encoding, vary_on_encoding
+
+
+def make_app(body: bytes, headers: list[tuple[bytes, bytes]] = (), chunks: int = 1):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": list(headers)})
+        size = -(-len(body) // chunks)
+        for i in range(chunks):
+            part = body[i * size:(i + 1) * size]
+            await send({"type": "http.response.body", "body": part, "more_body": i < chunks - 1})
+
+    return app
+
+
+async def request(app, accept_encoding: str | None) -> tuple[dict[bytes, bytes], bytes]:
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "POST", "path": "/mcp", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await CompressionMiddleware(app, min_size=100)(scope, receive, send)
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return {k: v for k, v in start["headers"]}, body
+
+
+BIG = b'{"result": "' + b"spec text " * 200 + b'"}'
+
+
+@pytest.mark.parametrize("accept_encoding", [None, "identity", "gzip"])
+@pytest.mark.parametrize("body", [b"{}", BIG], ids=["small", "large"])
+async def test_every_response_varies_on_accept_encoding(accept_encoding, body):
+    headers, _ = await request(make_app(body), accept_encoding)
+    assert headers[b"vary"] == b"accept-encoding"
+
+
+async def test_compresses_large_bodies():
+    headers, body = await request(make_app(BIG, [(b"content-length", str(len(BIG)).encode())]), "gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert int(headers[b"content-length"]) == len(body)
+    assert gzip.decompress(body) == BIG
+
+
+async def test_streamed_body_decodes_chunk_by_chunk():
+    headers, body = await request(make_app(BIG, chunks=4), "gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert gzip.decompress(body) == BIG
+
+
+async def test_event_stream_with_a_small_first_event_is_compressed():
+    events = [b"event: message\ndata: {}\n\n", b"data: " + BIG + b"\n\n", b"data: " + BIG + b"\n\n"]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        for i, event in enumerate(events):
+            await send({"type": "http.response.body", "body": event, "more_body": i < len(events) - 1})
+
+    headers, body = await request(app, "gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body) == b"".join(events)
+
+
+async def test_small_complete_event_stream_is_sent_as_is():
+    event = b"data: {}\n\n"
+    headers, body = await request(make_app(event, [(b"content-type", b"text/event-stream")]), "gzip")
+    assert b"content-encoding" not in headers
+    assert body == event
+
+
+async def test_leaves_encoded_responses_alone():
+    headers, body = await request(make_app(BIG, [(b"content-encoding", b"br")]), "gzip")
+    assert headers[b"content-encoding"] == b"br"
+    assert body == BIG
+    assert headers[b"vary"] == b"accept-encoding"
+
+
+def test_vary_merges_with_existing_header():
+    assert vary_on_encoding([(b"vary", b"origin")]) == [(b"vary", b"origin, accept-encoding")]
+    assert vary_on_encoding([(b"Vary", b"Accept-Encoding")]) == [(b"Vary", b"Accept-Encoding")]
+    assert vary_on_encoding([(b"vary", b"*")]) == [(b"vary", b"*")]
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate", brotli_available=False) == "gzip"
+    assert choose_encoding("br, gzip", brotli_available=True) == "br"
+    assert choose_encoding("br;q=0, gzip;q=0.5", brotli_available=True) == "gzip"
+    assert choose_encoding("identity", brotli_available=True) is None
+    assert choose_encoding("*", brotli_available=False) == "gzip"
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import main
+from prompts import QUESTION_GENERATOR_PROMPT
+
+REQUIREMENT = "Order tracking page for a small online shop"
+
+
+async def start() -> dict:
+    return json.loads(await main.spec_start_session(REQUIREMENT, reuse_similar=False))
+
+
+async def status(session_id: str, **kwargs) -> dict:
+    return json.loads(await main.spec_get_status(session_id, **kwargs))
+
+
+async def test_unchanged_session_is_not_modified(server):
+    session_id = (await start())["session_id"]
+    current = await status(session_id)
+    assert await status(session_id, if_version=current["version"]) == {
+        "session_id": session_id, "version": current["version"], "not_modified": True,
+    }
+
+
+async def test_recorded_answers_raise_the_version(server):
+    started = await start()
+    session_id = started["session_id"]
+    before = await status(session_id)
+    listing = json.loads(await main.spec_list_sessions())
+
+    answers = [{"question_id": started["questions"][0]["id"], "answer": "Shop owners"}]
+    await main.spec_answer_questions(session_id, answers)
+
+    after = await status(session_id, if_version=before["version"])
+    assert "not_modified" not in after and after["version"] > before["version"]
+    changed = json.loads(await main.spec_list_sessions(since=listing["cursor"]))
+    assert [s["id"] for s in changed["changed"]] == [session_id]
+
+
+async def test_failed_generator_call_still_raises_the_version(server):
+    started = await start()
+    session_id = started["session_id"]
+    before = await status(session_id)
+    listing = json.loads(await main.spec_list_sessions())
+    server.messages.errors[QUESTION_GENERATOR_PROMPT] = RuntimeError("invalid x-api-key")
+
+    answers = [{"question_id": started["questions"][0]["id"], "answer": "Shop owners"}]
+    with pytest.raises(ValueError, match="invalid x-api-key"):
+        await main.spec_answer_questions(session_id, answers, force_new_round=True)
+
+    after = await status(session_id, if_version=before["version"])
+    assert "not_modified" not in after
+    assert after["questions"]["answered"] == 1
+    changed = json.loads(await main.spec_list_sessions(since=listing["cursor"]))
+    assert [s["id"] for s in changed["changed"]] == [session_id]
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import profiling
+from profiling import LoopWatchdog, RequestProfile, phase
+
+
+def test_phases_are_free_outside_a_profile():
+    assert phase("claude") is profiling._NO_PHASE
+
+
+async def test_phases_add_up_per_name_including_spawned_tasks():
+    async def claude_call():
+        with phase("claude"):
+            await asyncio.sleep(0.02)
+
+    with RequestProfile("spec_answer_questions", "sess_1") as profile:
+        await claude_call()
+        await asyncio.gather(claude_call(), asyncio.create_task(claude_call()))
+        with phase("render"):
+            time.sleep(0.01)
+        await asyncio.sleep(0.01)
+
+    breakdown = profile.breakdown()
+    assert set(breakdown["phases_ms"]) == {"claude", "render", "other"}
+    # Concurrent Claude waits each count in full, so phases can add up to more than wall time
+    assert breakdown["phases_ms"]["claude"] >= 60
+    assert breakdown["phases_ms"]["render"] >= 10
+    assert breakdown["total_ms"] >= 60
+
+
+async def test_phases_ending_after_the_call_are_not_counted():
+    with RequestProfile("spec_get_gaps") as profile:
+        late = phase("claude")
+        late.__enter__()
+    late.__exit__(None, None, None)
+    assert profile.phases == {}
+
+
+async def test_watchdog_reports_a_blocked_loop_once():
+    watchdog = LoopWatchdog(threshold_ms=40)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        with RequestProfile("spec_generate") as profile:
+            time.sleep(0.2)  # blocks the loop
+            await asyncio.sleep(0.05)
+    finally:
+        watchdog._task.cancel()
+        # The watch thread has no stop; a heartbeat in the future keeps it quiet from here on
+        watchdog._heartbeat = float("inf")
+
+    described = watchdog.describe()
+    assert described["stalls"] == 1
+    assert described["max_lag_ms"] >= 100
+    [stall] = described["recent_stalls"]
+    assert stall["blocked_ms"] >= 40
+    assert "test_profiling.py" in stall["where"]
+    assert profile.breakdown()["loop_stalls"] == [stall]
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+
+from factories import make_session
+
+import main
+from startup import warm_up
+from store import SessionStore
+
+
+async def test_tool_calls_wait_for_restore_without_blocking_the_loop(tmp_path, server, monkeypatch):
+    source = SessionStore()
+    source["sess_1"] = make_session("sess_1")
+    source.save_snapshot(tmp_path / "sessions.snap")
+
+    store = SessionStore()
+    store.attach_snapshot(tmp_path / "sessions.snap")
+    monkeypatch.setattr(main, "sessions", store)
+
+    # The warm-up thread is in the middle of a slow restore
+    restoring = threading.Event()
+
+    def slow_restore():
+        with store._load_lock:
+            restoring.set()
+            time.sleep(0.5)
+        store.load_snapshot()
+
+    threading.Thread(target=slow_restore, daemon=True).start()
+    restoring.wait()
+
+    ticks = []
+
+    async def ticker():
+        while len(ticks) < 20:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.03)
+    status = await main.spec_get_status("sess_1")
+    await ticking
+    assert json.loads(status)["session_id"] == "sess_1"
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.2
+
+
+def test_warm_up_reports_failed_steps(capsys):
+    def corrupt_snapshot():
+        raise ValueError("unpack(b) received extra data")
+
+    timings = {}
+    warm_up({"session snapshot restore": corrupt_snapshot, "other": lambda: None}, timings)
+
+    err = capsys.readouterr().err
+    assert "session snapshot restore" in err and "extra data" in err
+    assert set(timings) == {"session snapshot restore", "other"}
+
+
+async def test_draining_refuses_new_sessions_but_serves_existing_ones(server):
+    started = json.loads(await main.spec_start_session("Order tracking page", reuse_similar=False))
+    main.drain.draining = True
+
+    refused = json.loads(await main.spec_start_session("Another page", reuse_similar=False))
+    assert refused["error"] == "Server is restarting"
+    status = json.loads(await main.spec_get_status(started["session_id"]))
+    assert status["session_id"] == started["session_id"]
+
+
+async def test_drain_waits_for_requests_then_snapshots_sessions(tmp_path, server, monkeypatch):
+    snapshot = tmp_path / "sessions.snap"
+    monkeypatch.setenv("SPEC_ITERATOR_SNAPSHOT", str(snapshot))
+    started = json.loads(await main.spec_start_session("Order tracking page", reuse_similar=False))
+    session_id = started["session_id"]
+
+    # A request still in flight records an answer just before it finishes
+    main.drain.inflight = 1
+
+    async def finish_request():
+        await asyncio.sleep(0.1)
+        with main.sessions.checkout(session_id) as session:
+            session.clarifications[0].answer = "Shop owners"
+        main.drain.inflight = 0
+
+    finishing = asyncio.create_task(finish_request())
+    await main.drain_and_snapshot(timeout=5)
+    await finishing
+
+    assert main.drain.draining
+    restored = SessionStore()
+    restored.attach_snapshot(snapshot)
+    assert restored.load_snapshot() == 1
+    assert restored[session_id].clarifications[0].answer == "Shop owners"
+    assert restored[session_id] == main.sessions[session_id]
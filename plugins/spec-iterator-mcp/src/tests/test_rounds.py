@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from factories import make_session
+
+import main
+from models import QuestionPriority
+from prompts import QUESTION_GENERATOR_PROMPT
+
+
+def progress(answered: int, questions: int = 5, critical: tuple[int, ...] = ()) -> dict:
+    session = make_session(questions=questions)
+    for i, c in enumerate(session.clarifications):
+        if i in critical:
+            c.priority = QuestionPriority.CRITICAL
+        if i < answered:
+            c.answer = "Yes"
+    return main.round_progress(session)
+
+
+@pytest.mark.parametrize("questions, answered, ready", [
+    (5, 2, False), (5, 3, True), (4, 2, False), (4, 3, True), (1, 0, False), (1, 1, True),
+])
+def test_round_is_due_at_the_answer_fraction(questions, answered, ready):
+    assert progress(answered, questions)["ready"] is ready
+
+
+def test_answering_every_critical_question_makes_the_round_due():
+    assert progress(1, critical=(0,)) == {"answered": 1, "total": 5, "needed": 3, "critical_pending": 0, "ready": True}
+    assert progress(1, critical=(0, 4))["ready"] is False
+
+
+def test_only_the_latest_round_counts():
+    session = make_session(questions=3)
+    for c in session.clarifications:
+        c.answer = "Yes"
+    session.round_count = 2
+    session.clarifications.append(session.clarifications[0].model_copy(update={"id": "q2_1", "answer": None}))
+    assert main.round_progress(session) == {"answered": 0, "total": 1, "needed": 1, "critical_pending": 0, "ready": False}
+
+
+def generator_calls(server) -> int:
+    return sum(1 for system, _ in server.messages.calls if system == QUESTION_GENERATOR_PROMPT)
+
+
+async def test_partial_answers_defer_the_next_round(server):
+    started = json.loads(await main.spec_start_session("Order tracking page", reuse_similar=False))
+    important = [q["id"] for q in started["questions"] if q["priority"] == "important"]
+
+    answers = [{"question_id": important[0], "answer": "Shop owners"}]
+    result = json.loads(await main.spec_answer_questions(started["session_id"], answers))
+    assert result["follow_up_deferred"] is True
+    assert result["round"] == 1
+    assert generator_calls(server) == 0
+
+    forced = json.loads(await main.spec_answer_questions(started["session_id"], [], force_new_round=True))
+    assert forced["follow_up_deferred"] is False
+    assert forced["round"] == 2
+    assert generator_calls(server) == 1
+
+
+async def test_answering_the_critical_questions_starts_the_next_round(server):
+    started = json.loads(await main.spec_start_session("Order tracking page", reuse_similar=False))
+    critical = [q["id"] for q in started["questions"] if q["priority"] == "critical"]
+
+    answers = [{"question_id": qid, "answer": "Yes"} for qid in critical]
+    result = json.loads(await main.spec_answer_questions(started["session_id"], answers))
+    assert result["follow_up_deferred"] is False
+    assert result["round"] == 2
+    assert generator_calls(server) == 1
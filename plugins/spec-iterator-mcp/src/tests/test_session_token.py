@@ -0,0 +1,121 @@
+import pytest
+from factories import answer, make_session
+
+import main
+from session_token import SessionTokens, TokenError, TokenTooLarge
+from similarity import SessionIndex
+from store import SessionStore
+
+
+@pytest.fixture
+def tokens():
+    return SessionTokens(["first-secret"])
+
+
+@pytest.fixture
+def stateless(monkeypatch, tokens):
+    """main running in stateless mode with an empty session store, as a fresh replica."""
+    monkeypatch.setattr(main, "state_tokens", tokens)
+    monkeypatch.setattr(main, "sessions", SessionStore())
+    monkeypatch.setattr(main, "session_index", SessionIndex())
+    return tokens
+
+
+def test_round_trip(tokens):
+    session = answer(make_session(), "q1_1", "Shop owners")
+    data = tokens.open(tokens.issue(session), session.id)
+    assert data == session.model_dump(mode="json")
+
+
+def test_encrypted_round_trip():
+    pytest.importorskip("cryptography")
+    tokens = SessionTokens(["first-secret"], encrypt=True)
+    session = make_session()
+    token = tokens.issue(session)
+    assert "Order tracking" not in token
+    assert tokens.open(token, session.id)["requirement"] == session.requirement
+
+
+def test_rejects_tampered_token(tokens):
+    token = tokens.issue(make_session())
+    flipped = token[:20] + ("A" if token[20] != "A" else "B") + token[21:]
+    with pytest.raises(TokenError):
+        tokens.open(flipped, "sess_1")
+
+
+def test_rejects_token_for_another_session(tokens):
+    token = tokens.issue(make_session("sess_1"))
+    with pytest.raises(TokenError, match="different session"):
+        tokens.open(token, "sess_2")
+
+
+def test_rejects_unknown_secret(tokens):
+    token = SessionTokens(["other-secret"]).issue(make_session())
+    with pytest.raises(TokenError, match="signature"):
+        tokens.open(token, "sess_1")
+
+
+def test_rotation_verifies_old_secret():
+    old = SessionTokens(["old-secret"])
+    rotated = SessionTokens(["new-secret", "old-secret"])
+    token = old.issue(make_session())
+    assert rotated.open(token, "sess_1")["id"] == "sess_1"
+    with pytest.raises(TokenError):
+        old.open(rotated.issue(make_session()), "sess_1")
+
+
+def test_compacts_answered_rounds_to_fit():
+    session = make_session(questions=40)
+    for i, c in enumerate(session.clarifications):
+        c.answer = " ".join(f"answer{i}word{j}" for j in range(80))
+    pending = session.clarifications[-1].model_copy(update={"id": "q2_1", "answer": None})
+    session.clarifications.append(pending)
+    full = SessionTokens(["secret"], max_bytes=1 << 20).issue(session)
+
+    tight = SessionTokens(["secret"], max_bytes=len(full) // 3)
+    token = tight.issue(session)
+    assert len(token) <= tight.max_bytes
+    data = tight.open(token, session.id)
+    answered, [kept] = data["clarifications"][:-1], data["clarifications"][-1:]
+    assert all(c["why"] is None and len(c["answer"]) < len(session.clarifications[0].answer) for c in answered)
+    assert kept == pending.model_dump(mode="json")
+
+    with pytest.raises(TokenTooLarge):
+        SessionTokens(["secret"], max_bytes=64).issue(session)
+
+
+def test_stale_token_is_rejected(stateless):
+    session = make_session()
+    old_token = stateless.issue(session)
+    assert main.adopt_session_token(session.id, old_token) is None
+
+    # The session moves on at this replica
+    main.sessions[session.id] = answer(session, "q1_1", "Shop owners")
+    new_token = stateless.issue(session)
+
+    error = main.adopt_session_token(session.id, old_token)
+    assert error is not None and "Stale session token" in error
+    assert main.sessions.version(session.id) == 2
+    assert main.sessions[session.id].clarifications[0].answer == "Shop owners"
+    assert main.adopt_session_token(session.id, new_token) is None
+
+
+def test_replayed_token_cannot_roll_back_adopted_session(stateless):
+    session = make_session()
+    old_token = stateless.issue(session)
+    new_token = stateless.issue(answer(session, "q1_1", "Shop owners"))
+
+    # This replica first sees the session through the newer token, then the old one is replayed
+    assert main.adopt_session_token(session.id, new_token) is None
+    assert "Stale session token" in main.adopt_session_token(session.id, old_token)
+    assert main.sessions.version(session.id) == 2
+
+    # Re-sending the current token is harmless
+    assert main.adopt_session_token(session.id, new_token) is None
+    assert main.sessions.version(session.id) == 2
+
+
+def test_invalid_token_is_an_error_response(stateless):
+    error = main.adopt_session_token("sess_1", "not-a-token")
+    assert "Invalid session token" in error
+    assert "sess_1" not in main.sessions
@@ -0,0 +1,61 @@
+import base64
+import json
+
+import pytest
+
+from middleware import EMPTY_CONFIG, SmitheryConfigMiddleware, decode_smithery_config
+
+
+def encode(config) -> str:
+    return base64.b64encode(json.dumps(config).encode()).decode()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    decode_smithery_config.cache_clear()
+    yield
+    decode_smithery_config.cache_clear()
+
+
+def test_repeated_configs_are_decoded_once():
+    config = encode({"ANTHROPIC_API_KEY": "sk-ant-one"})
+    first = decode_smithery_config(config)
+    assert decode_smithery_config(config) is first
+    assert first["ANTHROPIC_API_KEY"] == "sk-ant-one"
+    assert decode_smithery_config.cache_info().hits == 1
+
+
+def test_decoded_config_is_read_only():
+    config = decode_smithery_config(encode({"ANTHROPIC_API_KEY": "sk-ant-one"}))
+    with pytest.raises(TypeError):
+        config["ANTHROPIC_API_KEY"] = "sk-ant-other"
+
+
+@pytest.mark.parametrize("config_b64", [
+    "not base64!",
+    base64.b64encode(b"{not json").decode(),
+    base64.b64encode(b"\xff\xfe").decode(),
+    encode(["a", "list"]),
+    encode("a string"),
+], ids=["base64", "json", "utf-8", "list", "string"])
+def test_malformed_configs_decode_to_empty_and_are_cached(config_b64):
+    assert decode_smithery_config(config_b64) is EMPTY_CONFIG
+    assert decode_smithery_config(config_b64) is EMPTY_CONFIG
+    assert decode_smithery_config.cache_info().hits == 1
+
+
+async def call(query_string: bytes, path: str = "/mcp/") -> dict:
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen.update(scope.get("state", {}))
+
+    await SmitheryConfigMiddleware(app)({"type": "http", "path": path, "query_string": query_string}, None, None)
+    return seen
+
+
+async def test_middleware_puts_the_key_on_the_request_state():
+    config = encode({"ANTHROPIC_API_KEY": "sk-ant-one"})
+    assert await call(f"config={config}".encode()) == {"api_key": "sk-ant-one"}
+    assert await call(b"config=garbage") == {}
+    assert await call(f"config={config}".encode(), path="/health") == {}
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import main
+from startup import warm_up
+
+SRC = Path(__file__).resolve().parent.parent
+
+
+def test_importing_main_leaves_the_sdk_for_later():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('anthropic' in sys.modules)"],
+        cwd=SRC, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_first_call_imports_the_sdk_and_keeps_one_client_per_key(monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    main._client_for.cache_clear()
+    try:
+        client = main.get_client("sk-ant-first")
+        assert "anthropic" in sys.modules
+        assert main.get_client("sk-ant-first") is client
+        assert main.get_client("sk-ant-second") is not client
+    finally:
+        main._client_for.cache_clear()
+
+    with pytest.raises(ValueError, match="ANTHROPIC_API_KEY is required"):
+        main.get_client(None)
+
+
+def test_warm_up_times_every_step_and_reports_failures(capsys):
+    ran = []
+
+    def fail():
+        raise RuntimeError("snapshot unreadable")
+
+    timings = {}
+    warm_up({"first": lambda: ran.append("first"), "restore": fail, "last": lambda: ran.append("last")}, timings)
+
+    assert ran == ["first", "last"]
+    assert list(timings) == ["first", "restore", "last"]
+    err = capsys.readouterr().err
+    assert "> Warm-up step 'restore' failed:" in err
+    assert "RuntimeError: snapshot unreadable" in err
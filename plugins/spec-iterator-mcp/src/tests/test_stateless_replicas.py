@@ -0,0 +1,103 @@
+"""Stateless mode across two server processes sharing a state secret, as behind a load balancer."""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+SERVER = Path(__file__).resolve().parent / "serve_fake.py"
+PROTOCOL = "2025-06-18"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_replica(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "SPEC_ITERATOR_STATE_SECRET": "test-secret",
+        "SPEC_ITERATOR_WARMUP": "0",
+    }
+    env.pop("SPEC_ITERATOR_EVENT_LOG", None)
+    env.pop("SPEC_ITERATOR_SNAPSHOT", None)
+    process = subprocess.Popen(
+        [sys.executable, str(SERVER)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Replica on port {port} did not start")
+
+
+def rpc_result(response: httpx.Response) -> dict:
+    assert response.status_code == 200, response.text
+    if response.headers["content-type"].startswith("text/event-stream"):
+        data = [line[5:].strip() for line in response.text.splitlines() if line.startswith("data:")]
+        message = json.loads(data[-1])
+    else:
+        message = response.json()
+    return message["result"]
+
+
+def test_session_moves_between_replicas():
+    ports = [free_port(), free_port()]
+    processes = [start_replica(port) for port in ports]
+    url_a, url_b = (f"http://127.0.0.1:{port}/mcp" for port in ports)
+    headers = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+    try:
+        with httpx.Client(timeout=30) as client:
+            # The client initializes against replica A and keeps whatever MCP session it was given
+            init = client.post(url_a, headers=headers, json={
+                "jsonrpc": "2.0", "id": 1, "method": "initialize",
+                "params": {"protocolVersion": PROTOCOL, "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+            })
+            rpc_result(init)
+            headers["mcp-protocol-version"] = PROTOCOL
+            if "mcp-session-id" in init.headers:
+                headers["mcp-session-id"] = init.headers["mcp-session-id"]
+
+            def call(url: str, name: str, arguments: dict) -> dict:
+                response = client.post(url, headers=headers, json={
+                    "jsonrpc": "2.0", "id": 2, "method": "tools/call",
+                    "params": {"name": name, "arguments": arguments},
+                })
+                return json.loads(rpc_result(response)["content"][0]["text"])
+
+            started = call(url_a, "spec_start_session", {
+                "requirement": "An order tracking page for a small online shop", "reuse_similar": False,
+            })
+            session_id, token = started["session_id"], started["session_token"]
+
+            # The load balancer sends the next calls to replica B, which never saw the session
+            status = call(url_b, "spec_get_status", {"session_id": session_id, "session_token": token})
+            assert status["session_id"] == session_id
+            assert status["questions"]["pending"] == len(started["questions"])
+
+            question_id = started["questions"][0]["id"]
+            answered = call(url_b, "spec_answer_questions", {
+                "session_id": session_id,
+                "session_token": token,
+                "answers": [{"question_id": question_id, "answer": "Shop owners and their customers"}],
+            })
+            assert "error" not in answered
+            assert answered["session_token"] != token
+    finally:
+        for p in processes:
+            p.terminate()
+            p.wait(timeout=10)
@@ -0,0 +1,59 @@
+"""The stdio transport, run as a real subprocess the way a local client spawns it."""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+SRC = Path(__file__).resolve().parent.parent
+SERVER = Path(__file__).resolve().parent / "serve_fake.py"
+
+
+def server_params(*python_flags: str, script: Path = SRC / "main.py", **env: str) -> StdioServerParameters:
+    environment = {**os.environ, "SPEC_ITERATOR_WARMUP": "0", **env}
+    for name in ("SPEC_ITERATOR_EVENT_LOG", "SPEC_ITERATOR_SNAPSHOT", "SPEC_ITERATOR_STATE_SECRET"):
+        if name not in env:
+            environment.pop(name, None)
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[*python_flags, str(script), "--transport", "stdio"],
+        env=environment,
+        cwd=SRC,
+    )
+
+
+async def call(params: StdioServerParameters, name: str, arguments: dict) -> dict:
+    """One tool call in a fresh server process, which exits when the client closes stdin."""
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.call_tool(name, arguments)
+            return json.loads(result.content[0].text)
+
+
+async def test_stdio_does_not_import_the_http_middleware(tmp_path):
+    errlog = tmp_path / "stderr.txt"
+    with errlog.open("w") as err:
+        async with stdio_client(server_params("-X", "importtime"), errlog=err) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                result = await session.call_tool("spec_info", {})
+                assert "server" in json.loads(result.content[0].text)
+
+    imported = {line.rsplit("|", 1)[-1].strip() for line in errlog.read_text().splitlines() if "import time:" in line}
+    assert "shutdown" in imported
+    assert "middleware" not in imported
+
+
+async def test_sessions_survive_a_stdio_restart(tmp_path):
+    # Snapshotted when the client closes stdin, restored by the next process it spawns
+    params = server_params(script=SERVER, SPEC_ITERATOR_SNAPSHOT=str(tmp_path / "sessions.snap"))
+    started = await call(params, "spec_start_session", {"requirement": "Order tracking page", "reuse_similar": False})
+    assert (tmp_path / "sessions.snap").exists()
+
+    status = await call(params, "spec_get_status", {"session_id": started["session_id"]})
+    assert status["session_id"] == started["session_id"]
+    assert status["questions"]["pending"] == len(started["questions"])
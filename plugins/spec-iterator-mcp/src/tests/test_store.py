@@ -0,0 +1,198 @@
+import pytest
+from factories import answer, make_session
+
+from compact import CompactSession
+from eventlog import EventLog
+from models import Session
+from store import SessionStore
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_compact_session_round_trip(compress):
+    session = answer(make_session(questions=4), "q1_2", "Shop owners")
+    session.assumptions = ["Orders ship within a day"]
+    session.requirement_digest = "Section 1: ordering"
+    session.tenant = "0123456789abcdef"
+    compact = CompactSession.from_session(session, compress)
+
+    assert compact.to_session().model_dump() == session.model_dump()
+    assert Session.model_validate(compact.to_data()).model_dump() == session.model_dump()
+    assert CompactSession.from_data(compact.to_data(), compress).to_session().model_dump() == session.model_dump()
+
+
+def test_put_data_stores_newer_version():
+    store = SessionStore()
+    session = make_session()
+    store[session.id] = session
+
+    newer = answer(make_session(), "q1_1", "Shop owners")
+    assert store.put_data(session.id, newer.model_dump(mode="json"))
+    assert store.version(session.id) == 2
+    assert store[session.id].clarifications[0].answer == "Shop owners"
+
+
+def test_put_data_keeps_held_session_over_stale_data():
+    store = SessionStore()
+    stale = make_session().model_dump(mode="json")
+    store["sess_1"] = answer(make_session(), "q1_1", "Shop owners")
+
+    assert not store.put_data("sess_1", stale)
+    assert store.put_data("sess_1", stale) is False
+    assert store.version("sess_1") == 2
+    assert store["sess_1"].clarifications[0].answer == "Shop owners"
+
+
+def test_put_data_skips_same_version():
+    store = SessionStore()
+    session = make_session()
+    store[session.id] = session
+    cursor = store.cursor
+
+    assert not store.put_data(session.id, session.model_dump(mode="json"))
+    assert store.changed_since(cursor) == []
+
+
+def test_put_data_does_not_log_stale_data(tmp_path):
+    log = EventLog(tmp_path, fsync_interval=0)
+    store = SessionStore()
+    store.attach_log(log)
+    store["sess_1"] = answer(make_session(), "q1_1", "Shop owners")
+    records = log.records
+
+    assert not store.put_data("sess_1", make_session().model_dump(mode="json"))
+    assert log.records == records
+    log.close()
+
+    recovered = SessionStore()
+    recovered.attach_log(EventLog(tmp_path, fsync_interval=0))
+    assert recovered.version("sess_1") == 2
+    assert recovered["sess_1"].clarifications[0].answer == "Shop owners"
+
+
+def test_checkout_changes_are_kept_and_reads_are_copies():
+    store = SessionStore()
+    store["sess_1"] = make_session()
+
+    detached = store["sess_1"]
+    detached.clarifications[0].answer = "lost"
+    assert store["sess_1"].clarifications[0].answer is None
+
+    with store.checkout("sess_1") as session:
+        with store.checkout("sess_1") as same:
+            assert same is session
+        answer(session, "q1_1", "kept")
+    assert store["sess_1"].clarifications[0].answer == "kept"
+    assert store.version("sess_1") == 2
+
+
+def test_changed_since_lists_only_changed_sessions():
+    store = SessionStore()
+    store["sess_1"] = make_session("sess_1")
+    store["sess_2"] = make_session("sess_2")
+    cursor = store.cursor
+
+    assert store.changed_since(cursor) == []
+    with store.checkout("sess_1"):
+        pass  # read-only calls leave the version and the change list alone
+    assert store.changed_since(cursor) == []
+
+    with store.checkout("sess_2") as session:
+        answer(session, "q1_1", "Shop owners")
+    assert [s.id for s in store.changed_since(cursor)] == ["sess_2"]
+
+    del store["sess_1"]
+    assert store.changed_since(cursor) is None
+    assert store.changed_since("other-process.1") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = SessionStore()
+    store["sess_1"] = answer(make_session("sess_1"), "q1_1", "Shop owners")
+    store["sess_2"] = make_session("sess_2")
+    assert store.save_snapshot(tmp_path / "sessions.snap") == 2
+
+    restored = SessionStore()
+    restored.attach_snapshot(tmp_path / "sessions.snap")
+    assert sorted(restored) == ["sess_1", "sess_2"]
+    assert restored["sess_1"].model_dump() == store["sess_1"].model_dump()
+
+
+def test_event_log_recovers_checkouts_and_deletions(tmp_path):
+    log = EventLog(tmp_path, fsync_interval=0)
+    store = SessionStore()
+    store.attach_log(log)
+    store["sess_1"] = make_session("sess_1")
+    store["sess_2"] = make_session("sess_2")
+    with store.checkout("sess_1") as session:
+        answer(session, "q1_1", "Shop owners")
+        session.assumptions.append("Orders ship within a day")
+    del store["sess_2"]
+    expected = store["sess_1"].model_dump()
+    log.close()
+
+    recovered = SessionStore()
+    recovered.attach_log(EventLog(tmp_path, fsync_interval=0))
+    assert list(recovered) == ["sess_1"]
+    assert recovered["sess_1"].model_dump() == expected
+
+
+def test_event_log_writes_deltas_between_snapshots(tmp_path):
+    log = EventLog(tmp_path, fsync_interval=0, snapshot_every=3)
+    store = SessionStore()
+    store.attach_log(log)
+    store["sess_1"] = make_session("sess_1", questions=6)
+    for i in range(6):
+        with store.checkout("sess_1") as session:
+            answer(session, f"q1_{i + 1}", f"Answer {i + 1}")
+    # CREATED, three changes as deltas, then a full snapshot, then deltas again
+    assert log.snapshots == 2
+    expected = store["sess_1"].model_dump()
+    log.close()
+
+    reopened = EventLog(tmp_path, fsync_interval=0)
+    recovered = SessionStore()
+    recovered.attach_log(reopened)
+    assert recovered["sess_1"].model_dump() == expected
+    assert reopened.recovery["records_kept"] == 3  # the latest snapshot and the two changes after it
+
+
+def test_event_log_compaction_keeps_live_sessions(tmp_path):
+    log = EventLog(tmp_path, fsync_interval=0, snapshot_every=2, segment_bytes=512)
+    store = SessionStore()
+    store.attach_log(log)
+    for n in range(8):
+        store[f"sess_{n}"] = make_session(f"sess_{n}")
+    for n in range(8):
+        for i in range(3):
+            with store.checkout(f"sess_{n}") as session:
+                answer(session, f"q1_{i + 1}", f"Answer {n}.{i}")
+    for n in range(0, 8, 2):
+        del store[f"sess_{n}"]
+    if log._compactor is not None:
+        log._compactor.join()
+    assert log.compactions >= 1
+    expected = {session_id: store[session_id].model_dump() for session_id in store}
+    log.close()
+
+    recovered = SessionStore()
+    recovered.attach_log(EventLog(tmp_path, fsync_interval=0))
+    assert {session_id: recovered[session_id].model_dump() for session_id in recovered} == expected
+
+
+def test_event_log_ignores_torn_final_record(tmp_path):
+    log = EventLog(tmp_path, fsync_interval=0)
+    store = SessionStore()
+    store.attach_log(log)
+    store["sess_1"] = make_session("sess_1")
+    with store.checkout("sess_1") as session:
+        answer(session, "q1_1", "Shop owners")
+    log.close()
+
+    segment = max(tmp_path.glob("*.log"))
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-5])  # crash in the middle of the last write
+
+    recovered = SessionStore()
+    recovered.attach_log(EventLog(tmp_path, fsync_interval=0))
+    assert recovered.version("sess_1") == 1
+    assert recovered["sess_1"].clarifications[0].answer is None
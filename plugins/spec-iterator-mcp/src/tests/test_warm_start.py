@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import main
+from similarity import SessionIndex
+
+REQUIREMENT = "Order tracking page for a small online shop with shipment notifications"
+
+
+pytestmark = pytest.mark.usefixtures("server")
+
+
+async def start(api_key: str | None, requirement: str = REQUIREMENT) -> dict:
+    return json.loads(await main._start_session(requirement, "e-commerce", None, True, api_key))
+
+
+async def answered_session(api_key: str | None) -> str:
+    started = await start(api_key)
+    with main.sessions.checkout(started["session_id"]) as session:
+        for c in session.clarifications:
+            c.answer = f"Confidential answer from {api_key}"
+    return started["session_id"]
+
+
+async def test_warm_start_reuses_own_tenant_sessions():
+    source = await answered_session("key-a")
+    started = await start("key-a")
+    assert started["warm_start"]["source_session_id"] == source
+    assert started["warm_start"]["mode"] == "reused"
+
+
+async def test_warm_start_never_crosses_tenants():
+    await answered_session("key-a")
+    for api_key in ("key-b", None):
+        started = await start(api_key)
+        assert "warm_start" not in started
+        session = main.sessions[started["session_id"]]
+        assert all(c.answer is None for c in session.clarifications)
+        assert not any("key-a" in a for a in session.assumptions)
+
+
+async def test_tenant_survives_reindexing():
+    source = await answered_session("key-a")
+    main.session_index = SessionIndex()
+    main.index_sessions()
+    assert (await start("key-b")).get("warm_start") is None
+    assert (await start("key-a"))["warm_start"]["source_session_id"] == source
+
+
+async def test_idempotency_keys_are_per_tenant(monkeypatch):
+    async def start_with_key(api_key: str) -> dict:
+        monkeypatch.setattr(main, "request_api_key", lambda ctx: api_key)
+        return json.loads(await main.spec_start_session(REQUIREMENT, idempotency_key="retry-1"))
+
+    first = await start_with_key("key-a")
+    assert (await start_with_key("key-a"))["session_id"] == first["session_id"]
+    assert (await start_with_key("key-b"))["session_id"] != first["session_id"]
+
+
+def test_index_search_is_per_tenant():
+    index = SessionIndex()
+    index.add("a1", REQUIREMENT, "e-commerce", "tenant-a")
+    index.add("b1", REQUIREMENT, "e-commerce", "tenant-b")
+    index.add("own", REQUIREMENT, "e-commerce")
+    assert [sid for sid, _ in index.search(REQUIREMENT, "e-commerce", "tenant-a")] == ["a1"]
+    assert [sid for sid, _ in index.search(REQUIREMENT, "e-commerce")] == ["own"]
+    assert index.search(REQUIREMENT, "e-commerce", "tenant-c") == []
+
+
+def test_index_search_with_common_terms_is_per_tenant():
+    index = SessionIndex()
+    for i in range(200):
+        index.add(f"b{i}", REQUIREMENT, "e-commerce", "tenant-b")
+    index.add("a1", REQUIREMENT, "e-commerce", "tenant-a")
+    assert [sid for sid, _ in index.search(REQUIREMENT, "e-commerce", "tenant-a")] == ["a1"]
+    assert all(sid.startswith("b") for sid, _ in index.search(REQUIREMENT, "e-commerce", "tenant-b"))